@@ -0,0 +1,25 @@
+# Compares two result files written by suite.py.
+#
+# Run from the repository root:
+#   python benchmarks/compare.py baseline.json results.json
+import json
+import sys
+
+def compare(baseline: dict, results: dict) -> list[str]:
+    lines = []
+    if baseline['config'] != results['config']: lines.append('Warning: the runs used different configurations.')
+    lines.append(f'{"stage":<12}{"baseline s":>14}{"results s":>14}{"speedup":>10}')
+    for (stage, result) in results['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before is None: continue
+        speedup = (before['seconds'] / result['seconds']) if result['seconds'] else 0.0
+        lines.append(f'{stage:<12}{before["seconds"]:>14.4f}{result["seconds"]:>14.4f}{speedup:>9.2f}x')
+    return lines
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python benchmarks/compare.py BASELINE.json RESULTS.json')
+        sys.exit(1)
+    with open(sys.argv[1], 'r') as f: baseline = json.loads(f.read())
+    with open(sys.argv[2], 'r') as f: results = json.loads(f.read())
+    print('\n'.join(compare(baseline, results)))
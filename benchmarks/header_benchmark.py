@@ -0,0 +1,33 @@
+# Compares the compiled header decoder against the original
+# field-by-field decoder on a synthetic object header.
+#
+# Run from the repository root:
+#   python benchmarks/header_benchmark.py
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sputility.obj import deserialize
+from sputility.obj import types
+from synthetic import synthetic_header
+
+ITERATIONS = 20000
+
+def _bench(decoder, data: bytes) -> float:
+    def _run():
+        decoder(input=types.AaBinStream(data=data, offset=0))
+    return min(timeit.repeat(_run, number=ITERATIONS, repeat=5)) / ITERATIONS
+
+if __name__ == '__main__':
+    data = synthetic_header('Object_001', derived_from='$Derived')
+    expected = deserialize._get_header_stepwise(input=types.AaBinStream(data=data, offset=0))
+    actual = deserialize._get_header(input=types.AaBinStream(data=data, offset=0))
+    assert expected == actual, 'Compiled header does not match stepwise header.'
+
+    stepwise = _bench(deserialize._get_header_stepwise, data)
+    compiled = _bench(deserialize._get_header, data)
+    print(f'Stepwise header: {stepwise * 1e6:.2f} us')
+    print(f'Compiled header: {compiled * 1e6:.2f} us')
+    print(f'Speedup:         {stepwise / compiled:.2f}x')
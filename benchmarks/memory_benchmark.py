@@ -0,0 +1,60 @@
+# Measures the memory used per parsed attribute, comparing the
+# slotted object model with equivalent dataclasses that carry a
+# __dict__ per instance.
+#
+# Run from the repository root:
+#   python benchmarks/memory_benchmark.py
+import dataclasses
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sputility.obj import enums
+from sputility.obj import types
+
+COUNT = 100000
+
+def _unslotted(cls: type) -> type:
+    return dataclasses.make_dataclass(f'{cls.__name__}Dict', [(f.name, f.type) for f in dataclasses.fields(cls)])
+
+def _build(attribute_cls: type, value_cls: type) -> list:
+    # Shaped like a type 1 attribute with an integer value.  Names
+    # are shared the way they would be for many objects derived
+    # from the same template.
+    names = [f'Attribute{i % 100}' for i in range(100)]
+    return [
+        attribute_cls(
+            offset=i,
+            id=i % 1000,
+            name=names[i % 100],
+            attr_type=enums.AaDataType.IntegerType,
+            array=False,
+            permission=enums.AaPermission.FreeAccess,
+            write=enums.AaWriteability.UserWriteable,
+            locked=enums.AaLocked.Unlocked,
+            parent_gobjectid=1,
+            parent_name='$Template',
+            source=None,
+            value=value_cls(datatype=enums.AaDataType.IntegerType, value=i),
+            primitive_name=''
+        )
+        for i in range(COUNT)
+    ]
+
+def _measure(attribute_cls: type, value_cls: type) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    attrs = _build(attribute_cls, value_cls)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del attrs
+    return (after - before) / COUNT
+
+if __name__ == '__main__':
+    slotted = _measure(types.AaObjectAttribute, types.AaObjectValue)
+    unslotted = _measure(_unslotted(types.AaObjectAttribute), _unslotted(types.AaObjectValue))
+    print(f'With __dict__: {unslotted:.0f} bytes per attribute')
+    print(f'Slotted:       {slotted:.0f} bytes per attribute')
+    print(f'Saving:        {100.0 * (1.0 - slotted / unslotted):.0f}%')
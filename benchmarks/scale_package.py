@@ -0,0 +1,70 @@
+# Scales an existing package up by repeating its instances under
+# new tag names, for stress tests with realistic object content.
+#
+# Run from the repository root:
+#   python benchmarks/scale_package.py Input.aaPKG Scaled.aaPKG --copies 100
+#
+# Each copy of an instance keeps its template and content and gets
+# the tag name <tag name>_<copy> and a new gobjectid.  Templates are
+# written once.
+import argparse
+import copy
+from dataclasses import replace
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sputility import SPUtility
+from sputility import obj
+from sputility import pkg
+
+def _rename(item: obj.types.AaObject, tag_name: str, gobjectid: int) -> obj.types.AaObject:
+    item = copy.deepcopy(item)
+    old_name = item.header.tagname
+    item.header.tagname = tag_name
+    item.header.this_gobjectid = gobjectid
+    if item.header.contained_name == old_name: item.header.contained_name = tag_name
+    if item.header.hierarchal_name.endswith(old_name):
+        item.header.hierarchal_name = item.header.hierarchal_name[:-len(old_name)] + tag_name
+    return item
+
+def scale_package(input_path: str, output_path: str, copies: int):
+    (manifest, streams) = pkg.decompress.aapkg_to_memory(input_path=input_path)
+    index = pkg.types.AaArchiveIndex(streams)
+    objects = []
+    next_gobjectid = max((x.gobjectid for x in pkg.decompress.iter_manifest_objects(manifest)), default=0) + 1
+
+    def _scale_template(template: pkg.types.AaManifestTemplate):
+        nonlocal next_gobjectid
+        stream = index.get_manifest_object(template)
+        if stream is not None: objects.append(obj.deserialize.deserialize_aaobject(stream.data))
+        for child in template.derived_templates: _scale_template(child)
+
+        instances = []
+        for instance in template.derived_instances:
+            stream = index.get_manifest_object(instance)
+            if stream is None: continue
+            item = obj.deserialize.deserialize_aaobject(stream.data)
+            for k in range(copies):
+                tag_name = f'{instance.tag_name}_{k}' if k else instance.tag_name
+                objects.append(_rename(item, tag_name, next_gobjectid) if k else item)
+                instances.append(replace(instance, tag_name=tag_name, file_name=f'{tag_name}.txt', gobjectid=next_gobjectid if k else instance.gobjectid))
+                if k: next_gobjectid += 1
+        template.derived_instances = instances
+
+    for template in manifest.templates: _scale_template(template)
+    manifest.object_count = len(objects)
+    SPUtility().serialize_package(objects, manifest, output_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Repeat the instances of a package to make a larger one.')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--copies', type=int, default=100)
+    args = parser.parse_args()
+    with warnings.catch_warnings():
+        # Datatypes without full decoders warn on every value
+        warnings.simplefilter('ignore')
+        scale_package(args.input, args.output, args.copies)
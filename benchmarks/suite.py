@@ -0,0 +1,153 @@
+# Times each stage of reading a synthetic package and writes the
+# results as JSON so runs can be compared across commits.
+#
+# Run from the repository root:
+#   python benchmarks/suite.py --objects 500 --output results.json
+#
+# Stages:
+#   decompress   aapkg_to_memory, all object files and the manifest
+#   manifest     aapkg_to_manifest, the manifest only
+#   header       object headers
+#   extension    extensions and attributes, values left undecoded (lazy)
+#   value        decoding every attribute value of the lazy objects
+#   output       encoding and writing the folder output
+import argparse
+from dataclasses import asdict, fields
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sputility
+from sputility import pkg
+from sputility import writers
+from sputility.obj import deserialize
+from sputility.obj import types
+
+from synthetic import SyntheticConfig, synthetic_package
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def _time(run, repeat: int) -> float:
+    # Best of several runs, setup happens inside run() and is
+    # excluded by returning the time of the timed part.
+    return min(run() for _ in range(repeat))
+
+def _stage(seconds: float, items: int, nbytes: int) -> dict:
+    return {
+        'seconds': seconds,
+        'items': items,
+        'bytes': nbytes,
+        'items_per_second': (items / seconds) if seconds else 0.0,
+        'mb_per_second': (nbytes / seconds / 1e6) if seconds else 0.0,
+    }
+
+def _decode_values(objects: list[types.AaObject]) -> int:
+    count = 0
+    for aaobject in objects:
+        for extension in aaobject.extensions:
+            for attribute in extension.attributes:
+                attribute.value.value
+                count += 1
+    return count
+
+def run_suite(config: SyntheticConfig, repeat: int = 3) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_path:
+        package_path = os.path.join(temp_path, 'Synthetic.aaPKG')
+        files = synthetic_package(package_path, config)
+        package_size = os.path.getsize(package_path)
+        objects = list(files.values())
+        object_bytes = sum(len(x) for x in objects)
+
+        def _decompress():
+            start = time.perf_counter()
+            pkg.decompress.aapkg_to_memory(package_path)
+            return time.perf_counter() - start
+        results['decompress'] = _stage(_time(_decompress, repeat), len(objects), package_size)
+
+        def _manifest():
+            start = time.perf_counter()
+            pkg.decompress.aapkg_to_manifest(package_path)
+            return time.perf_counter() - start
+        results['manifest'] = _stage(_time(_manifest, repeat), 1, package_size)
+
+        def _header():
+            start = time.perf_counter()
+            for data in objects: deserialize._get_header(input=types.AaBinStream(data=data, offset=0))
+            return time.perf_counter() - start
+        results['header'] = _stage(_time(_header, repeat), len(objects), object_bytes)
+
+        def _extension():
+            start = time.perf_counter()
+            for data in objects: deserialize.deserialize_aaobject(data, lazy=True)
+            return time.perf_counter() - start
+        results['extension'] = _stage(_time(_extension, repeat), len(objects), object_bytes)
+
+        values = 0
+        def _value():
+            nonlocal values
+            lazy = [deserialize.deserialize_aaobject(data, lazy=True) for data in objects]
+            start = time.perf_counter()
+            values = _decode_values(lazy)
+            return time.perf_counter() - start
+        results['value'] = _stage(_time(_value, repeat), values, object_bytes)
+
+        parsed = [deserialize.deserialize_aaobject(data) for data in objects]
+        output_bytes = 0
+        def _output():
+            nonlocal output_bytes
+            output_path = tempfile.mkdtemp(dir=temp_path)
+            writer = writers.AaFolderWriter()
+            start = time.perf_counter()
+            for aaobject in parsed: deserialize._aaobject_write_folder(obj=aaobject, output_path=output_path, writer=writer)
+            output_bytes = writer.close().bytes_written
+            return time.perf_counter() - start
+        results['output'] = _stage(_time(_output, repeat), len(parsed), 0)
+        results['output']['bytes'] = output_bytes
+        results['output']['mb_per_second'] = output_bytes / results['output']['seconds'] / 1e6
+
+    return {
+        'sputility_version': sputility.__version__,
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'repeat': repeat,
+        'config': asdict(config),
+        'stages': results,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark sputility on a synthetic package.')
+    for field in fields(SyntheticConfig):
+        parser.add_argument(f'--{field.name.replace("_", "-")}', type=int, default=field.default)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write results to this file instead of stdout.')
+    args = parser.parse_args()
+
+    config = SyntheticConfig(**{field.name: getattr(args, field.name) for field in fields(SyntheticConfig)})
+    with warnings.catch_warnings():
+        # Datatypes without full decoders warn on every value
+        warnings.simplefilter('ignore')
+        results = run_suite(config, repeat=args.repeat)
+
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f: f.write(text)
+    else:
+        print(text)
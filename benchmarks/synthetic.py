@@ -0,0 +1,231 @@
+# Synthetic object (*.txt) and package (*.aaPKG) generator.
+#
+# Builds inputs in the same layout deserialize_aaobject reads, at
+# any scale, without needing an export from a real galaxy.  Output
+# only depends on the arguments and the seed so runs can be compared
+# across commits.
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import os
+import random
+import struct
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sputility.obj import enums
+from sputility.obj import primitives
+from sputility.obj import serialize
+from sputility.obj import types
+from sputility.pkg import compress
+from sputility.pkg import types as pkg_types
+
+# Every datatype with a decoder, scalar and array
+DATATYPES = [
+    enums.AaDataType.NoneType,
+    enums.AaDataType.BooleanType,
+    enums.AaDataType.IntegerType,
+    enums.AaDataType.FloatType,
+    enums.AaDataType.DoubleType,
+    enums.AaDataType.StringType,
+    enums.AaDataType.TimeType,
+    enums.AaDataType.ElapsedTimeType,
+    enums.AaDataType.ReferenceType,
+    enums.AaDataType.StatusType,
+    enums.AaDataType.DataTypeType,
+    enums.AaDataType.QualifiedEnumType,
+    enums.AaDataType.QualifiedStructType,
+    enums.AaDataType.InternationalizedStringType,
+    enums.AaDataType.ArrayBooleanType,
+    enums.AaDataType.ArrayIntegerType,
+    enums.AaDataType.ArrayFloatType,
+    enums.AaDataType.ArrayDoubleType,
+    enums.AaDataType.ArrayStringType,
+    enums.AaDataType.ArrayTimeType,
+    enums.AaDataType.ArrayElapsedTimeType,
+    enums.AaDataType.ArrayReferenceType,
+    enums.AaDataType.ArrayDataTypeType,
+]
+
+@dataclass(slots=True)
+class SyntheticConfig:
+    objects: int = 100              # Templates and instances in a package
+    extensions: int = 4             # Extensions per object, plus one script extension
+    attributes: int = 10            # Type 1 attributes per extension
+    attributes_type2: int = 30      # Type 2 attributes per extension
+    array_size: int = 16            # Elements per array value
+    template_depth: int = 2         # Chain of derived templates, instances derive from the last
+    objects_per_cab: int = 100      # Object files per inner cab
+    seed: int = 0
+
+_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+def _int(value: int, length: int = 4) -> bytes:
+    return int(value).to_bytes(length, 'little')
+
+def _string(value: str, length: int = 64) -> bytes:
+    data = value.encode('utf-16le')
+    return data + bytes(length - len(data))
+
+def _string_var(value: str) -> bytes:
+    data = value.encode('utf-16le') + b'\x00\x00'
+    return _int(len(data)) + data
+
+def _sized(data: bytes) -> bytes:
+    return _int(len(data)) + data
+
+def _filetime(value: datetime) -> bytes:
+    delta = value - _EPOCH
+    return struct.pack('<Q', (delta.days * 86400 + delta.seconds) * 10_000_000 + delta.microseconds * 10)
+
+def _array(elements: list[bytes], element_length: int) -> bytes:
+    return _int(0) + _int(len(elements), 2) + _int(element_length) + b''.join(elements)
+
+def _reference(ref_a: str, ref_b: str) -> bytes:
+    data = ref_a.encode('utf-16le')
+    return _sized(_int(len(data), 2) + _int(0, 2) + data + _string_var(ref_b) + bytes(20))
+
+def _array_reference(ref_a: str, ref_b: str) -> bytes:
+    data_a = ref_a.encode('utf-16le')
+    data_b = ref_b.encode('utf-16le')
+    return _sized(
+        bytes(5) + _int(len(data_a), 2) + _int(0, 2) + data_a + _int(len(data_a)) + data_a +
+        _int(0) + _int(len(data_b), 2) + _int(0, 2) + data_b + bytes(20)
+    )
+
+def synthetic_value(datatype: enums.AaDataType, rnd: random.Random, array_size: int = 16) -> bytes:
+    match datatype:
+        case enums.AaDataType.NoneType: payload = b''
+        case enums.AaDataType.BooleanType: payload = _int(rnd.randint(0, 1), 1)
+        case enums.AaDataType.IntegerType: payload = _int(rnd.randint(0, 2**32 - 1))
+        case enums.AaDataType.FloatType: payload = struct.pack('<f', rnd.random())
+        case enums.AaDataType.DoubleType: payload = struct.pack('<d', rnd.random())
+        case enums.AaDataType.StringType: payload = _sized(_string_var(f'String{rnd.randint(0, 999)}'))
+        case enums.AaDataType.TimeType: payload = _sized(_filetime(datetime(2020, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=rnd.randint(0, 10**8))))
+        case enums.AaDataType.ElapsedTimeType: payload = _int(rnd.randint(0, 10**12), 8)
+        case enums.AaDataType.ReferenceType: payload = _reference(f'me.Attr{rnd.randint(0, 9)}', '')
+        case enums.AaDataType.StatusType: payload = _sized(b'\x01\x02\x03')
+        case enums.AaDataType.DataTypeType: payload = _int(7)
+        case enums.AaDataType.QualifiedEnumType: payload = _sized(_string_var(f'Enum{rnd.randint(0, 9)}') + _int(1, 2) + _int(2, 2) + _int(3, 2))
+        case enums.AaDataType.QualifiedStructType: payload = _sized(_int(1) + _int(2) + _int(3, 2) + _int(4, 2) + _int(5))
+        case enums.AaDataType.InternationalizedStringType: payload = _sized(_int(1) + _int(1033) + _string_var('Text'))
+        case enums.AaDataType.ArrayBooleanType: payload = _array([_int(rnd.randint(0, 1), 2) for _ in range(array_size)], 2)
+        case enums.AaDataType.ArrayIntegerType: payload = _array([_int(rnd.randint(0, 2**32 - 1)) for _ in range(array_size)], 4)
+        case enums.AaDataType.ArrayFloatType: payload = _array([struct.pack('<f', rnd.random()) for _ in range(array_size)], 4)
+        case enums.AaDataType.ArrayDoubleType: payload = _array([struct.pack('<d', rnd.random()) for _ in range(array_size)], 8)
+        case enums.AaDataType.ArrayStringType: payload = _int(0) + _int(array_size, 2) + _int(0) + b''.join(_sized(_int(5, 1) + _sized(_string_var(f'Item{k}'))) for k in range(array_size))
+        case enums.AaDataType.ArrayTimeType: payload = _array([_filetime(datetime(2021, 1, 1, tzinfo=timezone.utc)) for _ in range(array_size)], 8)
+        case enums.AaDataType.ArrayElapsedTimeType: payload = _array([_int(rnd.randint(0, 10**9), 8) for _ in range(array_size)], 8)
+        case enums.AaDataType.ArrayReferenceType: payload = _int(0) + _int(array_size, 2) + _int(0) + b''.join(_array_reference(f'Obj.Attr{k}', '') for k in range(array_size))
+        case enums.AaDataType.ArrayDataTypeType: payload = _array([_int(3) for _ in range(array_size)], 4)
+        case _: raise NotImplementedError(f'No synthetic value for {datatype!r}.')
+    return primitives.PATTERN_OBJECT_VALUE + _int(datatype, 1) + payload
+
+def _attribute_type1(id: int, rnd: random.Random, array_size: int) -> bytes:
+    datatype = rnd.choice(DATATYPES)
+    name = f'Attr{id}'
+    return (
+        bytes(2) + _int(id, 2) + _int(len(name), 2) + name.encode('utf-16le') + _int(datatype, 1) +
+        _int(datatype >= enums.AaDataType.ArrayBooleanType) + _int(rnd.randint(0, 6)) + _int(rnd.choice([2, 3, 5, 10, 11])) +
+        _int(rnd.randint(0, 2)) + _int(42) + bytes(8) + _int(len('Parent'), 2) + 'Parent'.encode('utf-16le') + bytes(2) +
+        synthetic_value(datatype, rnd, array_size)
+    )
+
+def _attribute_type2(id: int, rnd: random.Random, array_size: int) -> bytes:
+    datatype = rnd.choice(DATATYPES)
+    data = _int(id, 2) + bytes(2)
+    if rnd.random() < 0.7:
+        data += b'\xff' * 4 + _int(datatype, 1) + bytes(rnd.choice([11, 13]))
+    return data + synthetic_value(datatype, rnd, array_size)
+
+# Script extension attributes and their datatypes
+_SCRIPT_ATTRIBUTES = [
+    (1, 5), (2, 5), (100, 5), (102, 72), (103, 69), (105, 13), (106, 5), (107, 4), (120, 5), (121, 5),
+    (122, 5), (123, 5), (124, 5), (130, 1), (131, 7), (138, 1), (139, 1), (140, 2), (143, 1)
+]
+
+def _extension(instance_id: int, rnd: random.Random, config: SyntheticConfig, script: bool = False) -> bytes:
+    name = 'ScriptExtension' if script else 'UserDefined'
+    attributes = 0 if script else config.attributes
+    data = (
+        _int(instance_id) + _string(f'Ext{instance_id}' if instance_id else '') + bytes(616) + _string(name) +
+        bytes(616) + _string('$Parent') + bytes(596) + bytes(16)
+    )
+    data += _int(attributes) + b''.join(_attribute_type1(k, rnd, config.array_size) for k in range(attributes)) + bytes(8)
+    data += b''.join(synthetic_value(enums.AaDataType.NoneType, rnd) for _ in range(4))
+    if script:
+        data += _int(len(_SCRIPT_ATTRIBUTES))
+        data += b''.join(_int(id, 2) + bytes(2) + synthetic_value(enums.AaDataType(datatype), rnd, 3) for (id, datatype) in _SCRIPT_ATTRIBUTES)
+    else:
+        data += _int(config.attributes_type2) + b''.join(_attribute_type2(k, rnd, config.array_size) for k in range(config.attributes_type2))
+    return data
+
+def synthetic_header(
+    tag_name: str,
+    is_template: bool = False,
+    derived_from: str = '',
+    base_gobjectid: int = 100,
+    this_gobjectid: int = 200,
+    parent_gobjectid: int = 300,
+    config_version: int = 7
+) -> bytes:
+    output = bytearray()
+    serialize._write_header(output, types.AaObjectHeader(
+        base_gobjectid=base_gobjectid, is_template=is_template, this_gobjectid=this_gobjectid, security_group='Default',
+        parent_gobjectid=parent_gobjectid, tagname=tag_name, contained_name=tag_name, config_version=config_version,
+        hierarchal_name=f'Area.{tag_name}', host_name='Host', container_name='Container', area_name='Area',
+        derived_from=derived_from, based_on='$Base', galaxy_name='Galaxy', code_base=None
+    ))
+    return bytes(output)
+
+def synthetic_object(
+    tag_name: str,
+    is_template: bool = False,
+    derived_from: str = '',
+    config: SyntheticConfig = SyntheticConfig(),
+    seed: int = 0
+) -> bytes:
+    rnd = random.Random(seed)
+    data = synthetic_header(tag_name, is_template, derived_from) + _int(config.extensions + 1)
+    data += b''.join(_extension(k, rnd, config) for k in range(config.extensions))
+    data += _extension(config.extensions, rnd, config, script=True)
+    if is_template:
+        data += b'\x00' + _string('{GUID1}', 512) + _string('{GUID2}', 512) + bytes(36) + _string('$Codebase') + bytes(584) + _int(9)
+    return data
+
+def _manifest_entry(cls: type, tag_name: str, gobjectid: int) -> pkg_types.AaManifestTemplate | pkg_types.AaManifestInstance:
+    fields = dict(
+        tag_name=tag_name, gobjectid=gobjectid, file_name=f'{tag_name}.txt', config_version=1, codebase='',
+        security_group='Default', host_name=f'Host{gobjectid % 4}', area_name=f'Area{gobjectid % 8}',
+        cont_name='', toolset_name=''
+    )
+    if cls is pkg_types.AaManifestTemplate: fields['is_protected'] = False
+    return cls(**fields)
+
+def synthetic_package(path: str, config: SyntheticConfig = SyntheticConfig()) -> dict[str, bytes]:
+    # Writes the package and returns its object files by name.
+    files = {}
+    templates = []
+
+    depth = max(1, min(config.template_depth, config.objects))
+    (parent, derived_from) = (templates, '')
+    for level in range(depth):
+        tag_name = f'$Template{level}'
+        template = _manifest_entry(pkg_types.AaManifestTemplate, tag_name, len(files) + 1)
+        parent.append(template)
+        files[f'{tag_name}.txt'] = synthetic_object(tag_name, True, derived_from, config, config.seed + len(files))
+        (parent, derived_from) = (template.derived_templates, tag_name)
+
+    for k in range(config.objects - depth):
+        tag_name = f'Object{k:06d}'
+        template.derived_instances.append(_manifest_entry(pkg_types.AaManifestInstance, tag_name, len(files) + 1))
+        files[f'{tag_name}.txt'] = synthetic_object(tag_name, False, derived_from, config, config.seed + len(files))
+
+    manifest = pkg_types.AaManifest(
+        product_version=pkg_types.AaManifestVersion(cdi_version='1', ias_version='1'),
+        templates=templates,
+        bindings=pkg_types.AaManifestIODeviceMap(filename=''),
+        object_count=len(files)
+    )
+    compress.memory_to_aapkg(output_path=path, manifest=manifest, files=files, objects_per_cab=config.objects_per_cab)
+    return files
@@ -0,0 +1,87 @@
+from dataclasses import dataclass, field
+import glob
+import os
+from typing import Optional
+
+from .writers import AaWriteStats
+
+PACKAGE_EXT = '.aapkg'
+
+@dataclass(slots=True)
+class AaPackageSummary:
+    input_path: str
+    output_path: str
+    objects: int = 0                # Objects deserialized
+    failed: list[str] = field(default_factory=list)     # Tag names that failed
+    bytes: int = 0                  # Object bytes deserialized
+    seconds: float = 0.0            # From the first object queued to the last one done
+    error: Optional[Exception] = None   # Why the package couldn't be read, if it couldn't
+
+    @property
+    def name(self) -> str:
+        return os.path.splitext(os.path.basename(self.input_path))[0]
+
+@dataclass(slots=True)
+class AaObjectFailure:
+    tag_name: str
+    file_name: str
+    error: Exception
+
+class AaObjectList(list):
+    # Objects deserialized from one package in manifest order.  Objects
+    # that are missing or fail to deserialize are left out of the list
+    # and given in failed instead.  stats has the files written, skipped
+    # and removed for the package.
+    __slots__ = ('failed', 'stats')
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self.failed: list[AaObjectFailure] = []
+        self.stats: Optional[AaWriteStats] = None
+
+def _is_package(path: str) -> bool:
+    return (os.path.splitext(path)[1].casefold() == PACKAGE_EXT) and os.path.isfile(path)
+
+def expand_package_paths(inputs: str | list[str]) -> list[str]:
+    # Each input is a package, a folder of packages or a glob.  Only
+    # .aaPKG files are taken from folders and globs.  Packages are
+    # returned once each, in sorted order.  Each package is written
+    # to a folder named after it, so packages with the same name in
+    # different folders raise ValueError rather than overwrite each
+    # other's output.
+    if isinstance(inputs, (str, os.PathLike)): inputs = [inputs]
+    paths = []
+    for input in inputs:
+        input = os.fspath(input)
+        if os.path.isdir(input):
+            with os.scandir(input) as entries:
+                paths.extend(x.path for x in entries if _is_package(x.path))
+        elif any((x in input) for x in '*?['):
+            paths.extend(x for x in glob.glob(input) if _is_package(x))
+        elif os.path.isfile(input):
+            paths.append(input)
+        else:
+            raise FileNotFoundError(f'Input file specified ({input}) does not exist.')
+    # The same package given twice, under any spelling of its path,
+    # is kept once
+    unique = {}
+    for path in sorted(paths): unique.setdefault(os.path.normcase(os.path.abspath(path)), path)
+
+    # Case is ignored as output folders may be on a case-insensitive file system
+    names = {}
+    for path in unique.values():
+        name = os.path.splitext(os.path.basename(path))[0].casefold()
+        if name in names: raise ValueError(f'Packages {names[name]} and {path} would both be written to the same output folder.')
+        names[name] = path
+    return sorted(unique.values())
+
+def format_summaries(summaries: list[AaPackageSummary]) -> str:
+    lines = []
+    for x in summaries:
+        if x.error is not None:
+            lines.append(f'{x.name}: failed, {x.error!r}')
+            continue
+        rate = (x.objects / x.seconds) if x.seconds else 0.0
+        failed = f', {len(x.failed)} failed' if x.failed else ''
+        lines.append(f'{x.name}: {x.objects} objects{failed}, {x.bytes / 1e6:.2f} MB in {x.seconds:.2f} s ({rate:.1f} objects/s)')
+    return '\n'.join(lines)
@@ -0,0 +1,285 @@
+from dataclasses import dataclass, fields
+import difflib
+from typing import Optional
+from warnings import warn
+
+from . import obj
+from . import pkg
+from .progress import AaProgressCallback, AaProgressStage
+
+# Attribute fields compared between packages.  The offset and
+# primitive name follow from where the attribute sits in the object.
+_ATTRIBUTE_FIELDS = ('attr_type', 'array', 'permission', 'write', 'locked', 'parent_gobjectid', 'parent_name', 'source')
+
+# Script text compared line by line
+_SCRIPT_TEXT_FIELDS = (
+    'aliases',
+    'declarations',
+    'body_text_execute',
+    'body_text_startup',
+    'body_text_shutdown',
+    'body_text_onscan',
+    'body_text_offscan',
+)
+
+@dataclass(slots=True)
+class AaAttributeChange:
+    old: obj.types.AaObjectAttribute
+    new: obj.types.AaObjectAttribute
+
+@dataclass(slots=True)
+class AaScriptDiff:
+    name: str
+    changes: dict[str, list[str]]   # Unified diff lines by script field
+
+@dataclass(slots=True)
+class AaExtensionDiff:
+    name: str
+    added_attributes: list[obj.types.AaObjectAttribute]
+    removed_attributes: list[obj.types.AaObjectAttribute]
+    changed_attributes: list[AaAttributeChange]
+    script: Optional[AaScriptDiff]
+
+@dataclass(slots=True)
+class AaObjectDiff:
+    tag_name: str
+    header: dict[str, tuple]        # (old, new) by header field
+    added_extensions: list[str]
+    removed_extensions: list[str]
+    changed_extensions: list[AaExtensionDiff]
+
+    @property
+    def is_empty(self) -> bool:
+        return not(self.header or self.added_extensions or self.removed_extensions or self.changed_extensions)
+
+@dataclass(slots=True)
+class AaPackageDiff:
+    added: list[str]                # Tag names only in the new package
+    removed: list[str]              # Tag names only in the old package
+    changed: list[AaObjectDiff]
+    unchanged: list[str]
+    failed: dict[str, str]          # Reason by tag name, for objects that couldn't be compared
+
+def _extension_key(extension: obj.types.AaObjectExtension) -> tuple[str, str]:
+    return (extension.instance_name, extension.extension_name)
+
+def _extension_name(extension: obj.types.AaObjectExtension) -> str:
+    return extension.primitive_name or extension.extension_name
+
+def _index(items: list, key) -> dict:
+    # Repeated keys are numbered so that no item is dropped
+    index = {}
+    for item in items:
+        k = key(item)
+        n = 0
+        while (k, n) in index: n += 1
+        index[(k, n)] = item
+    return index
+
+def _values_equal(old: obj.types.AaObjectValue, new: obj.types.AaObjectValue) -> bool:
+    # Values that haven't been decoded yet are compared by their
+    # bytes first, which avoids decoding the ones that are the same.
+    if old.datatype != new.datatype: return False
+    if isinstance(old, obj.types.AaLazyObjectValue) and isinstance(new, obj.types.AaLazyObjectValue):
+        if not(old.is_decoded or new.is_decoded):
+            (a, b) = (old._stream, new._stream)
+            if a.data[a.base:a.end] == b.data[b.base:b.end]: return True
+    return old.value == new.value
+
+def _attributes_equal(old: obj.types.AaObjectAttribute, new: obj.types.AaObjectAttribute) -> bool:
+    for name in _ATTRIBUTE_FIELDS:
+        if getattr(old, name) != getattr(new, name): return False
+    return _values_equal(old.value, new.value)
+
+def _is_script_extension(extension: obj.types.AaObjectExtension) -> bool:
+    return (extension.extension_name.casefold() == obj.enums.AaExtensionFormatted.ScriptExtension.casefold())
+
+def _script_text(script: obj.types.AaScript, name: str) -> list[str]:
+    value = getattr(script.content, name)
+    if isinstance(value, list): return list(map(str, value))
+    return (value or '').splitlines()
+
+def diff_scripts(
+    old: obj.types.AaObjectExtension,
+    new: obj.types.AaObjectExtension,
+    label: str = ''
+) -> Optional[AaScriptDiff]:
+    try:
+        old_script = obj.deserialize._format_script_extension(extension=old)
+        new_script = obj.deserialize._format_script_extension(extension=new)
+    except Exception as e:
+        warn(f'Failed to format script {label}{_extension_name(new)}: {e!r}')
+        return None
+
+    changes = {}
+    for name in _SCRIPT_TEXT_FIELDS:
+        lines = list(difflib.unified_diff(
+            _script_text(old_script, name), _script_text(new_script, name),
+            fromfile=f'a/{label}{new_script.header.name}/{name}', tofile=f'b/{label}{new_script.header.name}/{name}', lineterm=''
+        ))
+        if lines: changes[name] = lines
+    if not(changes): return None
+    return AaScriptDiff(name=new_script.header.name, changes=changes)
+
+def diff_extensions(
+    old: obj.types.AaObjectExtension,
+    new: obj.types.AaObjectExtension,
+    label: str = ''
+) -> Optional[AaExtensionDiff]:
+    # Attributes are matched by name and id.  Returns None
+    # when the extensions are the same.
+    key = lambda x: (x.name, x.id)
+    old_attributes = _index(old.attributes, key)
+    new_attributes = _index(new.attributes, key)
+    added = [x for (k, x) in new_attributes.items() if k not in old_attributes]
+    removed = [x for (k, x) in old_attributes.items() if k not in new_attributes]
+    changed = []
+    for (k, x) in new_attributes.items():
+        y = old_attributes.get(k)
+        if (y is not None) and not(_attributes_equal(y, x)): changed.append(AaAttributeChange(old=y, new=x))
+
+    script = None
+    if changed and _is_script_extension(new): script = diff_scripts(old, new, label=label)
+    if not(added or removed or changed): return None
+    return AaExtensionDiff(
+        name=_extension_name(new),
+        added_attributes=added,
+        removed_attributes=removed,
+        changed_attributes=changed,
+        script=script
+    )
+
+def diff_objects(old: obj.types.AaObject, new: obj.types.AaObject) -> AaObjectDiff:
+    header = {}
+    for field in fields(obj.types.AaObjectHeader):
+        (a, b) = (getattr(old.header, field.name), getattr(new.header, field.name))
+        if a != b: header[field.name] = (a, b)
+
+    label = f'{new.header.tagname}/'
+    old_extensions = _index(old.extensions, _extension_key)
+    new_extensions = _index(new.extensions, _extension_key)
+    changed = []
+    for (k, x) in new_extensions.items():
+        y = old_extensions.get(k)
+        if y is None: continue
+        result = diff_extensions(y, x, label=label)
+        if result is not None: changed.append(result)
+
+    return AaObjectDiff(
+        tag_name=new.header.tagname,
+        header=header,
+        added_extensions=[_extension_name(x) for (k, x) in new_extensions.items() if k not in old_extensions],
+        removed_extensions=[_extension_name(x) for (k, x) in old_extensions.items() if k not in new_extensions],
+        changed_extensions=changed
+    )
+
+def diff_packages(
+    old_path: str,
+    new_path: str,
+    progress: Optional[AaProgressCallback] = None,
+    verify: bool = False
+) -> AaPackageDiff:
+    # Objects are matched by tag name.  Those with the same gobjectid,
+    # config version and file checksum in both packages are taken as
+    # unchanged without being decompressed.  The rest are decompressed
+    # and deserialized lazily, so attribute values with the same bytes
+    # aren't decoded either.  Only one pair of object files is held
+    # in memory at a time.
+    #
+    # The checksum is the CRC-32 and size from the cab directory.  A
+    # change that keeps both, and leaves the gobjectid and config
+    # version alone, would be missed.  With verify, those objects are
+    # decompressed and their bytes compared as well.
+    name = pkg.types.AaArchiveIndex.manifest_object_name
+    with (
+        pkg.decompress._open_package(old_path) as old_archive,
+        pkg.decompress._open_package(new_path) as new_archive
+    ):
+        (old_manifest, old_checksums, old_locations) = pkg.decompress._aapkg_directory(archive=old_archive, input_path=old_path, progress=progress)
+        (new_manifest, new_checksums, new_locations) = pkg.decompress._aapkg_directory(archive=new_archive, input_path=new_path, progress=progress)
+        old_entries = {x.tag_name: x for x in pkg.decompress.iter_manifest_objects(old_manifest)}
+        new_entries = {x.tag_name: x for x in pkg.decompress.iter_manifest_objects(new_manifest)}
+
+        unchanged = []
+        candidates = []
+        for (tag_name, new_entry) in new_entries.items():
+            old_entry = old_entries.get(tag_name)
+            if old_entry is None: continue
+            old_checksum = old_checksums.get(name(old_entry))
+            if (
+                not(verify) and
+                (old_entry.gobjectid == new_entry.gobjectid) and
+                (old_entry.config_version == new_entry.config_version) and
+                (old_checksum is not None) and
+                (old_checksum == new_checksums.get(name(new_entry)))
+            ):
+                unchanged.append(tag_name)
+            else:
+                candidates.append((old_entry, new_entry))
+
+        # Read in cab order so that each cab is opened once when
+        # both packages have the same layout
+        missing = ('', '')
+        candidates.sort(key=lambda x: (old_locations.get(name(x[0]), missing), new_locations.get(name(x[1]), missing)))
+
+        changed = []
+        failed = {}
+        (done, nbytes) = (0, 0)
+        total = len(candidates)
+        if progress is not None: progress(AaProgressStage.Deserialize, '', done, total, nbytes)
+        with pkg.decompress._AaCabReader(old_archive) as old_reader, pkg.decompress._AaCabReader(new_archive) as new_reader:
+            for (old_entry, new_entry) in candidates:
+                old_location = old_locations.get(name(old_entry))
+                new_location = new_locations.get(name(new_entry))
+                a = None if old_location is None else old_reader.read(old_location)
+                b = None if new_location is None else new_reader.read(new_location)
+                (done, nbytes) = (done + 1, nbytes + len(a or b'') + len(b or b''))
+                if (a is None) or (b is None):
+                    failed[new_entry.tag_name] = f'Object file not found in {old_path if a is None else new_path}.'
+                    warn(f'Object file for {new_entry.tag_name} not found in {old_path if a is None else new_path}.')
+                elif a == b:
+                    unchanged.append(new_entry.tag_name)
+                else:
+                    try:
+                        result = diff_objects(obj.deserialize.deserialize_aaobject(a, lazy=True), obj.deserialize.deserialize_aaobject(b, lazy=True))
+                        if result.is_empty:
+                            unchanged.append(new_entry.tag_name)
+                        else:
+                            changed.append(result)
+                    except Exception as e:
+                        failed[new_entry.tag_name] = f'Failed to deserialize: {e!r}'
+                        warn(f'Failed to deserialize {new_entry.tag_name}: {e!r}')
+                if progress is not None: progress(AaProgressStage.Deserialize, new_entry.tag_name, done, total, nbytes)
+
+    return AaPackageDiff(
+        added=[x for x in new_entries if x not in old_entries],
+        removed=[x for x in old_entries if x not in new_entries],
+        changed=changed,
+        unchanged=unchanged,
+        failed=failed
+    )
+
+def _attribute_label(attribute: obj.types.AaObjectAttribute) -> str:
+    return attribute.name if attribute.name else f'#{attribute.id}'
+
+def format_package_diff(diff: AaPackageDiff) -> str:
+    # Plain text summary, one line per change
+    lines = []
+    lines.extend(f'+ {x}' for x in diff.added)
+    lines.extend(f'- {x}' for x in diff.removed)
+    lines.extend(f'! {x}: {reason}' for (x, reason) in diff.failed.items())
+    for item in diff.changed:
+        lines.append(f'~ {item.tag_name}')
+        for (name, (a, b)) in item.header.items(): lines.append(f'    ~ header.{name}: {a!r} -> {b!r}')
+        lines.extend(f'    + {x}' for x in item.added_extensions)
+        lines.extend(f'    - {x}' for x in item.removed_extensions)
+        for extension in item.changed_extensions:
+            lines.append(f'    ~ {extension.name}')
+            lines.extend(f'        + {_attribute_label(x)}' for x in extension.added_attributes)
+            lines.extend(f'        - {_attribute_label(x)}' for x in extension.removed_attributes)
+            for change in extension.changed_attributes:
+                lines.append(f'        ~ {_attribute_label(change.new)}: {change.old.value.value!r} -> {change.new.value.value!r}')
+            if extension.script is not None:
+                for changes in extension.script.changes.values():
+                    lines.extend(f'          {x}' for x in changes)
+    return '\n'.join(lines)
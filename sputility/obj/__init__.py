@@ -1,5 +1,9 @@
 from . import attributes
+from . import cache
 from . import deserialize
+from . import encoder
 from . import enums
 from . import primitives
+from . import serialize
+from . import trace
 from . import types
\ No newline at end of file
@@ -1,8 +1,9 @@
 from . import enums
 from . import primitives
+from . import trace
 from . import types
 
-def get_attr_type1(input: types.AaBinStream) -> types.AaObjectAttribute:
+def get_attr_type1(input: types.AaBinStream, lazy: bool = False, compact: bool = False) -> types.AaObjectAttribute:
     offset=input.offset
     primitives._seek_forward(input=input, length=2)
     id = primitives._seek_int(input=input, length=2)
@@ -21,7 +22,7 @@ def get_attr_type1(input: types.AaBinStream) -> types.AaObjectAttribute:
     primitives._seek_forward(input=input, length=8)
     parent_name = primitives._seek_string_var_len(input=input, length=2, mult=2)
     primitives._seek_forward(input=input, length=2)
-    value = primitives._seek_object_value(input=input)
+    value = primitives._seek_object_value(input=input, lazy=lazy, compact=compact)
 
     return types.AaObjectAttribute(
         offset=offset,
@@ -39,7 +40,7 @@ def get_attr_type1(input: types.AaBinStream) -> types.AaObjectAttribute:
         primitive_name=None
     )
 
-def get_attr_type2(input: types.AaBinStream) -> types.AaObjectAttribute:
+def get_attr_type2(input: types.AaBinStream, lazy: bool = False, compact: bool = False) -> types.AaObjectAttribute:
     offset=input.offset
     # Why is this backwards from the user defined attributes??
     # Thanks WW
@@ -61,14 +62,13 @@ def get_attr_type2(input: types.AaBinStream) -> types.AaObjectAttribute:
         # For some versions there are 11 bytes here with yet unknown purpose prior to the Value object.
         # For some versions there are 13 bytes.
         # Maybe this requires knowing the manifest version to know for sure how to interpet.
-        slide_length = 0
-        while not(primitives._lookahead_pattern(input=input, pattern=primitives.PATTERN_OBJECT_VALUE)):
-            primitives._seek_forward(input=input,length=1)
-            slide_length += 1
-            if slide_length > 13: raise Exception(f'Attribute longer than expected at offset {input.offset:0X}.')
+        slide_length = primitives._seek_to_pattern(input=input, pattern=primitives.PATTERN_OBJECT_VALUE, max_length=13)
+        if slide_length < 0: raise Exception(f'Attribute longer than expected at offset {input.offset + 14:0X}.')
 
-    value = primitives._seek_object_value(input=input)
-    if (attr_type != value.datatype): print(f'Attribute type {attr_type:0X} {value.datatype:0X} at {input.offset:0X}.')
+    value = primitives._seek_object_value(input=input, lazy=lazy, compact=compact)
+    if (attr_type != value.datatype):
+        tracer = trace.TRACER
+        if tracer is not None: tracer.event(f'Attribute type {attr_type:0X} {value.datatype:0X}', input.offset)
 
     return types.AaObjectAttribute(
         offset=offset,
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from . import types
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+# Once the cache grows past max_size it is trimmed to this fraction
+# of it, so that it isn't rescanned on every put after it fills up.
+EVICT_LOW_WATER = 0.9
+CACHE_FILE_EXT = '.pkl'
+
+class AaObjectCache:
+    # On-disk cache of deserialized objects.
+    #
+    # Entries are keyed by a hash of the object bytes and the library
+    # version, so any change to either is a miss.  Reads refresh the
+    # entry's modified time and the least recently used entries are
+    # removed once the cache grows past max_size bytes, until it is
+    # back down to EVICT_LOW_WATER of max_size.
+    #
+    # Objects are cached as decoded with the default value decoders.
+    # Use a separate cache folder if decoders are overridden.
+    def __init__(self, path: str, max_size: int = DEFAULT_MAX_SIZE):
+        from .. import __version__
+        self.path = path
+        self.max_size = max_size
+        self._version = __version__.encode('utf-8')
+        self._size = None
+        os.makedirs(path, exist_ok=True)
+
+    def __getstate__(self) -> dict:
+        # Shared with worker processes by path, the running size
+        # is recalculated by each process, so hand the cache to a
+        # worker once rather than with every task.
+        return {'path': self.path, 'max_size': self.max_size}
+
+    def __setstate__(self, state: dict):
+        self.__init__(path=state['path'], max_size=state['max_size'])
+
+    def _key(self, data: bytes | memoryview) -> str:
+        digest = hashlib.sha256(self._version)
+        digest.update(b'\x00')
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f'{key}{CACHE_FILE_EXT}')
+
+    def _entries(self) -> list[os.DirEntry]:
+        entries = []
+        with os.scandir(self.path) as folders:
+            for folder in folders:
+                if not(folder.is_dir()): continue
+                with os.scandir(folder.path) as files:
+                    entries.extend(x for x in files if x.name.endswith(CACHE_FILE_EXT))
+        return entries
+
+    def get(self, data: bytes | memoryview) -> types.AaObject:
+        entry_path = self._entry_path(self._key(data))
+        try:
+            with open(entry_path, 'rb') as f:
+                obj = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Damaged entries are dropped and treated as a miss.
+            self._remove(entry_path)
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return obj
+
+    def put(self, data: bytes | memoryview, obj: types.AaObject):
+        entry_path = self._entry_path(self._key(data))
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        # Written to a temporary file first so that other processes
+        # never see a partial entry.
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(entry_path), suffix='.tmp', delete=False) as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            temp_path = f.name
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, entry_path)
+
+        if self._size is None: self._size = self.size()
+        else: self._size += size
+        if self._size > self.max_size: self.evict(max_size=int(self.max_size * EVICT_LOW_WATER))
+
+    def _remove(self, entry_path: str) -> int:
+        try:
+            size = os.path.getsize(entry_path)
+            os.remove(entry_path)
+            return size
+        except OSError:
+            return 0
+
+    def size(self) -> int:
+        return sum(x.stat().st_size for x in self._entries())
+
+    def evict(self, max_size: int = None):
+        # Remove least recently used entries until the cache fits.
+        if max_size is None: max_size = self.max_size
+        entries = sorted(self._entries(), key=lambda x: x.stat().st_mtime)
+        total = sum(x.stat().st_size for x in entries)
+        for entry in entries:
+            if total <= max_size: break
+            total -= self._remove(entry.path)
+        self._size = total
+
+    def clear(self):
+        self.evict(max_size=0)
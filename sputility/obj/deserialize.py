@@ -1,26 +1,140 @@
-import json
-from dataclasses import asdict
+import mmap
 import os
 import pprint
+import struct
+from typing import Optional
 
+from .. import writers
 from . import attributes
+from . import cache
+from . import encoder
 from . import enums
 from . import primitives
+from . import trace
 from . import types
 
-PRINT_DEBUG_INFO = True
 PLACEHOLDER_ATTR_REFERENCE = '---.---'
 
-def _get_header(input: types.AaBinStream) -> types.AaObjectHeader:
-    if PRINT_DEBUG_INFO: print(f'>>>> START HEADER - OFFSET {input.offset:0X} >>>>')
-    base_gobjectid = primitives._seek_int(input=input)
-
+# Object files of at least this size are memory-mapped rather than
+# read.  Below it a plain read is faster.
+MMAP_MIN_SIZE = 256 * 1024
+
+# Fixed-size part of the header following the base gobject id
+# and the extra template bytes.  Skipped ranges are pad bytes.
+HEADER_LAYOUT = struct.Struct(
+    '<'
+    '4x'        # unknown
+    'I'         # this_gobjectid
+    '12x'
+    '64s'       # security_group
+    '12x'
+    'I'         # parent_gobjectid
+    '52x'
+    '64s'       # tagname
+    '596x'
+    '64s'       # contained_name
+    '36x'
+    'I'         # config_version
+    '16x'
+    '130s'      # hierarchal_name
+    '530x'
+    '64s'       # host_name
+    '2x'
+    '64s'       # container_name
+    '596x'
+    '64s'       # area_name
+    '2x'
+    '64s'       # derived_from
+    '596x'
+    '64s'       # based_on
+    '528x'
+)
+
+def _get_header_is_template(input: types.AaBinStream) -> bool:
     # If this is a template there will be four null bytes
     # Otherwise if those bytes are missing, it is an instance
     is_template = False
     if primitives._lookahead_pattern(input=input, pattern=primitives.PATTERN_TEMPLATE_VALUE):
         is_template =  True
         primitives._seek_forward(input=input, length=4)
+    return is_template
+
+def _get_header_galaxy_name(input: types.AaBinStream) -> str:
+    # Some versions have an extra block here
+    # Still looking for a better way to check the alignment.
+    extra_header_block = False
+    if not(primitives._lookahead_string_var_len(input=input)):
+        extra_header_block = True
+        primitives._seek_forward(input=input, length=660)
+    galaxy_name = primitives._seek_string_var_len(input=input)
+
+    # Some versions have a NoneType block here
+    if (primitives._lookahead_pattern(input=input, pattern=primitives.PATTERN_OBJECT_VALUE)):
+        unk02 = primitives._seek_object_value(input=input)
+        primitives._seek_end_section(input=input)
+
+    # Some versions have extra bytes here.
+    if extra_header_block:
+        primitives._seek_bytes(input=input, length=5)
+
+    # Trying to figure out whether this first
+    # byte being inserted means it is a template.
+    #
+    # Instances seem to be one byte shorter in this section.
+    is_instance = primitives._seek_bool(input=input)
+    if not(is_instance): primitives._seek_bool(input=input)
+    return galaxy_name
+
+def _get_header(input: types.AaBinStream) -> types.AaObjectHeader:
+    # Same result as _get_header_stepwise but the fixed-size
+    # part of the header is read in a single call.
+    tracer = trace.TRACER
+    if tracer is not None: tracer.section_start('header', input.offset)
+    base_gobjectid = primitives._seek_int(input=input)
+    is_template = _get_header_is_template(input=input)
+    (
+        this_gobjectid,
+        security_group,
+        parent_gobject_id,
+        tagname,
+        contained_name,
+        config_version,
+        hierarchal_name,
+        host_name,
+        container_name,
+        area_name,
+        derived_from,
+        based_on
+    ) = primitives._seek_struct(input=input, layout=HEADER_LAYOUT)
+    galaxy_name = _get_header_galaxy_name(input=input)
+
+    if tracer is not None: tracer.section_end('header', input.offset)
+    return types.AaObjectHeader(
+        base_gobjectid=base_gobjectid,
+        is_template=is_template,
+        this_gobjectid=this_gobjectid,
+        security_group=primitives._decode_string(security_group),
+        parent_gobjectid=parent_gobject_id,
+        tagname=primitives._decode_string(tagname),
+        contained_name=primitives._decode_string(contained_name),
+        config_version=config_version,
+        hierarchal_name=primitives._decode_string(hierarchal_name),
+        host_name=primitives._decode_string(host_name),
+        container_name=primitives._decode_string(container_name),
+        area_name=primitives._decode_string(area_name),
+        derived_from=primitives._decode_string(derived_from),
+        based_on=primitives._decode_string(based_on),
+        galaxy_name=galaxy_name,
+        code_base=None
+    )
+
+def _get_header_stepwise(input: types.AaBinStream) -> types.AaObjectHeader:
+    # Original field-by-field decoder.  Kept as the reference
+    # for HEADER_LAYOUT and for benchmarking.
+    tracer = trace.TRACER
+    if tracer is not None: tracer.section_start('header', input.offset)
+    base_gobjectid = primitives._seek_int(input=input)
+    is_template = _get_header_is_template(input=input)
 
     primitives._seek_forward(input=input, length=4)
     this_gobjectid = primitives._seek_int(input=input)
@@ -48,32 +162,9 @@ def _get_header(input: types.AaBinStream) -> types.AaObjectHeader:
     primitives._seek_forward(input=input, length=596)
     based_on = primitives._seek_string(input=input)
     primitives._seek_forward(input=input, length=528)
+    galaxy_name = _get_header_galaxy_name(input=input)
 
-    # Some versions have an extra block here
-    # Still looking for a better way to check the alignment.
-    extra_header_block = False
-    if not(primitives._lookahead_string_var_len(input=input)):
-        extra_header_block = True
-        primitives._seek_forward(input=input, length=660)
-    galaxy_name = primitives._seek_string_var_len(input=input)
-
-    # Some versions have a NoneType block here
-    if (primitives._lookahead_pattern(input=input, pattern=primitives.PATTERN_OBJECT_VALUE)):
-        unk02 = primitives._seek_object_value(input=input)
-        primitives._seek_end_section(input=input)
-
-    # Some versions have extra bytes here.
-    if extra_header_block:
-        primitives._seek_bytes(input=input, length=5)
-
-    # Trying to figure out whether this first
-    # byte being inserted means it is a template.
-    #
-    # Instances seem to be one byte shorter in this section.
-    is_instance = primitives._seek_bool(input=input)
-    if not(is_instance): primitives._seek_bool(input=input)
-
-    if PRINT_DEBUG_INFO: print(f'>>>> END HEADER - OFFSET {input.offset:0X} >>>>')
+    if tracer is not None: tracer.section_end('header', input.offset)
     return types.AaObjectHeader(
         base_gobjectid=base_gobjectid,
         is_template=is_template,
@@ -107,11 +198,12 @@ def _get_primitive_name(section_name: str, extension_name: str) -> str:
             return f'{section_name}_{extension_name}'
     return ''
 
-def _get_extension(input: types.AaBinStream) -> types.AaObjectExtension:
-    if PRINT_DEBUG_INFO: print(f'>>>> START EXTENSION - OFFSET {input.offset:0X} >>>>')
+def _get_extension(input: types.AaBinStream, lazy: bool = False, compact: bool = False) -> types.AaObjectExtension:
+    tracer = trace.TRACER
+    if tracer is not None: tracer.section_start('extension', input.offset)
     instance_id = primitives._seek_int(input=input)
     instance_name = primitives._seek_string(input=input)
-    if PRINT_DEBUG_INFO: print(f'>>>>>>>> INSTANCE ID: {instance_id:0X}, INSTANCE NAME: {instance_name}')
+    if tracer is not None: tracer.event(f'INSTANCE ID: {instance_id:0X}, INSTANCE NAME: {instance_name}', input.offset)
     primitives._seek_forward(input=input, length=596)
     primitives._seek_forward(input=input, length=20) # header?
     extension_name = primitives._seek_string(input=input)
@@ -131,7 +223,7 @@ def _get_extension(input: types.AaBinStream) -> types.AaObjectExtension:
     if (extension_name.casefold() == enums.AaExtensionFormatted.ScriptExtension.casefold()):
         #if (unk01 == 0x01) and (unk02 == 0x80) and (unk03 == 0x01) and (unk04 == 0x02) and (unk05 == 0x00):
         if (unk01 == 0x01) and (unk05 == 0x00):
-            if PRINT_DEBUG_INFO: print(f'>>>>>>>> LOOKS LIKE SCRIPT SECTION WITH FUNCTION LIBRARY >>>>')
+            if tracer is not None: tracer.event('LOOKS LIKE SCRIPT SECTION WITH FUNCTION LIBRARY', input.offset)
             primitives._seek_forward(input=input, length=4)
             scriptlibs_count = primitives._seek_int(input=input)
 
@@ -145,12 +237,13 @@ def _get_extension(input: types.AaBinStream) -> types.AaObjectExtension:
             primitives._seek_forward(input=input, length=448)
 
     attr_count = primitives._seek_int(input=input)
-    if PRINT_DEBUG_INFO: print(f'>>>>>>>> EXPECTING {attr_count} ATTR1s >>>>')
-    attrs = []
+    if tracer is not None: tracer.event(f'EXPECTING {attr_count} ATTR1s', input.offset)
+    attrs = types.AaAttributeList()
     if attr_count > 0:
         for i in range(attr_count):
-            if PRINT_DEBUG_INFO: print(f'>>>>>>>> START ATTR1 - OFFSET {input.offset:0X} >>>>')
-            attr = attributes.get_attr_type1(input=input)
+            if tracer is not None: tracer.section_start('attr1', input.offset)
+            attr = attributes.get_attr_type1(input=input, lazy=lazy, compact=compact)
+            if tracer is not None: tracer.section_end('attr1', input.offset)
             attr.name = _get_attribute_fullname(section_name=instance_name, attribute_name=attr.name)
             attr.primitive_name = primitive_name
             attrs.append(attr)
@@ -164,20 +257,21 @@ def _get_extension(input: types.AaBinStream) -> types.AaObjectExtension:
     # 4 - ???
     messages = []
     for i in range(4):
-        messages.append(primitives._seek_object_value(input=input))
+        messages.append(primitives._seek_object_value(input=input, lazy=lazy, compact=compact))
 
     attr_count = primitives._seek_int(input=input)
-    if PRINT_DEBUG_INFO: print(f'>>>>>>>> EXPECTING {attr_count} ATTR2s >>>>')
+    if tracer is not None: tracer.event(f'EXPECTING {attr_count} ATTR2s', input.offset)
     if attr_count > 0:
         for i in range(attr_count):
-            if PRINT_DEBUG_INFO: print(f'>>>>>>>> START ATTR2 - OFFSET {input.offset:0X} >>>>')
-            attr = attributes.get_attr_type2(input=input)
+            if tracer is not None: tracer.section_start('attr2', input.offset)
+            attr = attributes.get_attr_type2(input=input, lazy=lazy, compact=compact)
+            if tracer is not None: tracer.section_end('attr2', input.offset)
             attr.name = _get_attribute_fullname(section_name=instance_name, attribute_name=attr.name)
             attr.primitive_name = primitive_name
             attrs.append(attr)
 
     #print(f'Instance Name: {instance_name}, Extension Type: {extension_type}, Extension Name: {extension_name}, Type: {enums.AaExtension(extension_type).name}')
-    if PRINT_DEBUG_INFO: print(f'>>>> END EXTENSION - OFFSET {input.offset:0X} >>>>')
+    if tracer is not None: tracer.section_end('extension', input.offset)
     return types.AaObjectExtension(
         instance_id=instance_id,
         instance_name=instance_name,
@@ -250,66 +344,95 @@ def _format_script_extension(extension: types.AaObjectExtension) -> types.AaScri
         content=content
     )
 
-def _formatted_script_to_folder(extension: types.AaObjectExtension, output_path: str):
+def _formatted_script_to_folder(
+    extension: types.AaObjectExtension,
+    output_path: str,
+    writer: writers.AaWriter,
+    indent: Optional[int] = 4
+):
     script = _format_script_extension(extension=extension)
     ext_path = os.path.join(output_path, script.header.name)
-    os.makedirs(ext_path, exist_ok=True)
 
     file = os.path.join(ext_path, 'header.json')
-    with open(file, 'w', encoding='utf-8') as f:
-        f.write(json.dumps(asdict(script.header), indent=4, default=str))
+    writer.write_text(file, encoder.to_json(script.header, indent=indent), encoding='utf-8')
 
     if (len(script.content.aliases) > 0):
         file = os.path.join(ext_path, 'aliases.txt')
-        with open(file, 'w', encoding='utf-8', newline='') as f:
-            f.write("\n".join(map(str, script.content.aliases)))
+        writer.write_text(file, "\n".join(map(str, script.content.aliases)), encoding='utf-8', newline='')
 
     if (len(script.content.declarations) > 0):
         file = os.path.join(ext_path, 'declarations.txt')
-        with open(file, 'w', encoding='utf-8', newline='') as f:
-            f.write(script.content.declarations)
+        writer.write_text(file, script.content.declarations, encoding='utf-8', newline='')
 
     if (len(script.content.body_text_execute) > 0):
         file = os.path.join(ext_path, 'execute.txt')
-        with open(file, 'w', encoding='utf-8', newline='') as f:
-            f.write(script.content.body_text_execute)
+        writer.write_text(file, script.content.body_text_execute, encoding='utf-8', newline='')
 
     if (len(script.content.body_text_offscan) > 0):
         file = os.path.join(ext_path, 'offscan.txt')
-        with open(file, 'w', encoding='utf-8', newline='') as f:
-            f.write(script.content.body_text_offscan)
+        writer.write_text(file, script.content.body_text_offscan, encoding='utf-8', newline='')
 
     if (len(script.content.body_text_onscan) > 0):
         file = os.path.join(ext_path, 'onscan.txt')
-        with open(file, 'w', encoding='utf-8', newline='') as f:
-            f.write(script.content.body_text_onscan) 
+        writer.write_text(file, script.content.body_text_onscan, encoding='utf-8', newline='')
 
     if (len(script.content.body_text_shutdown) > 0):
         file = os.path.join(ext_path, 'shutdown.txt')
-        with open(file, 'w', encoding='utf-8', newline='') as f:
-            f.write(script.content.body_text_shutdown)
+        writer.write_text(file, script.content.body_text_shutdown, encoding='utf-8', newline='')
 
     if (len(script.content.body_text_startup) > 0):
         file = os.path.join(ext_path, 'startup.txt')
-        with open(file, 'w', encoding='utf-8', newline='') as f:
-            f.write(script.content.body_text_startup)
+        writer.write_text(file, script.content.body_text_startup, encoding='utf-8', newline='')
 
-def deserialize_aaobject(input: str| bytes) -> types.AaObject:
+def _map_aaobject(file) -> memoryview:
+    # The mapping stays open for as long as any view into it is
+    # held, such as by the undecoded values of a lazy object.
+    return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+def _read_aaobject(
+    input: str | bytes | bytearray | memoryview,
+    use_mmap: Optional[bool] = None
+) -> bytes | bytearray | memoryview:
     # Read in object from memory or from file.
     #
     # On disk this should be a *.txt file extracted
-    # from an *.aapkg file.
-    data: bytes
+    # from an *.aapkg file.  Files are memory-mapped if use_mmap
+    # is set, or when it is None, if they are at least MMAP_MIN_SIZE
+    # bytes.  Mapped files are parsed from the page cache without
+    # being copied and the pages are shared between processes.
+    data: bytes | bytearray | memoryview
     if isinstance(input, (str, os.PathLike)):
-        try:
-            with open(input, 'rb') as file:
-                data = file.read()
-        except:
-            pass
-    elif isinstance(input, bytes):
-        data = bytes(input)
+        with open(input, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if use_mmap is None: use_mmap = (size >= MMAP_MIN_SIZE)
+            data = None
+            if use_mmap and (size > 0):
+                # Files that can't be mapped are read normally
+                try:
+                    data = _map_aaobject(file)
+                except (OSError, ValueError):
+                    pass
+            if data is None: data = file.read()
+    elif isinstance(input, (bytes, bytearray, memoryview)):
+        # Parsed in place through a memoryview, no copy is made.
+        data = input
     else:
         raise TypeError('Input must be a file path (str/PathLike) or bytes.')
+    return data
+
+def deserialize_aaobject(
+    input: str | bytes | bytearray | memoryview,
+    lazy: bool = False,
+    use_mmap: Optional[bool] = None,
+    compact: bool = False
+) -> types.AaObject:
+    # With lazy=True attribute values are only decoded when
+    # they are first read, which is much faster when only a
+    # few attributes per object are used.
+    #
+    # With compact=True boolean and numeric array values are
+    # returned as array.array rather than lists.
+    data = _read_aaobject(input, use_mmap=use_mmap)
 
     # Use this binary stream to aid with decoding
     # so that the data can be parsed through
@@ -319,12 +442,14 @@ def deserialize_aaobject(input: str| bytes) -> types.AaObject:
     )
 
     # Deserialize content
+    tracer = trace.TRACER
+    if tracer is not None: tracer.section_start('object', obj.offset)
     header = _get_header(input=obj)
     extension_count = primitives._seek_int(input=obj)
-    if PRINT_DEBUG_INFO: print(f'>>>> EXPECTING {extension_count} EXTENSIONS >>>>')
-    extensions = []
+    if tracer is not None: tracer.event(f'EXPECTING {extension_count} EXTENSIONS', obj.offset)
+    extensions = types.AaExtensionList()
     for i in range(extension_count):
-        extensions.append(_get_extension(input=obj))
+        extensions.append(_get_extension(input=obj, lazy=lazy, compact=compact))
 
     # After all extensions are over - templates have
     # more content that is mostly not reviewed yet.
@@ -343,9 +468,11 @@ def deserialize_aaobject(input: str| bytes) -> types.AaObject:
         primitives._seek_forward(input=obj, length=584)
         config_version = primitives._seek_int(input=obj)
 
+    if tracer is not None: tracer.section_end('object', obj.offset)
+
     # Return structures object
     return types.AaObject(
-        size=len(obj.data),
+        size=obj.size,
         offset=obj.offset,
         header=header,
         extensions=extensions
@@ -353,34 +480,62 @@ def deserialize_aaobject(input: str| bytes) -> types.AaObject:
 
 def aaobject_to_folder(
     input: str | bytes,
-    output_path: str
-) -> types.AaObject:
+    output_path: str,
+    cache: Optional[cache.AaObjectCache] = None,
+    writer: Optional[writers.AaWriter] = None,
+    indent: Optional[int] = 4
+) -> writers.AaWriteResult[types.AaObject]:
     # Create output folder if it doesn't exist yet
     if not(os.path.exists(output_path)): os.makedirs(output_path, exist_ok=True)
+    if writer is None: writer = writers.AaFolderWriter()
+    before = writer.snapshot()
+
+    obj = _deserialize_cached(input=input, cache=cache)
+    _aaobject_write_folder(obj=obj, output_path=output_path, writer=writer, indent=indent)
 
-    obj = deserialize_aaobject(input)
+    # Files left over from extensions that no longer exist
+    writer.remove_stale(os.path.join(output_path, obj.header.tagname))
+    writer.flush()
+    return writers.AaWriteResult(value=obj, stats=writer.stats.since(before))
+
+def _deserialize_cached(
+    input: str | bytes,
+    cache: Optional[cache.AaObjectCache] = None
+) -> types.AaObject:
+    # Only objects whose bytes aren't in the cache are parsed
+    if cache is None: return deserialize_aaobject(input)
+    data = _read_aaobject(input)
+    obj = cache.get(data)
+    if obj is None:
+        obj = deserialize_aaobject(data)
+        cache.put(data, obj)
+    return obj
+
+def _aaobject_write_folder(
+    obj: types.AaObject,
+    output_path: str,
+    writer: writers.AaWriter,
+    indent: Optional[int] = 4
+):
+    # indent=None writes compact JSON.  Stale files aren't removed
+    # here, callers do it once all their objects are written so
+    # the writer isn't flushed after every object.
     object_path = os.path.join(output_path, obj.header.tagname)
-    os.makedirs(object_path, exist_ok=True)
 
     # Object header info
     header_path = os.path.join(object_path, 'header.json')
-    with open(header_path, 'w') as f:
-        f.write(json.dumps(asdict(obj.header), indent=4))
+    writer.write_text(header_path, encoder.to_json(obj.header, indent=indent))
 
     # Raw object extensions
     raw_path = os.path.join(object_path, 'raw')
     for ext in obj.extensions:
         ext_path = os.path.join(raw_path, 'extensions', str(ext.instance_id))
         ext_file = os.path.join(ext_path, f'{ext.primitive_name}.json')
-        os.makedirs(ext_path, exist_ok=True)
-        with open(ext_file, 'w') as f:
-            f.write(json.dumps(asdict(ext), indent=4, default=str))
+        writer.write_text(ext_file, encoder.to_json(ext, indent=indent))
 
     # Formatted object extensions
     formatted_path = os.path.join(object_path, 'formatted')
     script_path = os.path.join(formatted_path, 'scripts')
     for extension in obj.extensions:
         if (extension.extension_name.casefold() == enums.AaExtensionFormatted.ScriptExtension.casefold()):
-            _formatted_script_to_folder(extension=extension, output_path=script_path)
-
-    return obj
\ No newline at end of file
+            _formatted_script_to_folder(extension=extension, output_path=script_path, writer=writer, indent=indent)
@@ -0,0 +1,138 @@
+from array import array
+from collections.abc import Callable
+from dataclasses import fields
+from enum import Enum
+import json
+from typing import Any, Optional
+
+# JSON encoding for the object model.
+#
+# The model is walked directly instead of going through
+# dataclasses.asdict, which deep copies everything first.
+# Output matches json.dumps(asdict(value), indent=indent,
+# default=str):
+# - int and str enums are written as their values
+# - datetime, timedelta and anything else unknown as str(value)
+# - arrays as lists
+
+_encode_string = json.encoder.encode_basestring_ascii
+
+def _encode_float(value: float) -> str:
+    if value != value: return 'NaN'
+    if value == float('inf'): return 'Infinity'
+    if value == float('-inf'): return '-Infinity'
+    return float.__repr__(value)
+
+# Per-type field names and handlers, filled in on first use
+_FIELDS: dict[type, tuple[str, ...]] = {}
+_TEXT_HANDLERS: dict[type, Callable[[Any, list[str], str, int], None]] = {}
+
+def _field_names(cls: type) -> tuple[str, ...]:
+    names = _FIELDS.get(cls)
+    if names is None:
+        names = tuple(f.name for f in fields(cls))
+        _FIELDS[cls] = names
+    return names
+
+def _kind(cls: type) -> str:
+    # Enum checks come first as int and str enums also
+    # pass the int/str checks.
+    if cls is bool: return 'bool'
+    if cls is type(None): return 'none'
+    if issubclass(cls, Enum):
+        if issubclass(cls, int): return 'int'
+        if issubclass(cls, str): return 'str'
+        return 'other'
+    if issubclass(cls, bool): return 'bool'
+    if issubclass(cls, int): return 'int'
+    if issubclass(cls, float): return 'float'
+    if issubclass(cls, str): return 'str'
+    if hasattr(cls, '__dataclass_fields__'): return 'dataclass'
+    if issubclass(cls, (list, tuple)): return 'list'
+    if issubclass(cls, array): return 'array'
+    if issubclass(cls, dict): return 'dict'
+    return 'other'
+
+def _separators(indent: Optional[str], level: int) -> tuple[str, str, str]:
+    # Text after the opening bracket, between items and
+    # before the closing bracket.
+    if indent is None: return ('', ', ', '')
+    inner = '\n' + indent * (level + 1)
+    return (inner, ',' + inner, '\n' + indent * level)
+
+def _write_value(value, chunks: list[str], indent: Optional[str], level: int):
+    handler = _TEXT_HANDLERS.get(type(value))
+    if handler is None: handler = _text_handler(type(value))
+    handler(value, chunks, indent, level)
+
+def _write_list(value, chunks: list[str], indent: Optional[str], level: int):
+    if not(len(value)):
+        chunks.append('[]')
+        return
+    (first, following, last) = _separators(indent, level)
+    separator = '[' + first
+    for item in value:
+        chunks.append(separator)
+        _write_value(item, chunks, indent, level + 1)
+        separator = following
+    chunks.append(last + ']')
+
+def _write_dict(value: dict, chunks: list[str], indent: Optional[str], level: int):
+    if not(value):
+        chunks.append('{}')
+        return
+    (first, following, last) = _separators(indent, level)
+    separator = '{' + first
+    for (key, item) in value.items():
+        chunks.append(separator + _encode_string(key) + ': ')
+        _write_value(item, chunks, indent, level + 1)
+        separator = following
+    chunks.append(last + '}')
+
+def _dataclass_writer(cls: type) -> Callable[[Any, list[str], str, int], None]:
+    # Keys are encoded once per class
+    names = _field_names(cls)
+    if not(names): return lambda value, chunks, indent, level: chunks.append('{}')
+    keys = tuple((name, _encode_string(name) + ': ') for name in names)
+
+    def _write_dataclass(value, chunks: list[str], indent: Optional[str], level: int):
+        (first, following, last) = _separators(indent, level)
+        separator = '{' + first
+        for (name, key) in keys:
+            chunks.append(separator + key)
+            _write_value(getattr(value, name), chunks, indent, level + 1)
+            separator = following
+        chunks.append(last + '}')
+    return _write_dataclass
+
+def _text_handler(cls: type) -> Callable[[Any, list[str], str, int], None]:
+    handler = _TEXT_HANDLERS.get(cls)
+    if handler is not None: return handler
+
+    kind = _kind(cls)
+    if kind == 'bool':
+        handler = lambda value, chunks, indent, level: chunks.append('true' if value else 'false')
+    elif kind == 'none':
+        handler = lambda value, chunks, indent, level: chunks.append('null')
+    elif kind == 'int':
+        handler = lambda value, chunks, indent, level: chunks.append(int.__repr__(value))
+    elif kind == 'float':
+        handler = lambda value, chunks, indent, level: chunks.append(_encode_float(value))
+    elif kind == 'str':
+        handler = lambda value, chunks, indent, level: chunks.append(_encode_string(value))
+    elif kind == 'dataclass':
+        handler = _dataclass_writer(cls)
+    elif kind in ('list', 'array'):
+        handler = _write_list
+    elif kind == 'dict':
+        handler = _write_dict
+    else:
+        handler = lambda value, chunks, indent, level: chunks.append(_encode_string(str(value)))
+    _TEXT_HANDLERS[cls] = handler
+    return handler
+
+def to_json(value: Any, indent: Optional[int] = 4) -> str:
+    # indent=None gives compact single line output.
+    chunks = []
+    _write_value(value, chunks, None if indent is None else ' ' * indent, 0)
+    return ''.join(chunks)
@@ -1,5 +1,10 @@
+from array import array
+import codecs
+from collections.abc import Callable
 from datetime import datetime, timedelta, timezone
+from functools import partial
 import struct
+import sys
 from warnings import warn
 
 from . import enums
@@ -9,8 +14,29 @@ PATTERN_OBJECT_VALUE = b'\xB1\x55\xD9\x51\x86\xB0\xD2\x11\xBF\xB1\x00\x10\x4B\x5
 PATTERN_TEMPLATE_VALUE = b'\x00\x00\x00\x00'
 PATTERN_END = b'\x00\x00\x00\x00\x00\x00\x00\x00'
 
+_STRUCT_FILETIME = struct.Struct('<Q')
+_STRUCT_FLOAT = struct.Struct('<f')
+_STRUCT_DOUBLE = struct.Struct('<d')
+_STRUCT_UINT = {
+    1: struct.Struct('<B'),
+    2: struct.Struct('<H'),
+    4: struct.Struct('<I'),
+    8: struct.Struct('<Q'),
+}
+
+# Unsigned array typecodes by element size.  The C types behind
+# the typecodes vary between platforms so they are looked up.
+_ARRAY_UINT = {array(typecode).itemsize: typecode for typecode in 'QLIHB'}
+_BIG_ENDIAN = (sys.byteorder == 'big')
+
+# Maps every non-zero byte to 1
+_NONZERO_BYTES = bytes([0]) + bytes([1]) * 255
+
 def _filetime_to_datetime(input: bytes) -> datetime:
-    filetime = struct.unpack('<Q', input[:8])[0]
+    filetime = _STRUCT_FILETIME.unpack_from(input)[0]
+    return _filetime_ticks_to_datetime(filetime)
+
+def _filetime_ticks_to_datetime(filetime: int) -> datetime:
     seconds = filetime // 10000000
     microseconds = (filetime % 10000000) // 10
     dt_utc = datetime(1601, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds, microseconds=microseconds)
@@ -21,8 +47,12 @@ def _ticks_to_timedelta(input: int) -> timedelta:
     td = timedelta(seconds=total_seconds)
     return td
 
-def _lookahead_bytes(input: types.AaBinStream, length: int) -> bytes:
-    if ((input.offset + length) > len(input.data)): raise MemoryError(f'Memory bounds exceeded.  Size: {len(input.data):0X}, Offset: {input.offset:0X}, Length: {length:0X}.')
+def _check_bounds(input: types.AaBinStream, length: int):
+    if ((input.offset + length) > input.end): raise MemoryError(f'Memory bounds exceeded.  Size: {input.size:0X}, Offset: {input.offset:0X}, Length: {length:0X}.')
+
+def _lookahead_bytes(input: types.AaBinStream, length: int) -> memoryview:
+    # Returns a view into the shared buffer, nothing is copied.
+    _check_bounds(input=input, length=length)
     value = input.data[input.offset:input.offset + length]
     return value
 
@@ -35,8 +65,21 @@ def _lookahead_int(input: types.AaBinStream, length: int = 4) -> int:
     return value
 
 def _lookahead_pattern(input: types.AaBinStream, pattern: bytes) -> bool:
-    actual = input.data[input.offset:input.offset + len(pattern)]
-    return (actual == pattern)
+    end = input.offset + len(pattern)
+    if end > input.end: return False
+    return (input.data[input.offset:end] == pattern)
+
+def _seek_to_pattern(input: types.AaBinStream, pattern: bytes, max_length: int) -> int:
+    # Moves forward to the next occurrence of the pattern, as long as it
+    # starts within max_length bytes of the current offset.  Returns the
+    # number of bytes skipped, or -1 with the offset unchanged if the
+    # pattern isn't found in that window.
+    end = input.offset + max_length + len(pattern)
+    if end > input.end: end = input.end
+    index = bytes(input.data[input.offset:end]).find(pattern)
+    if index < 0: return -1
+    input.offset += index
+    return index
 
 def _lookahead_multipattern(input: types.AaBinStream, patterns: list[bytes]) -> bool:
     for x in patterns:
@@ -50,10 +93,12 @@ def _lookahead_string_var_len(input: types.AaBinStream, length: int = 4, mult: i
     data_len = str_len * mult
     total_len = length + data_len
     #print(f'Data Length: {data_len}, Total Length: {total_len}')
-    data = _lookahead_bytes(input=input, length=total_len)
+    _check_bounds(input=input, length=total_len)
     obj = types.AaBinStream(
-        data=data,
-        offset=0
+        data=input.data,
+        offset=input.offset,
+        base=input.offset,
+        end=input.offset + total_len
     )
     value = _seek_string_var_len(input=obj).rstrip('\x00')
     expected_len = (str_len - 2) / (2 * mult)
@@ -66,59 +111,96 @@ def _seek_forward(input: types.AaBinStream, length: int):
     # Anywhere this is called, basically means that I don't
     # understand what a range of bytes means and want to skip
     # past it.
-    _seek_bytes(input=input, length=length)
+    if ((input.offset + length) > input.end): _check_bounds(input=input, length=length)
+    input.offset += length
 
 def _seek_bytes(input: types.AaBinStream, length: int = 4) -> bytes:
-    if ((input.offset + length) > len(input.data)): raise MemoryError(f'Memory bounds exceeded.  Size: {len(input.data):0X}, Offset: {input.offset:0X}, Length: {length:0X}.')
-    value = input.data[input.offset:input.offset + length]
+    if ((input.offset + length) > input.end): _check_bounds(input=input, length=length)
+    value = bytes(input.data[input.offset:input.offset + length])
     input.offset += length
     return value
 
-def _seek_binstream(input: types.AaBinStream, length: int = 4) -> types.AaBinStream:
-    obj_len = int.from_bytes(input.data[input.offset: input.offset + length], 'little')
-    input.offset += length
-    length = obj_len
+def _seek_view(input: types.AaBinStream, length: int = 4) -> memoryview:
+    # Same as _seek_bytes but returns a view into the shared
+    # buffer for values that are decoded further.
+    if ((input.offset + length) > input.end): _check_bounds(input=input, length=length)
     value = input.data[input.offset:input.offset + length]
     input.offset += length
+    return value
+
+def _seek_binstream(input: types.AaBinStream, length: int = 4) -> types.AaBinStream:
+    # The sub-stream shares the buffer of its parent and
+    # is bounded by the length prefix.
+    obj_len = _seek_int(input=input, length=length)
+    base = input.offset if (input.offset < input.end) else input.end
+    end = base + obj_len
+    if end > input.end: end = input.end
+    input.offset += obj_len
     return types.AaBinStream(
-        data=value,
-        offset=0
+        data=input.data,
+        offset=base,
+        base=base,
+        end=end
     )
 
+def _seek_struct(input: types.AaBinStream, layout: struct.Struct) -> tuple:
+    # Reads a whole fixed-size block in one call using a
+    # precompiled layout.
+    if ((input.offset + layout.size) > input.end): _check_bounds(input=input, length=layout.size)
+    value = layout.unpack_from(input.data, input.offset)
+    input.offset += layout.size
+    return value
+
+def _decode_string(input: bytes, decode: str = 'utf-16le') -> str:
+    # Calling the codec directly skips the codec lookup that
+    # bytes.decode/str() do on every call.
+    if decode == 'utf-16le':
+        value = codecs.utf_16_le_decode(input, 'strict', True)[0]
+    else:
+        value = str(input, decode)
+    return value.rstrip('\x00')
+
 def _seek_bool(input: types.AaBinStream) -> bool:
     value = bool(_seek_int(input=input, length=1))
     return value
 
 def _seek_float(input: types.AaBinStream) -> float:
     length = 4
-    value = struct.unpack('<f', input.data[input.offset:input.offset + length])[0]
+    if ((input.offset + length) > input.end): _check_bounds(input=input, length=length)
+    value = _STRUCT_FLOAT.unpack_from(input.data, input.offset)[0]
     input.offset += length
     return value
 
 def _seek_double(input: types.AaBinStream) -> float:
     length = 8
-    value = struct.unpack('<d', input.data[input.offset:input.offset + length])[0]
+    if ((input.offset + length) > input.end): _check_bounds(input=input, length=length)
+    value = _STRUCT_DOUBLE.unpack_from(input.data, input.offset)[0]
     input.offset += length
     return value
 
 def _seek_int(input: types.AaBinStream, length: int = 4) -> int:
-    value = int.from_bytes(input.data[input.offset:input.offset + length], 'little')
+    offset = input.offset
     input.offset += length
-    return value
+    if input.offset <= input.end:
+        unpacker = _STRUCT_UINT.get(length)
+        if unpacker is not None: return unpacker.unpack_from(input.data, offset)[0]
+        return int.from_bytes(input.data[offset:input.offset], 'little')
+
+    # Reads past the end are truncated the same way slicing would be.
+    return int.from_bytes(input.data[offset:input.end], 'little')
 
 def _seek_string(input: types.AaBinStream, length: int = 64, decode: str = 'utf-16le') -> str:
-    data = _seek_bytes(input=input, length=length)
-    value = data.decode(decode).rstrip('\x00')
+    data = _seek_view(input=input, length=length)
+    value = _decode_string(data, decode)
     return value
 
 def _seek_string_var_len(input: types.AaBinStream, length: int = 4, mult: int = 1, decode: str = 'utf-16le') -> str:
     # Some variable-length string fields start with 4 bytes to specify the length in bytes.
     # Other use 2 bytes to specify the length in characters.  For the latter specify length=2, mult=2.
-    str_len = int.from_bytes(input.data[input.offset: input.offset + length], 'little')
-    input.offset += length
+    str_len = _seek_int(input=input, length=length)
     length = str_len * mult
-    data = _seek_bytes(input=input, length=length)
-    value = data.decode(decode).rstrip('\x00')
+    data = _seek_view(input=input, length=length)
+    value = _decode_string(data, decode)
     return value
 
 def _seek_string_value_section(input: types.AaBinStream) -> str:
@@ -150,7 +232,7 @@ def _seek_reference_section(input: types.AaBinStream) -> types.AaReference:
 def _seek_status_section(input: types.AaBinStream) -> int:
     warn(f'StatusType not decoded yet, offset: {input.offset:0X}.')
     obj = _seek_binstream(input=input)
-    value = _seek_bytes(input=obj, length=len(obj.data))
+    value = _seek_bytes(input=obj, length=obj.remaining)
     return value
 
 def _seek_datatype_section(input: types.AaBinStream) -> int:
@@ -199,11 +281,8 @@ def _seek_international_string_value_section(input: types.AaBinStream) -> str:
     return value
 
 def _seek_datetime_var_len(input: types.AaBinStream, length: int = 4) -> datetime:
-    dt_len = int.from_bytes(input.data[input.offset: input.offset + length], 'little')
-    input.offset += length
-    length = dt_len
-    value = _filetime_to_datetime(input.data[input.offset: input.offset + length])
-    input.offset += length
+    dt_len = _seek_int(input=input, length=length)
+    value = _filetime_to_datetime(_seek_view(input=input, length=dt_len))
     return value
 
 def _seek_array(input: types.AaBinStream) -> list:
@@ -212,33 +291,71 @@ def _seek_array(input: types.AaBinStream) -> list:
     element_length = _seek_int(input=input, length=4)
     value = []
     for i in range(array_length):
-        value.append(input.data[input.offset:input.offset + element_length])
-        input.offset += element_length
+        value.append(_seek_view(input=input, length=element_length))
     return value
 
-def _seek_array_bool(input: types.AaBinStream) -> list[bool]:
-    obj = _seek_array(input=input)
-    value = []
-    for x in obj: value.append(bool(int.from_bytes(x, 'little')))
-    return value
-
-def _seek_array_int(input: types.AaBinStream) -> list[int]:
-    obj = _seek_array(input=input)
-    value = []
-    for x in obj: value.append(int.from_bytes(x, 'little'))
+def _seek_array_payload(input: types.AaBinStream) -> tuple[int, memoryview]:
+    # Same layout as _seek_array but the elements are returned
+    # as one contiguous view so they can be decoded in bulk.
+    _seek_forward(input=input, length=4)
+    array_length = _seek_int(input=input, length=2)
+    element_length = _seek_int(input=input, length=4)
+    payload = _seek_view(input=input, length=array_length * element_length)
+    return (element_length, payload)
+
+def _unpack_array(input: memoryview, typecode: str) -> array:
+    # Decodes a whole little-endian payload in one call.
+    value = array(typecode)
+    value.frombytes(input)
+    if _BIG_ENDIAN: value.byteswap()
     return value
 
-def _seek_array_float(input: types.AaBinStream) -> list[float]:
-    obj = _seek_array(input=input)
-    value = []
-    for x in obj: value.append(struct.unpack('<f', x)[0])
-    return value
-
-def _seek_array_double(input: types.AaBinStream) -> list[float]:
-    obj = _seek_array(input=input)
-    value = []
-    for x in obj: value.append(struct.unpack('<d', x)[0])
-    return value
+def _split_array(input: memoryview, element_length: int) -> list[memoryview]:
+    return [input[i:i + element_length] for i in range(0, len(input), element_length)]
+
+def _seek_array_bool(input: types.AaBinStream, compact: bool = False) -> list[bool] | array:
+    # Each byte is mapped to 0 or 1 and the bytes of each element
+    # are OR-ed together column by column, so any element size is
+    # decoded without a Python loop over the elements.
+    (element_length, payload) = _seek_array_payload(input=input)
+    bits = payload.tobytes().translate(_NONZERO_BYTES)
+    count = len(bits) // element_length
+    flags = 0
+    for k in range(element_length): flags |= int.from_bytes(bits[k::element_length], 'little')
+    value = array('B', flags.to_bytes(count, 'little'))
+    if compact: return value
+    return list(map(bool, value))
+
+def _seek_array_int(input: types.AaBinStream, compact: bool = False) -> list[int] | array:
+    (element_length, payload) = _seek_array_payload(input=input)
+    typecode = _ARRAY_UINT.get(element_length)
+    if typecode is None:
+        value = [int.from_bytes(x, 'little') for x in _split_array(payload, element_length)]
+        if compact: return array('Q', value)
+        return value
+    value = _unpack_array(payload, typecode)
+    if compact: return value
+    return value.tolist()
+
+def _seek_array_float(input: types.AaBinStream, compact: bool = False) -> list[float] | array:
+    (element_length, payload) = _seek_array_payload(input=input)
+    if element_length != _STRUCT_FLOAT.size:
+        value = [_STRUCT_FLOAT.unpack(x)[0] for x in _split_array(payload, element_length)]
+        if compact: return array('f', value)
+        return value
+    value = _unpack_array(payload, 'f')
+    if compact: return value
+    return value.tolist()
+
+def _seek_array_double(input: types.AaBinStream, compact: bool = False) -> list[float] | array:
+    (element_length, payload) = _seek_array_payload(input=input)
+    if element_length != _STRUCT_DOUBLE.size:
+        value = [_STRUCT_DOUBLE.unpack(x)[0] for x in _split_array(payload, element_length)]
+        if compact: return array('d', value)
+        return value
+    value = _unpack_array(payload, 'd')
+    if compact: return value
+    return value.tolist()
 
 def _seek_array_string(input: types.AaBinStream) -> list[str]:
     _seek_forward(input=input, length=4)
@@ -253,16 +370,25 @@ def _seek_array_string(input: types.AaBinStream) -> list[str]:
         value.append(string_value)
     return value
 
+def _seek_array_filetime(input: types.AaBinStream) -> list[int]:
+    # Raw FILETIME ticks, only the first 8 bytes of each element are used.
+    (element_length, payload) = _seek_array_payload(input=input)
+    if element_length == _STRUCT_FILETIME.size:
+        return _unpack_array(payload, _ARRAY_UINT[8]).tolist()
+    return [_STRUCT_FILETIME.unpack_from(x)[0] for x in _split_array(payload, element_length)]
+
 def _seek_array_datetime(input: types.AaBinStream) -> list[datetime]:
-    obj = _seek_array(input=input)
-    value = []
-    for x in obj: value.append(_filetime_to_datetime(x))
+    value = list(map(_filetime_ticks_to_datetime, _seek_array_filetime(input=input)))
     return value
 
 def _seek_array_timedelta(input: types.AaBinStream) -> list[datetime]:
-    obj = _seek_array(input=input)
-    value = []
-    for x in obj: value.append(_ticks_to_timedelta(int.from_bytes(x, 'little')))
+    (element_length, payload) = _seek_array_payload(input=input)
+    typecode = _ARRAY_UINT.get(element_length)
+    if typecode is None:
+        ticks = [int.from_bytes(x, 'little') for x in _split_array(payload, element_length)]
+    else:
+        ticks = _unpack_array(payload, typecode)
+    value = list(map(_ticks_to_timedelta, ticks))
     return value
 
 def _seek_array_reference(input: types.AaBinStream) -> list[types.AaReference]:
@@ -301,73 +427,164 @@ def _seek_array_reference(input: types.AaBinStream) -> list[types.AaReference]:
 def _seek_array_datatype(input: types.AaBinStream) -> list:
     obj = _seek_array(input=input)
     value = []
-    for x in obj: value.append(x)
+    for x in obj: value.append(bytes(x))
+    return value
+
+def _seek_none_value(input: types.AaBinStream) -> None:
+    return None
+
+def _seek_elapsed_time(input: types.AaBinStream) -> timedelta:
+    value = _ticks_to_timedelta(_seek_int(input=input, length=8))
     return value
 
-def _seek_object_value(input: types.AaBinStream, raise_mismatch: bool = True) -> types.AaObjectValue:
+def _skip_fixed(length: int) -> Callable[[types.AaBinStream], None]:
+    def _skip(input: types.AaBinStream) -> None:
+        _seek_forward(input=input, length=length)
+    return _skip
+
+def _skip_binstream(input: types.AaBinStream) -> None:
+    # Any value with a 4 byte length prefix.
+    length = _seek_int(input=input)
+    _seek_forward(input=input, length=length)
+
+def _skip_array(input: types.AaBinStream) -> None:
+    _seek_array_payload(input=input)
+
+def _skip_array_binstream(input: types.AaBinStream) -> None:
+    # String and reference arrays hold one length-prefixed
+    # section per element.
+    _seek_forward(input=input, length=4)
+    array_length = _seek_int(input=input, length=2)
+    _seek_forward(input=input, length=4)
+    for i in range(array_length):
+        _skip_binstream(input=input)
+
+# Decoders for each value type, keyed by the datatype byte that follows
+# the object value header.  Each one is called with the stream positioned
+# just after the datatype byte and must leave it at the end of the value.
+DEFAULT_VALUE_DECODERS: dict[int, Callable[[types.AaBinStream], object]] = {
+    enums.AaDataType.NoneType: _seek_none_value,
+    enums.AaDataType.BooleanType: _seek_bool,
+    enums.AaDataType.IntegerType: _seek_int,
+    enums.AaDataType.FloatType: _seek_float,
+    enums.AaDataType.DoubleType: _seek_double,
+    enums.AaDataType.StringType: _seek_string_value_section,
+    enums.AaDataType.TimeType: _seek_datetime_var_len,
+    enums.AaDataType.ElapsedTimeType: _seek_elapsed_time,
+    enums.AaDataType.ReferenceType: _seek_reference_section,
+    enums.AaDataType.StatusType: _seek_status_section,
+    enums.AaDataType.DataTypeType: _seek_datatype_section,
+    enums.AaDataType.QualifiedEnumType: _seek_qualifiedenum_section,
+    enums.AaDataType.QualifiedStructType: _seek_qualifiedstruct_section,
+    enums.AaDataType.InternationalizedStringType: _seek_international_string_value_section,
+    enums.AaDataType.ArrayBooleanType: _seek_array_bool,
+    enums.AaDataType.ArrayIntegerType: _seek_array_int,
+    enums.AaDataType.ArrayFloatType: _seek_array_float,
+    enums.AaDataType.ArrayDoubleType: _seek_array_double,
+    enums.AaDataType.ArrayStringType: _seek_array_string,
+    enums.AaDataType.ArrayTimeType: _seek_array_datetime,
+    enums.AaDataType.ArrayElapsedTimeType: _seek_array_timedelta,
+    enums.AaDataType.ArrayReferenceType: _seek_array_reference,
+    enums.AaDataType.ArrayDataTypeType: _seek_array_datatype,
+}
+
+# Decoders that move past a value without building it.  The
+# value is returned as None.
+SKIP_VALUE_DECODERS: dict[int, Callable[[types.AaBinStream], None]] = {
+    enums.AaDataType.NoneType: _seek_none_value,
+    enums.AaDataType.BooleanType: _skip_fixed(1),
+    enums.AaDataType.IntegerType: _skip_fixed(4),
+    enums.AaDataType.FloatType: _skip_fixed(4),
+    enums.AaDataType.DoubleType: _skip_fixed(8),
+    enums.AaDataType.StringType: _skip_binstream,
+    enums.AaDataType.TimeType: _skip_binstream,
+    enums.AaDataType.ElapsedTimeType: _skip_fixed(8),
+    enums.AaDataType.ReferenceType: _skip_binstream,
+    enums.AaDataType.StatusType: _skip_binstream,
+    enums.AaDataType.DataTypeType: _skip_fixed(4),
+    enums.AaDataType.QualifiedEnumType: _skip_binstream,
+    enums.AaDataType.QualifiedStructType: _skip_binstream,
+    enums.AaDataType.InternationalizedStringType: _skip_binstream,
+    enums.AaDataType.ArrayBooleanType: _skip_array,
+    enums.AaDataType.ArrayIntegerType: _skip_array,
+    enums.AaDataType.ArrayFloatType: _skip_array,
+    enums.AaDataType.ArrayDoubleType: _skip_array,
+    enums.AaDataType.ArrayStringType: _skip_array_binstream,
+    enums.AaDataType.ArrayTimeType: _skip_array,
+    enums.AaDataType.ArrayElapsedTimeType: _skip_array,
+    enums.AaDataType.ArrayReferenceType: _skip_array_binstream,
+    enums.AaDataType.ArrayDataTypeType: _skip_array,
+}
+
+# Default decoders of numeric arrays and the variants that return
+# them as array.array, used when values are decoded with compact=True.
+# Decoders registered in their place are used as they are.
+COMPACT_VALUE_DECODERS: dict[Callable[[types.AaBinStream], object], Callable[[types.AaBinStream], array]] = {
+    _seek_array_bool: partial(_seek_array_bool, compact=True),
+    _seek_array_int: partial(_seek_array_int, compact=True),
+    _seek_array_float: partial(_seek_array_float, compact=True),
+    _seek_array_double: partial(_seek_array_double, compact=True),
+}
+
+# The decoders in use.  Plain ints are used as keys so lookups
+# by the raw datatype byte don't go through the enum.
+_value_decoders: dict[int, Callable[[types.AaBinStream], object]] = {int(k): v for (k, v) in DEFAULT_VALUE_DECODERS.items()}
+_datatypes: dict[int, enums.AaDataType] = {x.value: x for x in enums.AaDataType}
+
+def register_value_decoder(datatype: int, decoder: Callable[[types.AaBinStream], object]):
+    # Replace the decoder for a datatype, including ones that
+    # aren't decoded by default such as SecurityClassificationType.
+    _value_decoders[int(datatype)] = decoder
+
+def register_value_skip(datatype: int):
+    # Skip over values of this datatype without decoding them.
+    decoder = SKIP_VALUE_DECODERS.get(int(datatype))
+    if decoder is None: raise NotImplementedError(f'No skip decoder for data type {datatype}.')
+    _value_decoders[int(datatype)] = decoder
+
+def get_value_decoder(datatype: int) -> Callable[[types.AaBinStream], object]:
+    return _value_decoders.get(int(datatype))
+
+def reset_value_decoders():
+    _value_decoders.clear()
+    _value_decoders.update({int(k): v for (k, v) in DEFAULT_VALUE_DECODERS.items()})
+
+def _seek_object_value(
+    input: types.AaBinStream,
+    raise_mismatch: bool = True,
+    lazy: bool = False,
+    compact: bool = False
+) -> types.AaObjectValue:
     # The meaning of these header bytes is unclear except that
     # they seem to sit ahead of all the Value objects.  If a mistake
     # has been made walking through the binary somewhere else,
     # this can catch the deserialization at the next attribute after
     # the mistake.
-    header = _seek_bytes(input=input, length=16)
+    header = _seek_view(input=input, length=16)
     if header != PATTERN_OBJECT_VALUE:
-        warn(f'Object value unexpected header: {header} at {input.offset:0X}')
+        warn(f'Object value unexpected header: {bytes(header)} at {input.offset:0X}')
         if raise_mismatch: raise Exception(f'Pattern mismatch at {input.offset:0X}')
 
     datatype = _seek_int(input=input, length=1)
-    value = None
-    match datatype:
-        case enums.AaDataType.NoneType.value:
-            value = None
-        case enums.AaDataType.BooleanType.value:
-            value = bool(_seek_int(input=input, length=1))
-        case enums.AaDataType.IntegerType.value:
-            value = _seek_int(input=input, length=4)
-        case enums.AaDataType.FloatType.value:
-            value = _seek_float(input=input)
-        case enums.AaDataType.DoubleType.value:
-            value = _seek_double(input=input)
-        case enums.AaDataType.StringType.value:
-            value = _seek_string_value_section(input=input)
-        case enums.AaDataType.TimeType.value:
-            value = _seek_datetime_var_len(input=input)
-        case enums.AaDataType.ElapsedTimeType.value:
-            value = _ticks_to_timedelta(_seek_int(input=input, length=8))
-        case enums.AaDataType.ReferenceType.value:
-            value = _seek_reference_section(input=input)
-        case enums.AaDataType.StatusType.value:
-            value = _seek_status_section(input=input)
-        case enums.AaDataType.DataTypeType.value:
-            value = _seek_datatype_section(input=input)
-        case enums.AaDataType.QualifiedEnumType.value:
-            value = _seek_qualifiedenum_section(input=input)
-        case enums.AaDataType.QualifiedStructType.value:
-            value = _seek_qualifiedstruct_section(input=input)
-        case enums.AaDataType.InternationalizedStringType.value:
-            value = _seek_international_string_value_section(input=input)
-        case enums.AaDataType.ArrayBooleanType.value:
-            value = _seek_array_bool(input=input)
-        case enums.AaDataType.ArrayIntegerType.value:
-            value = _seek_array_int(input=input)
-        case enums.AaDataType.ArrayFloatType.value:
-            value = _seek_array_float(input=input)
-        case enums.AaDataType.ArrayDoubleType.value:
-            value = _seek_array_double(input=input)
-        case enums.AaDataType.ArrayStringType.value:
-            value = _seek_array_string(input=input)
-        case enums.AaDataType.ArrayTimeType.value:
-            value = _seek_array_datetime(input=input)
-        case enums.AaDataType.ArrayElapsedTimeType.value:
-            value = _seek_array_timedelta(input=input)
-        case enums.AaDataType.ArrayReferenceType.value:
-            value = _seek_array_reference(input=input)
-        case enums.AaDataType.ArrayDataTypeType.value:
-            value = _seek_array_datatype(input=input)
-        case _:
-            raise NotImplementedError(f'Data type {datatype} not implemented at offset {input.offset:0X}.')
+    decoder = _value_decoders.get(datatype)
+    if decoder is None: raise NotImplementedError(f'Data type {datatype} not implemented at offset {input.offset:0X}.')
+    if compact: decoder = COMPACT_VALUE_DECODERS.get(decoder, decoder)
+
+    # In lazy mode the value section is skipped over and only
+    # decoded when it is first read.
+    skip = SKIP_VALUE_DECODERS.get(datatype) if lazy else None
+    if skip is not None:
+        start = input.offset
+        skip(input)
+        return types.AaLazyObjectValue(
+            datatype=_datatypes.get(datatype, datatype),
+            stream=types.AaBinStream(data=input.data, offset=start, base=start, end=input.offset),
+            decoder=decoder
+        )
+
+    value = decoder(input)
     return types.AaObjectValue(
-        datatype=enums.AaDataType(datatype),
+        datatype=_datatypes.get(datatype, datatype),
         value=value
     )
 
@@ -0,0 +1,386 @@
+from array import array
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+import struct
+
+from . import enums
+from . import primitives
+from . import types
+
+# Writes the object model back out in the layout read by
+# deserialize_aaobject.  Bytes that the reader skips over are
+# written as zeros, so the output is not byte-identical to an
+# export from a galaxy, but it parses back into an equal object.
+#
+# Not kept by the reader and written with fixed values:
+#   - script library references of script extensions
+#   - the template GUIDs
+#   - the second string of array references
+#   - the element type of string arrays and the index and
+#     locale of internationalized strings
+#   - elapsed times below a microsecond, which the reader rounds
+
+_FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+_TICK = timedelta(microseconds=1)
+
+_STRUCT_UINT = {
+    1: struct.Struct('<B'),
+    2: struct.Struct('<H'),
+    4: struct.Struct('<I'),
+    8: struct.Struct('<Q'),
+}
+
+# Filler written where the reader expects bytes that are not
+# a value header ahead of the type of a type 2 attribute.
+_ATTR2_TYPE_PREFIX = b'\xFF\xFF\xFF\xFF'
+_ATTR2_TYPE_SUFFIX = bytes(11)
+
+# Element sizes used for arrays
+_ARRAY_BOOL_LENGTH = 2
+_ARRAY_INT_LENGTH = 4
+
+def _write_int(output: bytearray, value: int, length: int = 4):
+    packer = _STRUCT_UINT.get(length)
+    if packer is not None:
+        output += packer.pack(value)
+    else:
+        output += int(value).to_bytes(length, 'little')
+
+def _write_bool(output: bytearray, value: bool):
+    output.append(1 if value else 0)
+
+def _encode_string(value: str, decode: str = 'utf-16le') -> bytes:
+    if value is None: return b''
+    return value.encode(decode)
+
+def _write_string(output: bytearray, value: str, length: int = 64):
+    # Fixed-size field padded with nulls.  Values that don't
+    # fit would come back truncated so they are rejected.
+    data = _encode_string(value)
+    if len(data) > length: raise ValueError(f'String {value!r} is longer than the {length} byte field.')
+    output += data
+    output += bytes(length - len(data))
+
+def _write_string_var_len(output: bytearray, value: str, length: int = 4, mult: int = 1, terminate: bool = True):
+    # Counterpart of primitives._seek_string_var_len.  With length=4
+    # the prefix is the size in bytes including a null terminator,
+    # with length=2, mult=2 it is the number of characters.
+    data = _encode_string(value)
+    if terminate: data += b'\x00\x00'
+    _write_int(output, len(data) // mult, length=length)
+    output += data
+
+def _write_sized(output: bytearray, data: bytes | bytearray):
+    _write_int(output, len(data))
+    output += data
+
+def _datetime_to_filetime_ticks(value: datetime) -> int:
+    if value.tzinfo is None: value = value.replace(tzinfo=timezone.utc)
+    return ((value - _FILETIME_EPOCH) // _TICK) * 10
+
+def _timedelta_to_ticks(value: timedelta) -> int:
+    return (value // _TICK) * 10
+
+def _write_string_value_section(output: bytearray, value: str):
+    section = bytearray()
+    _write_string_var_len(section, value)
+    _write_sized(output, section)
+
+def _write_datetime_var_len(output: bytearray, value: datetime):
+    section = bytearray()
+    _write_int(section, _datetime_to_filetime_ticks(value), length=8)
+    _write_sized(output, section)
+
+def _write_elapsed_time(output: bytearray, value: timedelta):
+    _write_int(output, _timedelta_to_ticks(value), length=8)
+
+def _write_reference_section(output: bytearray, value: types.AaReference):
+    section = bytearray()
+    ref_a = _encode_string(value.refA)
+    _write_int(section, len(ref_a), length=2)
+    _write_int(section, 0, length=2)
+    section += ref_a
+    _write_string_var_len(section, value.refB)
+    section += bytes(20)
+    _write_sized(output, section)
+
+def _write_status_section(output: bytearray, value: bytes):
+    _write_sized(output, bytes(value))
+
+def _write_datatype_section(output: bytearray, value: bytes):
+    if len(value) != 4: raise ValueError(f'DataTypeType values are 4 bytes, got {len(value)}.')
+    output += value
+
+def _write_qualifiedenum_section(output: bytearray, value: types.AaQualifiedEnum):
+    section = bytearray()
+    _write_string_var_len(section, value.value)
+    _write_int(section, value.ordinal, length=2)
+    _write_int(section, value.primitive_id, length=2)
+    _write_int(section, value.attribute_id, length=2)
+    _write_sized(output, section)
+
+def _write_qualifiedstruct_section(output: bytearray, value: types.AaQualifiedStruct):
+    section = bytearray()
+    _write_int(section, value.unk01)
+    _write_int(section, value.unk02)
+    _write_int(section, value.unk03, length=2)
+    _write_int(section, value.unk04, length=2)
+    _write_int(section, value.unk05)
+    _write_sized(output, section)
+
+def _write_international_string_value_section(output: bytearray, value: str):
+    section = bytearray()
+    _write_int(section, 1)
+    _write_int(section, 1033)
+    _write_string_var_len(section, value)
+    _write_sized(output, section)
+
+def _write_array_header(output: bytearray, count: int, element_length: int):
+    _write_int(output, 0)
+    _write_int(output, count, length=2)
+    _write_int(output, element_length)
+
+def _write_array_uint(output: bytearray, value: list[int], element_length: int):
+    _write_array_header(output, len(value), element_length)
+    packer = _STRUCT_UINT[element_length]
+    for x in value: output += packer.pack(x)
+
+def _write_array_bool(output: bytearray, value: list[bool] | array):
+    _write_array_uint(output, [1 if x else 0 for x in value], _ARRAY_BOOL_LENGTH)
+
+def _write_array_int(output: bytearray, value: list[int] | array):
+    # Four byte elements unless a value needs more
+    element_length = _ARRAY_INT_LENGTH
+    if any(x > 0xFFFFFFFF for x in value): element_length = 8
+    _write_array_uint(output, value, element_length)
+
+def _write_array_float(output: bytearray, value: list[float] | array):
+    _write_array_header(output, len(value), 4)
+    output += struct.pack(f'<{len(value)}f', *value)
+
+def _write_array_double(output: bytearray, value: list[float] | array):
+    _write_array_header(output, len(value), 8)
+    output += struct.pack(f'<{len(value)}d', *value)
+
+def _write_array_string(output: bytearray, value: list[str]):
+    _write_array_header(output, len(value), 0)
+    for x in value:
+        section = bytearray()
+        _write_int(section, enums.AaDataType.StringType, length=1)
+        _write_string_value_section(section, x)
+        _write_sized(output, section)
+
+def _write_array_datetime(output: bytearray, value: list[datetime]):
+    _write_array_uint(output, [_datetime_to_filetime_ticks(x) for x in value], 8)
+
+def _write_array_timedelta(output: bytearray, value: list[timedelta]):
+    _write_array_uint(output, [_timedelta_to_ticks(x) for x in value], 8)
+
+def _write_array_reference(output: bytearray, value: list[types.AaReference]):
+    _write_array_header(output, len(value), 0)
+    for x in value:
+        section = bytearray(5)
+        ref_a = _encode_string(x.refA)
+        ref_b = _encode_string(x.refB)
+        _write_int(section, len(ref_a), length=2)
+        _write_int(section, 0, length=2)
+        section += ref_a
+        _write_sized(section, ref_a)
+        _write_int(section, 0)
+        _write_int(section, len(ref_b), length=2)
+        _write_int(section, 0, length=2)
+        section += ref_b
+        section += bytes(20)
+        _write_sized(output, section)
+
+def _write_array_datatype(output: bytearray, value: list[bytes]):
+    element_length = len(value[0]) if value else 4
+    if any(len(x) != element_length for x in value): raise ValueError('ArrayDataTypeType elements must all be the same size.')
+    _write_array_header(output, len(value), element_length)
+    for x in value: output += x
+
+def _write_none_value(output: bytearray, value: None):
+    pass
+
+# Encoders for each value type, the counterparts of the decoders in
+# primitives.DEFAULT_VALUE_DECODERS.  Each one appends the section
+# that follows the datatype byte.
+DEFAULT_VALUE_ENCODERS: dict[int, Callable[[bytearray, object], None]] = {
+    enums.AaDataType.NoneType: _write_none_value,
+    enums.AaDataType.BooleanType: _write_bool,
+    enums.AaDataType.IntegerType: _write_int,
+    enums.AaDataType.FloatType: lambda output, value: output.extend(primitives._STRUCT_FLOAT.pack(value)),
+    enums.AaDataType.DoubleType: lambda output, value: output.extend(primitives._STRUCT_DOUBLE.pack(value)),
+    enums.AaDataType.StringType: _write_string_value_section,
+    enums.AaDataType.TimeType: _write_datetime_var_len,
+    enums.AaDataType.ElapsedTimeType: _write_elapsed_time,
+    enums.AaDataType.ReferenceType: _write_reference_section,
+    enums.AaDataType.StatusType: _write_status_section,
+    enums.AaDataType.DataTypeType: _write_datatype_section,
+    enums.AaDataType.QualifiedEnumType: _write_qualifiedenum_section,
+    enums.AaDataType.QualifiedStructType: _write_qualifiedstruct_section,
+    enums.AaDataType.InternationalizedStringType: _write_international_string_value_section,
+    enums.AaDataType.ArrayBooleanType: _write_array_bool,
+    enums.AaDataType.ArrayIntegerType: _write_array_int,
+    enums.AaDataType.ArrayFloatType: _write_array_float,
+    enums.AaDataType.ArrayDoubleType: _write_array_double,
+    enums.AaDataType.ArrayStringType: _write_array_string,
+    enums.AaDataType.ArrayTimeType: _write_array_datetime,
+    enums.AaDataType.ArrayElapsedTimeType: _write_array_timedelta,
+    enums.AaDataType.ArrayReferenceType: _write_array_reference,
+    enums.AaDataType.ArrayDataTypeType: _write_array_datatype,
+}
+
+_value_encoders: dict[int, Callable[[bytearray, object], None]] = {int(k): v for (k, v) in DEFAULT_VALUE_ENCODERS.items()}
+
+def register_value_encoder(datatype: int, encoder: Callable[[bytearray, object], None]):
+    # Counterpart of primitives.register_value_decoder for
+    # datatypes with a custom decoder.
+    _value_encoders[int(datatype)] = encoder
+
+def reset_value_encoders():
+    _value_encoders.clear()
+    _value_encoders.update({int(k): v for (k, v) in DEFAULT_VALUE_ENCODERS.items()})
+
+def _write_object_value(output: bytearray, value: types.AaObjectValue):
+    output += primitives.PATTERN_OBJECT_VALUE
+    datatype = int(value.datatype)
+    _write_int(output, datatype, length=1)
+
+    # Values that were never decoded are copied as they were read
+    if isinstance(value, types.AaLazyObjectValue) and not(value.is_decoded):
+        stream = value._stream
+        output += stream.data[stream.base:stream.end]
+        return
+
+    encoder = _value_encoders.get(datatype)
+    if encoder is None: raise NotImplementedError(f'Data type {datatype} not implemented.')
+    encoder(output, value.value)
+
+def _write_header(output: bytearray, header: types.AaObjectHeader):
+    _write_int(output, header.base_gobjectid)
+
+    # Templates have four null bytes here, the next four
+    # bytes must not be null for instances.
+    if header.is_template:
+        output += primitives.PATTERN_TEMPLATE_VALUE
+        _write_int(output, 0)
+    else:
+        _write_int(output, 1)
+
+    # Same fields as deserialize.HEADER_LAYOUT, after its first pad
+    _write_int(output, header.this_gobjectid)
+    output += bytes(12)
+    _write_string(output, header.security_group)
+    output += bytes(12)
+    _write_int(output, header.parent_gobjectid)
+    output += bytes(52)
+    _write_string(output, header.tagname)
+    output += bytes(596)
+    _write_string(output, header.contained_name)
+    output += bytes(36)
+    _write_int(output, header.config_version)
+    output += bytes(16)
+    _write_string(output, header.hierarchal_name, length=130)
+    output += bytes(530)
+    _write_string(output, header.host_name)
+    output += bytes(2)
+    _write_string(output, header.container_name)
+    output += bytes(596)
+    _write_string(output, header.area_name)
+    output += bytes(2)
+    _write_string(output, header.derived_from)
+    output += bytes(596)
+    _write_string(output, header.based_on)
+    output += bytes(528)
+
+    # An empty galaxy name can't be told apart from the extra
+    # block some versions have, so it is written with that block.
+    extra_header_block = not(header.galaxy_name)
+    if extra_header_block: output += bytes(660)
+    _write_string_var_len(output, header.galaxy_name)
+    _write_object_value(output, types.AaObjectValue(datatype=enums.AaDataType.NoneType, value=None))
+    output += primitives.PATTERN_END
+    if extra_header_block: output += bytes(5)
+    _write_bool(output, True)
+
+def _get_attribute_name(section_name: str, full_name: str) -> str:
+    # Reverses deserialize._get_attribute_fullname
+    if full_name is None: return ''
+    if section_name:
+        prefix = f'{section_name}.'
+        if full_name.startswith(prefix): return full_name[len(prefix):]
+    return full_name
+
+def _is_attr_type1(attr: types.AaObjectAttribute) -> bool:
+    # Type 2 attributes have no name or permissions
+    return attr.permission is not None
+
+def _write_attr_type1(output: bytearray, attr: types.AaObjectAttribute, section_name: str):
+    output += bytes(2)
+    _write_int(output, attr.id, length=2)
+    _write_string_var_len(output, _get_attribute_name(section_name, attr.name), length=2, mult=2, terminate=False)
+    _write_int(output, attr.attr_type, length=1)
+    _write_int(output, 1 if attr.array else 0)
+    _write_int(output, attr.permission)
+    _write_int(output, attr.write)
+    _write_int(output, attr.locked)
+    _write_int(output, attr.parent_gobjectid)
+    output += bytes(8)
+    _write_string_var_len(output, attr.parent_name, length=2, mult=2, terminate=False)
+    output += bytes(2)
+    _write_object_value(output, attr.value)
+
+def _write_attr_type2(output: bytearray, attr: types.AaObjectAttribute):
+    _write_int(output, attr.id, length=2)
+    output += bytes(2)
+    if attr.attr_type != enums.AaDataType.Undefined:
+        output += _ATTR2_TYPE_PREFIX
+        _write_int(output, attr.attr_type, length=1)
+        output += _ATTR2_TYPE_SUFFIX
+    _write_object_value(output, attr.value)
+
+def _write_extension(output: bytearray, extension: types.AaObjectExtension):
+    _write_int(output, extension.instance_id)
+    _write_string(output, extension.instance_name)
+    output += bytes(616)
+    _write_string(output, extension.extension_name)
+    output += bytes(616)
+    _write_string(output, extension.parent_name)
+    output += bytes(596)
+
+    # Left as zeros so that no script library section is expected
+    output += bytes(16)
+
+    attrs1 = [x for x in extension.attributes if _is_attr_type1(x)]
+    attrs2 = [x for x in extension.attributes if not(_is_attr_type1(x))]
+    _write_int(output, len(attrs1))
+    for attr in attrs1: _write_attr_type1(output, attr, extension.instance_name)
+    output += primitives.PATTERN_END
+
+    messages = list(extension.messages)
+    if len(messages) != 4: raise ValueError(f'Extensions have 4 message values, got {len(messages)}.')
+    for message in messages: _write_object_value(output, message)
+
+    _write_int(output, len(attrs2))
+    for attr in attrs2: _write_attr_type2(output, attr)
+
+def serialize_aaobject(obj: types.AaObject) -> bytes:
+    # Counterpart of deserialize_aaobject
+    output = bytearray()
+    _write_header(output, obj.header)
+    _write_int(output, len(obj.extensions))
+    for extension in obj.extensions: _write_extension(output, extension)
+
+    if obj.header.is_template:
+        output += bytes(1)
+        _write_string(output, '', length=512)
+        _write_string(output, '', length=512)
+        output += bytes(36)
+        _write_string(output, obj.header.code_base)
+        output += bytes(584)
+        _write_int(output, obj.header.config_version)
+    return bytes(output)
+
+def aaobject_to_file(obj: types.AaObject, output_path: str):
+    with open(output_path, 'wb') as file: file.write(serialize_aaobject(obj))
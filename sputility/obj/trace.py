@@ -0,0 +1,86 @@
+from collections.abc import Callable
+import time
+from typing import Optional
+
+class AaTracer:
+    # Receives offset traces while objects are deserialized.
+    #
+    # Subclass and override the on_* methods.  Sections are
+    # nested (object > header/extension > attribute) and the
+    # elapsed time is only measured while a tracer is attached.
+    def __init__(self):
+        self._stack: list[tuple[str, int, float]] = []
+
+    def section_start(self, section: str, offset: int):
+        self._stack.append((section, offset, time.perf_counter()))
+        self.on_section_start(section=section, offset=offset, depth=len(self._stack))
+
+    def section_end(self, section: str, offset: int):
+        # Sections left open by a parsing error are discarded.  An
+        # end without a matching start is reported as an event and
+        # otherwise ignored.
+        if not(any(x[0] == section for x in self._stack)):
+            self.event(f'UNMATCHED END {section.upper()}', offset)
+            return
+        (name, start_offset, start_time) = self._stack.pop()
+        while (name != section) and self._stack:
+            (name, start_offset, start_time) = self._stack.pop()
+        elapsed = time.perf_counter() - start_time
+        self.on_section_end(section=section, offset=start_offset, size=(offset - start_offset), elapsed=elapsed, depth=len(self._stack) + 1)
+
+    def event(self, message: str, offset: int):
+        self.on_event(message=message, offset=offset, depth=len(self._stack))
+
+    def on_section_start(self, section: str, offset: int, depth: int):
+        pass
+
+    def on_section_end(self, section: str, offset: int, size: int, elapsed: float, depth: int):
+        pass
+
+    def on_event(self, message: str, offset: int, depth: int):
+        pass
+
+class AaPrintTracer(AaTracer):
+    # Prints the same offset traces as the old PRINT_DEBUG_INFO flag.
+    def on_section_start(self, section: str, offset: int, depth: int):
+        print(f'{">>>>" * depth} START {section.upper()} - OFFSET {offset:0X} >>>>')
+
+    def on_section_end(self, section: str, offset: int, size: int, elapsed: float, depth: int):
+        print(f'{">>>>" * depth} END {section.upper()} - OFFSET {offset + size:0X}, SIZE {size:0X}, {elapsed * 1000.0:.3f} ms >>>>')
+
+    def on_event(self, message: str, offset: int, depth: int):
+        print(f'{">>>>" * (depth + 1)} {message} - OFFSET {offset:0X}')
+
+class AaCallbackTracer(AaTracer):
+    # Forwards traces to plain callbacks, any of which may be None.
+    def __init__(
+        self,
+        section_start: Optional[Callable[[str, int], None]] = None,
+        section_end: Optional[Callable[[str, int, int, float], None]] = None,
+        event: Optional[Callable[[str, int], None]] = None
+    ):
+        super().__init__()
+        self._on_section_start = section_start
+        self._on_section_end = section_end
+        self._on_event = event
+
+    def on_section_start(self, section: str, offset: int, depth: int):
+        if self._on_section_start is not None: self._on_section_start(section, offset)
+
+    def on_section_end(self, section: str, offset: int, size: int, elapsed: float, depth: int):
+        if self._on_section_end is not None: self._on_section_end(section, offset, size, elapsed)
+
+    def on_event(self, message: str, offset: int, depth: int):
+        if self._on_event is not None: self._on_event(message, offset)
+
+# The active tracer, None when tracing is off.  Parsing code
+# checks this before building any trace message so there is
+# nothing to pay for when no tracer is attached.
+TRACER: Optional[AaTracer] = None
+
+def set_tracer(tracer: Optional[AaTracer]):
+    global TRACER
+    TRACER = tracer
+
+def get_tracer() -> Optional[AaTracer]:
+    return TRACER
@@ -1,15 +1,42 @@
+from array import array
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
 from . import enums
 
-@dataclass
+class AaSlotted:
+    # Base for the slotted object model.  Pickles through the
+    # constructor, which reloads several times faster than the
+    # per-field __setstate__ generated for slotted dataclasses.
+    __slots__ = ()
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, name) for name in self.__slots__))
+
+@dataclass(slots=True)
 class AaBinStream:
-    data: bytes
+    # The buffer is shared between a stream and any sub-streams
+    # created from it.  Offsets are absolute positions in the buffer
+    # and each sub-stream is limited to its own base and end.
+    data: memoryview
     offset: int
+    base: int = 0
+    end: int = None
+
+    def __post_init__(self):
+        if not(isinstance(self.data, memoryview)): self.data = memoryview(self.data)
+        if self.end is None: self.end = len(self.data)
 
-@dataclass
-class AaObjectHeader:
+    @property
+    def size(self) -> int:
+        return self.end - self.base
+
+    @property
+    def remaining(self) -> int:
+        return self.end - self.offset
+
+@dataclass(slots=True)
+class AaObjectHeader(AaSlotted):
     base_gobjectid: int
     is_template: bool       # <Obj>._IsTemplate
     this_gobjectid: int
@@ -27,33 +54,71 @@ class AaObjectHeader:
     galaxy_name: str
     code_base: str          # <Obj>.CodeBase
 
-@dataclass
-class AaReference:
+@dataclass(slots=True)
+class AaReference(AaSlotted):
     refA: str
     refB: str
 
-@dataclass
-class AaQualifiedEnum:
+@dataclass(slots=True)
+class AaQualifiedEnum(AaSlotted):
     value: str
     ordinal: int
     primitive_id: int
     attribute_id: int
 
-@dataclass
-class AaQualifiedStruct:
+@dataclass(slots=True)
+class AaQualifiedStruct(AaSlotted):
     unk01: int
     unk02: int
     unk03: int
     unk04: int
     unk05: int
 
-@dataclass
-class AaObjectValue:
+@dataclass(slots=True)
+class AaObjectValue(AaSlotted):
     datatype: enums.AaDataType
-    value: bool | int | float | str | datetime | timedelta | list | AaReference | AaQualifiedEnum
+    value: bool | int | float | str | datetime | timedelta | list | array | AaReference | AaQualifiedEnum
+
+class AaLazyObjectValue(AaObjectValue):
+    # Object value that records where its section is and only
+    # decodes it the first time .value is read.  Until then it
+    # keeps the buffer of the object it was parsed from alive.
+    __slots__ = ('_stream', '_decoder', '_value')
+
+    def __init__(self, datatype: enums.AaDataType, stream: AaBinStream, decoder):
+        self.datatype = datatype
+        self._stream = stream
+        self._decoder = decoder
+        self._value = None
+
+    @property
+    def value(self):
+        if self._stream is not None:
+            self._value = self._decoder(self._stream)
+            self._stream = None
+            self._decoder = None
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self._stream = None
+        self._decoder = None
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._stream is None
+
+    def __eq__(self, other):
+        if not(isinstance(other, AaObjectValue)): return NotImplemented
+        return (self.datatype, self.value) == (other.datatype, other.value)
 
-@dataclass
-class AaObjectAttribute:
+    def __reduce__(self):
+        # Buffers can't be pickled so the value is decoded first.
+        return (AaObjectValue, (self.datatype, self.value))
+
+@dataclass(slots=True)
+class AaObjectAttribute(AaSlotted):
     offset: int
     id: int
     name: str
@@ -68,8 +133,110 @@ class AaObjectAttribute:
     value: AaObjectValue
     primitive_name: str
 
-@dataclass
-class AaObjectExtension:
+class AaIndexedList(list):
+    # List that keeps dict indexes over its items for constant-time
+    # lookups.  Subclasses list the indexes in INDEX_KEYS as
+    # name -> function returning the key for an item.  Appends
+    # update the indexes in place, any other change drops them
+    # and they are rebuilt on the next lookup.
+    __slots__ = ('_indexes',)
+    INDEX_KEYS: dict = {}
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._indexes = None
+
+    def _build_indexes(self) -> dict[str, dict]:
+        indexes = {name: {} for name in self.INDEX_KEYS}
+        for item in self:
+            self._add_to_indexes(indexes, item)
+        self._indexes = indexes
+        return indexes
+
+    def _add_to_indexes(self, indexes: dict[str, dict], item):
+        # The first item with a key wins, same as a linear scan.
+        for (name, key_func) in self.INDEX_KEYS.items():
+            key = key_func(item)
+            if key is not None: indexes[name].setdefault(key, item)
+
+    def _invalidate(self):
+        self._indexes = None
+
+    def lookup(self, index: str, key):
+        indexes = self._indexes
+        if indexes is None: indexes = self._build_indexes()
+        return indexes[index].get(key)
+
+    def append(self, item):
+        super().append(item)
+        if self._indexes is not None: self._add_to_indexes(self._indexes, item)
+
+    def extend(self, items):
+        super().extend(items)
+        self._invalidate()
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self._invalidate()
+
+    def remove(self, item):
+        super().remove(item)
+        self._invalidate()
+
+    def pop(self, *args):
+        item = super().pop(*args)
+        self._invalidate()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._invalidate()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._invalidate()
+
+    def reverse(self):
+        super().reverse()
+        self._invalidate()
+
+    def __setitem__(self, index, item):
+        super().__setitem__(index, item)
+        self._invalidate()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._invalidate()
+
+    def __iadd__(self, items):
+        result = super().__iadd__(items)
+        self._invalidate()
+        return result
+
+    def __imul__(self, count):
+        result = super().__imul__(count)
+        self._invalidate()
+        return result
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+class AaAttributeList(AaIndexedList):
+    __slots__ = ()
+    INDEX_KEYS = {
+        'id': lambda attr: attr.id,
+        'name': lambda attr: attr.name,
+    }
+
+class AaExtensionList(AaIndexedList):
+    __slots__ = ()
+    INDEX_KEYS = {
+        'primitive_name': lambda ext: ext.primitive_name,
+        'instance_id': lambda ext: ext.instance_id,
+    }
+
+@dataclass(slots=True)
+class AaObjectExtension(AaSlotted):
     instance_id: int
     instance_name: str
     extension_name: str
@@ -78,18 +245,52 @@ class AaObjectExtension:
     attributes: list[AaObjectAttribute]
     messages: list[AaObjectValue]
 
+    def __post_init__(self):
+        if not(isinstance(self.attributes, AaAttributeList)): self.attributes = AaAttributeList(self.attributes)
+
+    def _get_attribute_list(self) -> AaAttributeList:
+        # Rewrap if the list was replaced after the extension was created.
+        if not(isinstance(self.attributes, AaAttributeList)): self.attributes = AaAttributeList(self.attributes)
+        return self.attributes
+
     def get_attribute(self, attribute_id: int):
-        return next((attr for attr in self.attributes if attr.id == attribute_id), None)
+        return self._get_attribute_list().lookup('id', attribute_id)
+
+    def get_attribute_by_name(self, name: str):
+        return self._get_attribute_list().lookup('name', name)
 
-@dataclass
-class AaObject:
+@dataclass(slots=True)
+class AaObject(AaSlotted):
     size: int
     offset: int
     header: AaObjectHeader
     extensions: list[AaObjectExtension]
 
-@dataclass
-class AaScriptHeader:
+    def __post_init__(self):
+        if not(isinstance(self.extensions, AaExtensionList)): self.extensions = AaExtensionList(self.extensions)
+
+    def _get_extension_list(self) -> AaExtensionList:
+        if not(isinstance(self.extensions, AaExtensionList)): self.extensions = AaExtensionList(self.extensions)
+        return self.extensions
+
+    def get_extension(self, primitive_name: str):
+        return self._get_extension_list().lookup('primitive_name', primitive_name)
+
+    def get_attribute(self, primitive_name: str, attribute_id: int):
+        extension = self.get_extension(primitive_name)
+        if extension is None: return None
+        return extension.get_attribute(attribute_id)
+
+    def get_attribute_by_name(self, name: str):
+        # Full names are unique across the object, so
+        # each extension is checked in turn.
+        for extension in self._get_extension_list():
+            attr = extension.get_attribute_by_name(name)
+            if attr is not None: return attr
+        return None
+
+@dataclass(slots=True)
+class AaScriptHeader(AaSlotted):
     name: str
     primitive_name: str
     expression: str
@@ -102,8 +303,8 @@ class AaScriptHeader:
     historize_state: bool
     alarm_enable: bool
 
-@dataclass
-class AaScriptContent:
+@dataclass(slots=True)
+class AaScriptContent(AaSlotted):
     aliases: list[str, str]
     declarations: str
     body_text_execute: str
@@ -112,7 +313,7 @@ class AaScriptContent:
     body_text_onscan: str
     body_text_offscan: str
     
-@dataclass
-class AaScript:
+@dataclass(slots=True)
+class AaScript(AaSlotted):
     header: AaScriptHeader
     content: AaScriptContent
\ No newline at end of file
@@ -1,2 +1,3 @@
+from . import compress
 from . import decompress
 from . import types
\ No newline at end of file
@@ -0,0 +1,75 @@
+from collections.abc import Mapping
+import io
+from typing import Optional
+import xml.etree.ElementTree as ET
+import zipfile
+
+from ..progress import AaProgressCallback, AaProgressStage
+from . import types
+
+# Object files per inner cab when building a package
+OBJECTS_PER_CAB = 100
+
+def _manifest_object_attrib(entry: types.AaManifestTemplate | types.AaManifestInstance) -> dict[str, str]:
+    attrib = {
+        'tag_name': entry.tag_name,
+        'gobjectid': str(entry.gobjectid),
+        'file_name': entry.file_name,
+        'config_version': str(entry.config_version),
+        'codebase': entry.codebase,
+        'security_group': entry.security_group,
+        'host_name': entry.host_name,
+        'area_name': entry.area_name,
+        'cont_name': entry.cont_name,
+        'toolset_name': entry.toolset_name,
+    }
+    if isinstance(entry, types.AaManifestTemplate): attrib['is_protected'] = '1' if entry.is_protected else '0'
+    return attrib
+
+def _put_manifest_template(parent: ET.Element, template: types.AaManifestTemplate):
+    element = ET.SubElement(parent, 'template', _manifest_object_attrib(template))
+    if template.derived_templates:
+        derived_templates = ET.SubElement(element, 'derived_templates')
+        for child in template.derived_templates: _put_manifest_template(derived_templates, child)
+    if template.derived_instances:
+        derived_instances = ET.SubElement(element, 'derived_instances')
+        for instance in template.derived_instances:
+            ET.SubElement(derived_instances, 'instance', _manifest_object_attrib(instance))
+
+def manifest_to_xml(manifest: types.AaManifest) -> bytes:
+    # Counterpart of decompress._parse_manifest
+    root = ET.Element('cdi_export')
+    ET.SubElement(root, 'product_version', cdiversion=manifest.product_version.cdi_version, iasversion=manifest.product_version.ias_version)
+    for template in manifest.templates: _put_manifest_template(root, template)
+    ET.SubElement(root, 'IODeviceMap', filename=manifest.bindings.filename)
+    ET.SubElement(root, 'TotalObjectCount', objectcount=str(manifest.object_count))
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+def memory_to_aapkg(
+    output_path: str,
+    manifest: types.AaManifest,
+    files: Mapping[str, bytes],
+    objects_per_cab: int = OBJECTS_PER_CAB,
+    progress: Optional[AaProgressCallback] = None
+):
+    # Counterpart of aapkg_to_memory.  Files are split across
+    # numbered inner cabs in the order given, Manifest.xml goes
+    # into the last one.
+    if objects_per_cab < 1: raise ValueError(f'objects_per_cab must be at least 1, got {objects_per_cab}.')
+    names = [x for x in files if x != 'Manifest.xml']
+    cabs = [names[k:k + objects_per_cab] for k in range(0, len(names), objects_per_cab)] or [[]]
+    cabs[-1].append('Manifest.xml')
+    contents = dict(files)
+    contents['Manifest.xml'] = manifest_to_xml(manifest)
+
+    (done, nbytes) = (0, 0)
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as package:
+        for (index, cab) in enumerate(cabs):
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as inner:
+                for name in cab:
+                    inner.writestr(name, contents[name])
+                    if progress is not None:
+                        (done, nbytes) = (done + 1, nbytes + len(contents[name]))
+                        progress(AaProgressStage.Write, name, done, len(contents), nbytes)
+            package.writestr(f'{index + 1}.cab', buffer.getvalue())
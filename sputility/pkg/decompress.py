@@ -1,25 +1,114 @@
+import codecs
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack, contextmanager
+import fnmatch
 import io
+import mmap
 import os
-from typing import List
+import shutil
+import struct
+import tempfile
+from typing import List, Optional
 import xml.etree.ElementTree as ET
 import zipfile
 
+from .. import writers
+from ..progress import AaProgressCallback, AaProgressStage
 from . import types
 
+# Inner cab files are spooled to memory up to this size
+# before rolling over to a temporary file on disk.
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+# Manifest.xml is parsed in chunks of this size
+MANIFEST_CHUNK_SIZE = 64 * 1024
+
+class _AaViewFile(io.RawIOBase):
+    # Read-only file over a memoryview so that zip files can be
+    # opened from a memory-mapped package.
+    def __init__(self, view: memoryview, name: Optional[str] = None):
+        self.view = view
+        self.name = name
+        self._offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._offset
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR: offset += self._offset
+        elif whence == io.SEEK_END: offset += len(self.view)
+        # Same error as a file so zipfile reports a bad zip file
+        if offset < 0: raise OSError(f'Negative seek position {offset}.')
+        self._offset = offset
+        return offset
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self.view) if ((size is None) or (size < 0)) else min(self._offset + size, len(self.view))
+        if end <= self._offset: return b''
+        value = bytes(self.view[self._offset:end])
+        self._offset = end
+        return value
+
+    def readinto(self, buffer) -> int:
+        value = self.read(len(buffer))
+        buffer[:len(value)] = value
+        return len(value)
+
+@contextmanager
+def _open_package(input_path: str) -> Iterator[zipfile.ZipFile]:
+    # The package is memory-mapped, so reads come straight from the
+    # page cache and cabs stored without compression can be opened
+    # in place.  Files that can't be mapped are read normally.
+    with open(input_path, 'rb') as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            mapped = None
+        if mapped is None:
+            with zipfile.ZipFile(file) as archive:
+                yield archive
+            return
+
+        view = memoryview(mapped)
+        try:
+            with zipfile.ZipFile(_AaViewFile(view, name=input_path)) as archive:
+                yield archive
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                # Views are still held somewhere, the mapping is
+                # closed when they are released.
+                pass
+
+def _stored_member_view(file: zipfile.ZipFile, info: zipfile.ZipInfo) -> Optional[memoryview]:
+    # Returns the bytes of a member of a memory-mapped package
+    # if they are stored as is, otherwise None.
+    if not(isinstance(file.fp, _AaViewFile)): return None
+    if (info.compress_type != zipfile.ZIP_STORED) or (info.flag_bits & 0x1): return None
+    view = file.fp.view
+    offset = info.header_offset
+    header = view[offset:offset + zipfile.sizeFileHeader]
+    if len(header) != zipfile.sizeFileHeader: return None
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader: return None
+    start = offset + zipfile.sizeFileHeader + fields[zipfile._FH_FILENAME_LENGTH] + fields[zipfile._FH_EXTRA_FIELD_LENGTH]
+    if (start + info.compress_size) > len(view): return None
+    return view[start:start + info.compress_size]
+
 def _path_to_list(path: str, insensitive: bool = True) -> list[str]:
     path = path.replace('\\', '/')
     if insensitive: path = path.casefold()
     components = [comp for comp in path.split('/') if comp]
     return components if components else [path]
 
-def _create_subfolders(output_path: str, archive_paths: list[str]):
-    folders = archive_paths[:-1]
-    current_path = output_path
-    for folder in folders:
-        current_path = os.path.join(current_path, folder)
-        os.makedirs(current_path, exist_ok=True)
-    return os.path.join(current_path, archive_paths[-1])
-
 def _get_manifest_instances(element: ET.Element) -> types.AaManifestInstance:
     return types.AaManifestInstance(
         tag_name=element.attrib.get('tag_name', ''),
@@ -79,42 +168,120 @@ def _print_manifest_template(template: types.AaManifestTemplate, indent: int = 0
     for child in template.derived_templates:
         _print_manifest_template(child, indent + 1)
 
+def _iter_template(
+    template: types.AaManifestTemplate
+) -> Iterator[types.AaManifestTemplate | types.AaManifestInstance]:
+    yield template
+    for child in template.derived_templates:
+        yield from _iter_template(template=child)
+    for child in template.derived_instances:
+        yield child
+
+def iter_manifest_objects(
+    manifest: types.AaManifest
+) -> Iterator[types.AaManifestTemplate | types.AaManifestInstance]:
+    # Walk the manifest depth-first so each template comes before
+    # the templates and instances derived from it.
+    for template in manifest.templates:
+        yield from _iter_template(template=template)
+
+def _glob_match(value: str, pattern: str) -> bool:
+    return fnmatch.fnmatchcase(value.casefold(), pattern.casefold())
+
+def filter_manifest_objects(
+    manifest: types.AaManifest,
+    selection: types.AaManifestFilter
+) -> Iterator[types.AaManifestTemplate | types.AaManifestInstance]:
+    # Same order as iter_manifest_objects, limited to the
+    # objects the filter selects.
+    def _recurse(template: types.AaManifestTemplate, selected: bool):
+        # Once a template matches, everything below it is selected
+        selected = selected or _glob_match(template.tag_name, selection.template)
+        if selected: yield template
+        for child in template.derived_templates:
+            yield from _recurse(template=child, selected=selected)
+        if selected: yield from template.derived_instances
+
+    if selection.template is None:
+        entries = iter_manifest_objects(manifest)
+    else:
+        entries = (entry for template in manifest.templates for entry in _recurse(template=template, selected=False))
+
+    for entry in entries:
+        if (selection.tag_names is not None) and not(any(_glob_match(entry.tag_name, x) for x in selection.tag_names)): continue
+        if (selection.area_name is not None) and not(_glob_match(entry.area_name, selection.area_name)): continue
+        if (selection.host_name is not None) and not(_glob_match(entry.host_name, selection.host_name)): continue
+        yield entry
+
 def _get_stream_by_name(
-    streams: list[types.AaArchive], 
+    streams: list[types.AaArchive] | types.AaArchiveIndex, 
     name: str, 
     case_insensitive: bool
 ) -> types.AaArchive:
+    if isinstance(streams, types.AaArchiveIndex):
+        return streams.get(name, case_insensitive=case_insensitive)
     if case_insensitive:
-        return next(x for x in streams if x.name.casefold() == name.casefold())
+        name = name.casefold()
+        return next((x for x in streams if x.name.casefold() == name), None)
     else:
-        return next(x for x in streams if x.name == name)
+        return next((x for x in streams if x.name == name), None)
 
 def _get_manifest(
     streams: list[types.AaArchive],
+    progress: Optional[AaProgressCallback] = None
 ) -> types.AaManifest:
     stream = _get_stream_by_name(streams, 'Manifest.xml', case_insensitive=False)
-    root = ET.fromstring(stream.data.decode('utf-8'))
+    if stream is None: raise FileNotFoundError('Manifest.xml not found in package.')
+    return _parse_manifest(stream.data, progress=progress)
 
-    version = types.AaManifestVersion('','')
-    for version_elem in root.findall('product_version'):
-        version = types.AaManifestVersion(
-            cdi_version=version_elem.get('cdiversion', ''),
-            ias_version=version_elem.get('iasversion', '')
-        )
+def _iterparse_manifest(
+    chunks: Iterable[bytes],
+    progress: Optional[AaProgressCallback] = None
+) -> types.AaManifest:
+    # Parses the manifest as it is read.  Each top level
+    # template is converted and cleared as soon as it ends
+    # so only one template tree is held at a time.
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    decoder = codecs.getincrementaldecoder('utf-8')()
 
-    templates = []
-    for template_elem in root.findall('template'):
-        templates.append(_get_manifest_templates(template_elem))
+    nbytes = 0
+    def _events():
+        nonlocal nbytes
+        for chunk in chunks:
+            nbytes += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            yield from parser.read_events()
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+        yield from parser.read_events()
 
+    version = types.AaManifestVersion('','')
+    templates = []
     bindings = types.AaManifestIODeviceMap('')
-    for bindings_elem in root.findall('IODeviceMap'):
-        bindings = types.AaManifestIODeviceMap(
-            filename=bindings_elem.get('filename', '')
-        )
-
     object_count = 0
-    for object_count_elem in root.findall('TotalObjectCount'):
-        object_count = int(object_count_elem.get('objectcount', ''))
+
+    depth = 0
+    for (event, element) in _events():
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1: continue
+
+        if element.tag == 'product_version':
+            version = types.AaManifestVersion(
+                cdi_version=element.get('cdiversion', ''),
+                ias_version=element.get('iasversion', '')
+            )
+        elif element.tag == 'template':
+            templates.append(_get_manifest_templates(element))
+        elif element.tag == 'IODeviceMap':
+            bindings = types.AaManifestIODeviceMap(
+                filename=element.get('filename', '')
+            )
+        elif element.tag == 'TotalObjectCount':
+            object_count = int(element.get('objectcount', ''))
+        element.clear()
 
     manifest = types.AaManifest(
         product_version=version,
@@ -122,65 +289,232 @@ def _get_manifest(
         bindings=bindings,
         object_count=object_count
     )
+    if progress is not None: progress(AaProgressStage.Manifest, 'Manifest.xml', 1, 1, nbytes)
     return manifest
 
-def decompress_cab(
+def _parse_manifest(
+    data: bytes,
+    progress: Optional[AaProgressCallback] = None
+) -> types.AaManifest:
+    return _iterparse_manifest(chunks=(data,), progress=progress)
+
+def iter_cab(
     file: zipfile.ZipFile,
-    prefix: str
-) -> list[types.AaArchive]:
-    streams: list[types.AaArchive] = []
+    prefix: str,
+    names: Optional[set[str]] = None
+) -> Iterator[types.AaArchive]:
+    # Only one inner file is decompressed at a time, so the
+    # caller controls how many are held in memory.  If names
+    # are given, only files with those names are decompressed.
     for info in file.infolist():
         if info.is_dir():
             continue
-        data = file.read(info.filename)
         file_path = f'{prefix}/{info.filename}'
         file_path_list = _path_to_list(path=file_path, insensitive=False)
-        streams.append(types.AaArchive(
+        if (names is not None) and (file_path_list[-1] not in names):
+            continue
+        data = file.read(info.filename)
+        yield types.AaArchive(
             name=file_path_list[-1],
             data=data,
             path=file_path_list,
             size=len(data)
-        ))
-    return streams
+        )
 
-def decompress_aapkg(
-    file: zipfile.ZipFile
+def decompress_cab(
+    file: zipfile.ZipFile,
+    prefix: str
 ) -> list[types.AaArchive]:
-    streams: list[types.AaArchive] = []
+    return list(iter_cab(file=file, prefix=prefix))
+
+@contextmanager
+def _open_cab(
+    file: zipfile.ZipFile,
+    stream_path: str
+) -> Iterator[zipfile.ZipFile]:
+    # Each member of the package is itself a zip file.  Cabs stored
+    # without compression in a memory-mapped package are opened in
+    # place.  Otherwise rather than reading it fully into memory, it
+    # is copied into a spooled temporary file so that large cabs roll
+    # over to disk.
+    stored = _stored_member_view(file=file, info=file.getinfo(stream_path))
+    if stored is not None:
+        try:
+            with zipfile.ZipFile(_AaViewFile(stored)) as cab_zip:
+                yield cab_zip
+        finally:
+            stored.release()
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as package_bytes:
+        with file.open(stream_path) as member:
+            shutil.copyfileobj(member, package_bytes)
+        package_bytes.seek(0)
+        with zipfile.ZipFile(package_bytes) as cab_zip:
+            yield cab_zip
+
+def iter_aapkg(
+    file: zipfile.ZipFile,
+    names: Optional[set[str]] = None,
+    progress: Optional[AaProgressCallback] = None
+) -> Iterator[types.AaArchive]:
     file_name, file_ext = os.path.splitext(str(file.filename))
+    (done, nbytes) = (0, 0)
+    if progress is not None: progress(AaProgressStage.Decompress, '', done, 0, nbytes)
     for stream_path in file.namelist():
-        with io.BytesIO(file.read(stream_path)) as package_bytes:
-            with zipfile.ZipFile(package_bytes) as cab_zip:
-                cab_prefix = f'{os.path.basename(file_name)}/{stream_path}'
-                streams.extend(decompress_cab(file=cab_zip,prefix=cab_prefix))
-    return streams
-    
+        with _open_cab(file=file, stream_path=stream_path) as cab_zip:
+            cab_prefix = f'{os.path.basename(file_name)}/{stream_path}'
+            for stream in iter_cab(file=cab_zip, prefix=cab_prefix, names=names):
+                if progress is not None:
+                    (done, nbytes) = (done + 1, nbytes + stream.size)
+                    progress(AaProgressStage.Decompress, stream.name, done, 0, nbytes)
+                yield stream
+
+def decompress_aapkg(
+    file: zipfile.ZipFile
+) -> list[types.AaArchive]:
+    return list(iter_aapkg(file=file))
+
+def aapkg_to_stream(
+    input_path: str,
+    names: Optional[set[str]] = None,
+    progress: Optional[AaProgressCallback] = None
+) -> Iterator[types.AaArchive]:
+    # Yield the files in the archive one at a time so that peak
+    # memory is bounded by the largest single file rather than
+    # the whole package.
+    with _open_package(input_path) as archive:
+        yield from iter_aapkg(file=archive, names=names, progress=progress)
+
 def aapkg_to_memory(
     input_path: str,
+    progress: Optional[AaProgressCallback] = None
 ) -> tuple[types.AaManifest, list[types.AaArchive]]:
     # Directly dump archive with no application-specific
     # handling.
-    with zipfile.ZipFile(input_path, 'r') as archive:
-        streams = decompress_aapkg(file=archive)
-        manifest = _get_manifest(streams)
-        return (manifest, streams)
+    streams = list(aapkg_to_stream(input_path=input_path, progress=progress))
+    manifest = _get_manifest(streams, progress=progress)
+    return (manifest, streams)
 
-def aapkg_to_folder(
+def aapkg_to_manifest(
     input_path: str,
-    output_path: str
+    progress: Optional[AaProgressCallback] = None
 ) -> types.AaManifest:
+    # Reads only the manifest.  Cabs are opened one at a time
+    # until one containing Manifest.xml is found, and only that
+    # file is decompressed from it.
+    with _open_package(input_path) as archive:
+        for stream_path in archive.namelist():
+            with _open_cab(file=archive, stream_path=stream_path) as cab_zip:
+                for info in cab_zip.infolist():
+                    if info.is_dir(): continue
+                    if _path_to_list(path=info.filename, insensitive=False)[-1] != 'Manifest.xml': continue
+                    with cab_zip.open(info) as member:
+                        return _iterparse_manifest(chunks=iter(lambda: member.read(MANIFEST_CHUNK_SIZE), b''), progress=progress)
+    raise FileNotFoundError(f'Manifest.xml not found in package ({input_path}).')
+
+def _aapkg_directory(
+    archive: zipfile.ZipFile,
+    input_path: str,
+    progress: Optional[AaProgressCallback] = None
+) -> tuple[types.AaManifest, dict[str, tuple[int, int]], dict[str, tuple[str, str]]]:
+    # Reads the manifest, and the CRC-32 and size and the cab and
+    # member name of every file, from the directories of the inner
+    # cabs.  Nothing but the manifest is decompressed.
+    manifest = None
+    checksums = {}
+    locations = {}
+    for stream_path in archive.namelist():
+        with _open_cab(file=archive, stream_path=stream_path) as cab_zip:
+            for info in cab_zip.infolist():
+                if info.is_dir(): continue
+                name = _path_to_list(path=info.filename, insensitive=False)[-1]
+                checksums.setdefault(name, (info.CRC, info.file_size))
+                locations.setdefault(name, (stream_path, info.filename))
+                if (name == 'Manifest.xml') and (manifest is None):
+                    with cab_zip.open(info) as member:
+                        manifest = _iterparse_manifest(chunks=iter(lambda: member.read(MANIFEST_CHUNK_SIZE), b''), progress=progress)
+    if manifest is None: raise FileNotFoundError(f'Manifest.xml not found in package ({input_path}).')
+    return (manifest, checksums, locations)
+
+def aapkg_to_checksums(
+    input_path: str,
+    progress: Optional[AaProgressCallback] = None
+) -> tuple[types.AaManifest, dict[str, tuple[int, int]]]:
+    # Reads the manifest and the CRC-32 and size of every file
+    # from the directories of the inner cabs.  Nothing but the
+    # manifest is decompressed.
+    with _open_package(input_path) as archive:
+        (manifest, checksums, _) = _aapkg_directory(archive=archive, input_path=input_path, progress=progress)
+    return (manifest, checksums)
+
+class _AaCabReader:
+    # Reads single files by the (cab, member) locations from
+    # _aapkg_directory.  Only the cab last read from is kept
+    # open, so reading in location order opens each cab once.
+    def __init__(self, archive: zipfile.ZipFile):
+        self.archive = archive
+        self._stream_path: Optional[str] = None
+        self._stack = ExitStack()
+        self._cab: Optional[zipfile.ZipFile] = None
+
+    def read(self, location: tuple[str, str]) -> bytes:
+        (stream_path, filename) = location
+        if stream_path != self._stream_path:
+            self.close()
+            self._cab = self._stack.enter_context(_open_cab(file=self.archive, stream_path=stream_path))
+            self._stream_path = stream_path
+        return self._cab.read(filename)
+
+    def close(self):
+        self._stack.close()
+        (self._stream_path, self._cab) = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def aapkg_to_memory_filtered(
+    input_path: str,
+    selection: types.AaManifestFilter,
+    progress: Optional[AaProgressCallback] = None
+) -> tuple[types.AaManifest, list[types.AaManifestTemplate | types.AaManifestInstance], list[types.AaArchive]]:
+    # The manifest is read first so that only the files of
+    # the selected objects are decompressed.
+    manifest = aapkg_to_manifest(input_path=input_path, progress=progress)
+    entries = list(filter_manifest_objects(manifest, selection=selection))
+    names = {types.AaArchiveIndex.manifest_object_name(x) for x in entries}
+    streams = list(aapkg_to_stream(input_path=input_path, names=names, progress=progress)) if names else []
+    return (manifest, entries, streams)
+
+def aapkg_to_folder(
+    input_path: str,
+    output_path: str,
+    writer: Optional[writers.AaWriter] = None,
+    progress: Optional[AaProgressCallback] = None
+) -> writers.AaWriteResult[types.AaManifest]:
     # Directly dump archive with no application-specific
     # handling.
 
     # Create output folder if it doesn't exist yet
     if not(os.path.exists(output_path)): os.makedirs(output_path, exist_ok=True)
+    if writer is None: writer = writers.AaFolderWriter()
+    before = writer.snapshot()
+
+    manifest = None
+    done = 0
+    for stream in aapkg_to_stream(input_path=input_path, progress=progress):
+        if stream.name == 'Manifest.xml': manifest = _parse_manifest(stream.data, progress=progress)
+        writer.write_bytes(os.path.join(output_path, *stream.path), stream.data)
+        done += 1
+        if progress is not None: progress(AaProgressStage.Write, stream.name, done, 0, writer.stats.bytes_written)
 
-    with zipfile.ZipFile(input_path, 'r') as archive:
-        streams = decompress_aapkg(file=archive)
-        manifest = _get_manifest(streams)
-        for stream in streams:
-            stream_output_path = _create_subfolders(output_path, stream.path)
-            with open(stream_output_path, 'wb') as f:
-                f.write(stream.data)
+    # Streams are written under a folder named after the package,
+    # other packages extracted to the same folder are left alone.
+    writer.remove_stale(os.path.join(output_path, os.path.splitext(os.path.basename(input_path))[0]))
 
-        return manifest
\ No newline at end of file
+    if manifest is None: raise FileNotFoundError(f'Manifest.xml not found in package ({input_path}).')
+    writer.flush()
+    return writers.AaWriteResult(value=manifest, stats=writer.stats.since(before))
\ No newline at end of file
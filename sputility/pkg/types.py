@@ -1,17 +1,17 @@
 from dataclasses import dataclass, field
 
-@dataclass
+@dataclass(slots=True)
 class AaArchive:
     name: str
     data: bytes
     path: list[str]
     size: int
 
-@dataclass
+@dataclass(slots=True)
 class AaManifestIODeviceMap:
     filename: str
 
-@dataclass
+@dataclass(slots=True)
 class AaManifestInstance:
     tag_name: str
     gobjectid: int
@@ -24,7 +24,7 @@ class AaManifestInstance:
     cont_name: str
     toolset_name: str
 
-@dataclass
+@dataclass(slots=True)
 class AaManifestTemplate:
     tag_name: str
     gobjectid: int
@@ -40,14 +40,80 @@ class AaManifestTemplate:
     derived_templates: list['AaManifestTemplate'] = field(default_factory=list)
     derived_instances: list[AaManifestInstance] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class AaManifestVersion:
     cdi_version: str
     ias_version: str
 
-@dataclass
+@dataclass(slots=True)
 class AaManifest:
     product_version: AaManifestVersion
     templates: list[AaManifestTemplate]
     bindings: AaManifestIODeviceMap
-    object_count: int
\ No newline at end of file
+    object_count: int
+
+@dataclass(slots=True)
+class AaManifestFilter:
+    # Selects objects from a manifest, all criteria that are
+    # set have to match.  Names are case-insensitive globs.
+    tag_names: list[str] = None     # Any of these tag names
+    template: str = None            # This template and everything derived from it
+    area_name: str = None
+    host_name: str = None
+
+class AaArchiveIndex:
+    # Name lookups built once per package so that finding the
+    # stream for each manifest entry doesn't rescan every stream.
+    def __init__(self, streams: list[AaArchive]):
+        self.streams = streams
+        self._by_name: dict[str, AaArchive] = {}
+        self._by_name_casefold: dict[str, AaArchive] = {}
+        self._by_path: dict[tuple[str, ...], AaArchive] = {}
+        self._by_path_casefold: dict[tuple[str, ...], AaArchive] = {}
+        for stream in streams:
+            # Keep the first match to behave the same as a linear scan
+            self._by_name.setdefault(stream.name, stream)
+            self._by_name_casefold.setdefault(stream.name.casefold(), stream)
+            self._by_path.setdefault(tuple(stream.path), stream)
+            self._by_path_casefold.setdefault(tuple(x.casefold() for x in stream.path), stream)
+
+    def __len__(self) -> int:
+        return len(self.streams)
+
+    def __iter__(self):
+        return iter(self.streams)
+
+    def get(self, name: str, case_insensitive: bool = False) -> AaArchive:
+        if case_insensitive:
+            return self._by_name_casefold.get(name.casefold())
+        else:
+            return self._by_name.get(name)
+
+    def get_by_path(self, path: str | list[str], case_insensitive: bool = False) -> AaArchive:
+        if isinstance(path, str):
+            path = [comp for comp in path.replace('\\', '/').split('/') if comp]
+        if case_insensitive:
+            return self._by_path_casefold.get(tuple(x.casefold() for x in path))
+        else:
+            return self._by_path.get(tuple(path))
+
+    def get_by_tag_name(self, tag_name: str, case_insensitive: bool = False) -> AaArchive:
+        # Protected templates are stored under their tag name
+        # rather than the file name listed in the manifest.
+        return self.get(f'{tag_name}.txt', case_insensitive=case_insensitive)
+
+    @staticmethod
+    def manifest_object_name(entry: AaManifestTemplate | AaManifestInstance) -> str:
+        # Protected templates are stored under their tag name
+        # rather than the file name listed in the manifest.
+        if getattr(entry, 'is_protected', False):
+            return f'{entry.tag_name}.txt'
+        else:
+            return entry.file_name
+
+    def get_manifest_object(
+        self,
+        entry: AaManifestTemplate | AaManifestInstance,
+        case_insensitive: bool = False
+    ) -> AaArchive:
+        return self.get(self.manifest_object_name(entry), case_insensitive=case_insensitive)
@@ -0,0 +1,96 @@
+from collections.abc import Callable
+from enum import StrEnum
+import sys
+import time
+from typing import Optional, TextIO
+
+# Progress callbacks are called as
+#   callback(stage, item, done, total, nbytes)
+# where item is the file or tag name being processed, done/total
+# count items in the stage (total is 0 when not known up front)
+# and nbytes is the running total of bytes processed in the stage.
+AaProgressCallback = Callable[[str, str, int, int, int], None]
+
+# Shortest time between calls for each stage
+PROGRESS_INTERVAL = 0.1
+
+class AaProgressStage(StrEnum):
+    Decompress = 'decompress'
+    Manifest = 'manifest'
+    Deserialize = 'deserialize'
+    Write = 'write'
+    Package = 'package'         # Batches, one event per finished package
+
+class AaProgressThrottle:
+    # Passes at most one event per stage every interval seconds
+    # to the callback.  The first and last event of a stage are
+    # always passed on, held back events are passed on when a new
+    # stage starts or on close().  Events of the unthrottled stages
+    # are always passed on.
+    def __init__(
+        self,
+        callback: AaProgressCallback,
+        interval: float = PROGRESS_INTERVAL,
+        unthrottled: tuple[str, ...] = (AaProgressStage.Package,)
+    ):
+        self.callback = callback
+        self.interval = interval
+        self.unthrottled = unthrottled
+        self._last: dict[str, float] = {}
+        self._pending: dict[str, tuple] = {}
+
+    def _flush(self):
+        for event in list(self._pending.values()): self.callback(*event)
+        self._pending.clear()
+
+    def __call__(self, stage: str, item: str, done: int, total: int, nbytes: int):
+        if stage in self.unthrottled:
+            self._flush()
+            self.callback(stage, item, done, total, nbytes)
+            return
+        now = time.monotonic()
+        last = self._last.get(stage)
+        if last is None: self._flush()
+        if (last is None) or (done == 0) or (done == total) or ((now - last) >= self.interval):
+            self._last[stage] = now
+            self._pending.pop(stage, None)
+            self.callback(stage, item, done, total, nbytes)
+        else:
+            self._pending[stage] = (stage, item, done, total, nbytes)
+
+    def close(self):
+        self._flush()
+
+class AaProgressReporter:
+    # Prints progress with items/s and MB/s since the start of
+    # each stage, at most once every interval seconds per stage.
+    def __init__(self, file: Optional[TextIO] = None, interval: float = 1.0):
+        self.file = file
+        self.interval = interval
+        self._started: dict[str, float] = {}
+        self._printed: dict[str, float] = {}
+
+    def rates(self, stage: str, done: int, nbytes: int) -> tuple[float, float]:
+        # (items per second, MB per second)
+        elapsed = time.monotonic() - self._started.get(stage, time.monotonic())
+        if elapsed <= 0: return (0.0, 0.0)
+        return (done / elapsed, nbytes / elapsed / 1e6)
+
+    def __call__(self, stage: str, item: str, done: int, total: int, nbytes: int):
+        now = time.monotonic()
+        started = stage in self._started
+        self._started.setdefault(stage, now)
+        if done == 0: return
+        printed = self._printed.get(stage)
+        if (done != total) and (printed is not None) and ((now - printed) < self.interval): return
+        self._printed[stage] = now
+
+        # Rates aren't known for a stage that only reported once
+        count = f'{done}/{total}' if total else str(done)
+        if started:
+            (items_rate, bytes_rate) = self.rates(stage, done, nbytes)
+            unit = 'packages' if (stage == AaProgressStage.Package) else 'objects'
+            line = f'{stage}: {count} ({items_rate:.1f} {unit}/s, {bytes_rate:.2f} MB/s) {item}'
+        else:
+            line = f'{stage}: {count} ({nbytes / 1e6:.2f} MB) {item}'
+        print(line, file=self.file if self.file is not None else sys.stderr)
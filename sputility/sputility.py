@@ -1,10 +1,51 @@
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import ExitStack
 import os
+import time
 from typing import Optional
 from warnings import warn
 
+from . import batch
+from . import diff
 from . import obj
 from . import pkg
+from . import writers
+from .progress import AaProgressCallback, AaProgressStage, AaProgressThrottle
+
+# Cache of a worker process.  It is handed to each worker once when
+# the worker starts, rather than with every task, so that the running
+# size of the cache is kept from one task to the next.
+_worker_cache: Optional[obj.cache.AaObjectCache] = None
+
+def _init_worker(cache: Optional[obj.cache.AaObjectCache]):
+    global _worker_cache
+    _worker_cache = cache
+
+def _deserialize_package_object(
+    data: bytes,
+    output_path: str,
+    writer: Optional[writers.AaWriter],
+    indent: Optional[int],
+    cache: Optional[obj.cache.AaObjectCache] = None
+) -> tuple[obj.types.AaObject, Optional[writers.AaWriteStats], Optional[set[str]], Optional[Exception]]:
+    # Runs in a worker process, the writer results are sent
+    # back so they can be merged into the caller's writer.
+    #
+    # Without a writer the object is only deserialized and
+    # the caller writes it.  Errors deserializing the object
+    # are raised, errors writing it are returned so that the
+    # caller can tell them apart and raise them itself.
+    if cache is None: cache = _worker_cache
+    result = obj.deserialize._deserialize_cached(data, cache=cache)
+    if writer is None: return (result, None, None, None)
+    try:
+        obj.deserialize._aaobject_write_folder(obj=result, output_path=output_path, writer=writer, indent=indent)
+        writer.flush()
+    except Exception as e:
+        return (result, None, None, e)
+    return (result, writer.stats, writer.touched, None)
 
 class SPUtility(object):
     def __init__(self):
@@ -14,59 +55,444 @@ class SPUtility(object):
         self,
         input_path: str,
         output_path: str,
-        progress: Optional[Callable[[str, str, int, int], None]] = None, 
-    ) -> pkg.types.AaManifest:
+        progress: Optional[AaProgressCallback] = None,
+        writer: Optional[writers.AaWriter] = None,
+    ) -> writers.AaWriteResult[pkg.types.AaManifest]:
         if not(os.path.isfile(input_path)): raise FileNotFoundError(f'Input file specified ({input_path}) does not exist.')
         if not(os.path.exists(output_path)): os.makedirs(output_path, exist_ok=True)
-        result = pkg.decompress.aapkg_to_folder(input_path=input_path, output_path=output_path)
+        if writer is None: writer = writers.AaFolderWriter()
+        if progress is not None: progress = AaProgressThrottle(progress)
+        result = pkg.decompress.aapkg_to_folder(input_path=input_path, output_path=output_path, writer=writer, progress=progress)
+        if progress is not None: progress.close()
+        return result
+
+    def read_package_manifest(
+        self,
+        input_path: str,
+    ) -> pkg.types.AaManifest:
+        if not(os.path.isfile(input_path)): raise FileNotFoundError(f'Input file specified ({input_path}) does not exist.')
+        result = pkg.decompress.aapkg_to_manifest(input_path=input_path)
+        return result
+
+    def diff_packages(
+        self,
+        old_path: str,
+        new_path: str,
+        progress: Optional[AaProgressCallback] = None,
+        verify: bool = False,
+    ) -> diff.AaPackageDiff:
+        if not(os.path.isfile(old_path)): raise FileNotFoundError(f'Input file specified ({old_path}) does not exist.')
+        if not(os.path.isfile(new_path)): raise FileNotFoundError(f'Input file specified ({new_path}) does not exist.')
+        if progress is not None: progress = AaProgressThrottle(progress)
+        result = diff.diff_packages(old_path=old_path, new_path=new_path, progress=progress, verify=verify)
+        if progress is not None: progress.close()
         return result
 
+    def _deserialize_inputs(
+        self,
+        inputs: Iterable[tuple[int, pkg.types.AaManifestTemplate | pkg.types.AaManifestInstance, Optional[str | bytes], int]],
+        total: int,
+        output_path: str,
+        progress: Optional[AaProgressCallback],
+        workers: Optional[int],
+        cache: Optional[obj.cache.AaObjectCache],
+        writer: writers.AaWriter,
+        indent: Optional[int],
+    ) -> batch.AaObjectList:
+        # Inputs are (manifest position, manifest entry, object bytes or
+        # file path, size), with None in place of the data for object
+        # files that weren't found.  They can come in any order and are
+        # consumed as they are produced, the result is in manifest order.
+        # Objects are counted as done whether or not they succeed, objects
+        # that can't be deserialized are warned about and returned in the
+        # result's failed.  Errors writing the output are raised.
+        (items, failures) = ([], [])
+        (done, nbytes) = (0, 0)
+        if progress is not None:
+            progress(AaProgressStage.Deserialize, '', done, total, nbytes)
+            progress(AaProgressStage.Write, '', done, total, writer.stats.bytes_written)
+
+        def _fail(position: int, entry, e: Exception):
+            failures.append((position, batch.AaObjectFailure(tag_name=entry.tag_name, file_name=entry.file_name, error=e)))
+            warn(f'Failed to deserialize {entry.tag_name} ({entry.file_name}): {e!r}')
+
+        def _missing(entry) -> FileNotFoundError:
+            return FileNotFoundError(f'Object file {pkg.types.AaArchiveIndex.manifest_object_name(entry)} not found.')
+
+        if (workers is None) or (workers <= 1):
+            for (position, entry, data, size) in inputs:
+                (done, nbytes) = (done + 1, nbytes + size)
+                try:
+                    if data is None: raise _missing(entry)
+                    item = obj.deserialize._deserialize_cached(data, cache=cache)
+                except Exception as e:
+                    _fail(position, entry, e)
+                    continue
+                if progress is not None: progress(AaProgressStage.Deserialize, entry.tag_name, done, total, nbytes)
+                obj.deserialize._aaobject_write_folder(obj=item, output_path=output_path, writer=writer, indent=indent)
+                if progress is not None: progress(AaProgressStage.Write, entry.tag_name, done, total, writer.stats.bytes_written)
+                items.append((position, item))
+        else:
+            # Objects are independent so they can be spread across processes.
+            # Only a few objects per worker are queued at once to avoid copying
+            # the whole package into the executor up front.  Results are
+            # collected in manifest order.
+            pending = deque()
+            worker_writer = writer if writer.process_safe else None
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache,)) as executor:
+                def _collect():
+                    nonlocal done, nbytes
+                    (position, entry, size, future) = pending.popleft()
+                    (done, nbytes) = (done + 1, nbytes + size)
+                    try:
+                        (item, stats, touched, error) = future.result()
+                    except Exception as e:
+                        _fail(position, entry, e)
+                        return
+                    if error is not None: raise error
+                    if progress is not None: progress(AaProgressStage.Deserialize, entry.tag_name, done, total, nbytes)
+                    if worker_writer is None:
+                        obj.deserialize._aaobject_write_folder(obj=item, output_path=output_path, writer=writer, indent=indent)
+                    else:
+                        writer.merge(stats, touched)
+                    if progress is not None: progress(AaProgressStage.Write, entry.tag_name, done, total, writer.stats.bytes_written)
+                    items.append((position, item))
+
+                for (position, entry, data, size) in inputs:
+                    if len(pending) >= (workers * 4): _collect()
+                    if data is None:
+                        # Kept in the queue so failures are reported in manifest order
+                        future = Future()
+                        future.set_exception(_missing(entry))
+                    else:
+                        future = executor.submit(_deserialize_package_object, data, output_path, worker_writer, indent)
+                    pending.append((position, entry, size, future))
+                while pending: _collect()
+
+        result = batch.AaObjectList(x[1] for x in sorted(items, key=lambda x: x[0]))
+        result.failed.extend(x[1] for x in sorted(failures, key=lambda x: x[0]))
+        return result
+
+    def _remove_stale(
+        self,
+        writer: writers.AaWriter,
+        output_path: str,
+        result: batch.AaObjectList,
+        selection: Optional[pkg.types.AaManifestFilter],
+    ):
+        # One pass once every object is written, so that the writer
+        # is only flushed once.  With a selection only the folders of
+        # the selected objects are pruned.
+        if selection is None:
+            writer.remove_stale(output_path, keep=[os.path.join(output_path, x.tag_name) for x in result.failed])
+        else:
+            for item in result: writer.remove_stale(os.path.join(output_path, item.header.tagname))
+
+    def _iter_package_inputs(
+        self,
+        input_path: str,
+        entries: list[pkg.types.AaManifestTemplate | pkg.types.AaManifestInstance],
+        progress: Optional[AaProgressCallback],
+    ) -> Iterator[tuple[int, pkg.types.AaManifestTemplate | pkg.types.AaManifestInstance, Optional[bytes], int]]:
+        # Yields the inputs of _deserialize_inputs as the object files
+        # are decompressed, so only the objects being worked on are held
+        # in memory rather than the whole package.  Objects whose files
+        # weren't found follow at the end.
+        names: dict[str, list[tuple[int, pkg.types.AaManifestTemplate | pkg.types.AaManifestInstance]]] = {}
+        for (position, entry) in enumerate(entries):
+            names.setdefault(pkg.types.AaArchiveIndex.manifest_object_name(entry), []).append((position, entry))
+        found = set()
+        if names:
+            for stream in pkg.decompress.aapkg_to_stream(input_path=input_path, names=set(names), progress=progress):
+                # Keep the first match the same as AaArchiveIndex
+                if stream.name in found: continue
+                found.add(stream.name)
+                for (position, entry) in names[stream.name]: yield (position, entry, stream.data, stream.size)
+        for (name, items) in names.items():
+            if name in found: continue
+            for (position, entry) in items: yield (position, entry, None, 0)
+
     def deserialize_package(
         self,
         input_path: str,
         output_path: str,
-        progress: Optional[Callable[[str, str, int, int], None]] = None, 
-    ) -> list[obj.types.AaObject]:
+        progress: Optional[AaProgressCallback] = None,
+        workers: Optional[int] = None,
+        cache: Optional[obj.cache.AaObjectCache] = None,
+        writer: Optional[writers.AaWriter] = None,
+        indent: Optional[int] = 4,
+        selection: Optional[pkg.types.AaManifestFilter] = None,
+    ) -> batch.AaObjectList:
         if not(os.path.isfile(input_path)): raise FileNotFoundError(f'Input file specified ({input_path}) does not exist.')
-
-        result = []
+        if progress is not None: progress = AaProgressThrottle(progress)
 
         aapkg_name = os.path.splitext(os.path.basename(input_path))[0]
         aapkg_path = os.path.join(output_path, aapkg_name)
         if not(os.path.exists(aapkg_path)): os.makedirs(aapkg_path, exist_ok=True)
-        (manifest, streams) = pkg.decompress.aapkg_to_memory(input_path=input_path)
+        # The manifest is read first so that objects can be deserialized
+        # as their files are decompressed.
+        manifest = pkg.decompress.aapkg_to_manifest(input_path=input_path, progress=progress)
+        if selection is None:
+            entries = list(pkg.decompress.iter_manifest_objects(manifest))
+        else:
+            entries = list(pkg.decompress.filter_manifest_objects(manifest, selection=selection))
+        if writer is None: writer = writers.AaFolderWriter()
+        before = writer.snapshot()
+        result = self._deserialize_inputs(
+            inputs=self._iter_package_inputs(input_path=input_path, entries=entries, progress=progress),
+            total=len(entries), output_path=aapkg_path, progress=progress,
+            workers=workers, cache=cache, writer=writer, indent=indent
+        )
 
-        def _get_stream(name: str, streams: list[pkg.types.AaArchive]) -> pkg.types.AaArchive:
-            return next((stream for stream in streams if stream.name == name), None)
+        # Folders of objects no longer in the package, only known
+        # when the whole package was deserialized.  The last output
+        # of objects that failed this time is kept.
+        self._remove_stale(writer=writer, output_path=aapkg_path, result=result, selection=selection)
+        writer.flush()
+        result.stats = writer.stats.since(before)
+        if progress is not None: progress.close()
+        return result
 
-        def _get_stream_filename(tag_name: str, file_name: str, protected: bool) -> str:
-           if protected:
-               return f'{tag_name}.txt'
-           else:
-               return file_name
+    def serialize_package(
+        self,
+        objects: list[obj.types.AaObject],
+        manifest: pkg.types.AaManifest,
+        output_path: str,
+        progress: Optional[AaProgressCallback] = None,
+    ):
+        # Objects are stored under the file names their manifest
+        # entries are looked up by.  Objects missing from the
+        # manifest are stored as <tag name>.txt.
+        names = {x.tag_name: pkg.types.AaArchiveIndex.manifest_object_name(x) for x in pkg.decompress.iter_manifest_objects(manifest)}
+        files = {}
+        for item in objects:
+            tag_name = item.header.tagname
+            files[names.get(tag_name, f'{tag_name}.txt')] = obj.serialize.serialize_aaobject(item)
+        if progress is not None: progress = AaProgressThrottle(progress)
+        pkg.compress.memory_to_aapkg(output_path=output_path, manifest=manifest, files=files, progress=progress)
+        if progress is not None: progress.close()
 
-        def _recurse(template: pkg.types.AaManifestTemplate, result: list[obj.types.AaObject]):
-            #print(template.tag_name)
-            result.append(obj.deserialize.aaobject_to_folder(_get_stream(_get_stream_filename(template.tag_name, template.file_name, template.is_protected), streams).data, output_path=aapkg_path))
-            for child in template.derived_templates:
-                _recurse(template=child, result=result)
+    def deserialize_folder(
+        self,
+        input_path: str,
+        output_path: str,
+        progress: Optional[AaProgressCallback] = None,
+        workers: Optional[int] = None,
+        cache: Optional[obj.cache.AaObjectCache] = None,
+        writer: Optional[writers.AaWriter] = None,
+        indent: Optional[int] = 4,
+        selection: Optional[pkg.types.AaManifestFilter] = None,
+    ) -> batch.AaObjectList:
+        # Same as deserialize_package for a package extracted with
+        # decompress_package.  Workers are given file paths rather
+        # than object bytes, and large object files are memory-mapped,
+        # so workers read them from the shared page cache.
+        if not(os.path.isdir(input_path)): raise FileNotFoundError(f'Input folder specified ({input_path}) does not exist.')
+        if progress is not None: progress = AaProgressThrottle(progress)
 
-            for child in template.derived_instances:
-                #print(child.file_name)
-                result.append(obj.deserialize.aaobject_to_folder(_get_stream(child.file_name, streams).data, output_path=aapkg_path))
+        files = {}
+        for (folder, folders, names) in os.walk(input_path):
+            folders.sort()
+            for name in sorted(names): files.setdefault(name, os.path.join(folder, name))
+        manifest_path = files.get('Manifest.xml')
+        if manifest_path is None: raise FileNotFoundError(f'Manifest.xml not found in folder ({input_path}).')
+        with open(manifest_path, 'rb') as f:
+            manifest = pkg.decompress._iterparse_manifest(chunks=iter(lambda: f.read(pkg.decompress.MANIFEST_CHUNK_SIZE), b''), progress=progress)
+        if selection is None:
+            entries = list(pkg.decompress.iter_manifest_objects(manifest))
+        else:
+            entries = list(pkg.decompress.filter_manifest_objects(manifest, selection=selection))
 
-        for template in manifest.templates:
-            _recurse(template=template, result=result)
+        aapkg_path = os.path.join(output_path, os.path.basename(os.path.normpath(input_path)))
+        if not(os.path.exists(aapkg_path)): os.makedirs(aapkg_path, exist_ok=True)
+        if writer is None: writer = writers.AaFolderWriter()
+        before = writer.snapshot()
+        inputs = []
+        for (position, entry) in enumerate(entries):
+            file = files.get(pkg.types.AaArchiveIndex.manifest_object_name(entry))
+            inputs.append((position, entry, None, 0) if file is None else (position, entry, file, os.path.getsize(file)))
+        result = self._deserialize_inputs(
+            inputs=inputs, total=len(inputs), output_path=aapkg_path, progress=progress,
+            workers=workers, cache=cache, writer=writer, indent=indent
+        )
 
+        self._remove_stale(writer=writer, output_path=aapkg_path, result=result, selection=selection)
+        writer.flush()
+        result.stats = writer.stats.since(before)
+        if progress is not None: progress.close()
         return result
 
+    def deserialize_packages(
+        self,
+        input_paths: str | list[str],
+        output_path: str,
+        progress: Optional[AaProgressCallback] = None,
+        workers: Optional[int] = None,
+        cache: Optional[obj.cache.AaObjectCache] = None,
+        writer: Optional[writers.AaWriter] = None,
+        indent: Optional[int] = 4,
+        selection: Optional[pkg.types.AaManifestFilter] = None,
+    ) -> list[batch.AaPackageSummary]:
+        # Deserializes many packages on one shared pool of worker processes.
+        # input_paths are packages, folders of packages or globs.  Each
+        # package goes to its own folder as with deserialize_package.
+        #
+        # Packages are read one at a time and their objects queued largest
+        # first, while the objects of the previous package are still being
+        # worked on, so workers don't sit idle at the end of each package.
+        # Each object is decompressed just before it is queued and at most
+        # workers * 4 are queued at once, so only those are held in memory.
+        # Objects aren't kept, a summary is returned per package.
+        # Packages that can't be read are warned about and given an error
+        # in their summary, the rest still go through.
+        paths = batch.expand_package_paths(input_paths)
+        if workers is None: workers = os.cpu_count() or 1
+        if writer is None: writer = writers.AaFolderWriter()
+        if progress is not None: progress = AaProgressThrottle(progress)
+
+        summaries = [batch.AaPackageSummary(input_path=x, output_path=os.path.join(output_path, os.path.splitext(os.path.basename(x))[0])) for x in paths]
+        written = [[] for x in summaries]
+        remaining = [0] * len(summaries)
+        started = [0.0] * len(summaries)
+        (done, nbytes, packages_done) = (0, 0, 0)
+        if progress is not None: progress(AaProgressStage.Package, '', packages_done, len(summaries), 0)
+
+        # With a single worker objects are deserialized in this process
+        # as they are queued, the rest works the same.
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache,)) if (workers > 1) else None
+        worker_writer = writer if ((executor is not None) and writer.process_safe) else None
+        pending = {}
+
+        def _submit(*args) -> Future:
+            if executor is not None: return executor.submit(_deserialize_package_object, *args)
+            future = Future()
+            try:
+                future.set_result(_deserialize_package_object(*args, cache=cache))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        def _finish(k: int):
+            nonlocal packages_done
+            summary = summaries[k]
+            summary.seconds = time.perf_counter() - started[k]
+            packages_done += 1
+            if progress is not None: progress(AaProgressStage.Package, summary.name, packages_done, len(summaries), summary.bytes)
+
+        def _collect(futures):
+            nonlocal done, nbytes
+            for future in futures:
+                (k, entry, size) = pending.pop(future)
+                summary = summaries[k]
+                (done, nbytes) = (done + 1, nbytes + size)
+                try:
+                    (item, stats, touched, error) = future.result()
+                except Exception as e:
+                    (item, error) = (None, None)
+                    summary.failed.append(entry.tag_name)
+                    warn(f'Failed to deserialize {entry.tag_name} ({summary.input_path}): {e!r}')
+                if error is not None: raise error
+                if item is not None:
+                    if worker_writer is None:
+                        obj.deserialize._aaobject_write_folder(obj=item, output_path=summary.output_path, writer=writer, indent=indent)
+                    else:
+                        writer.merge(stats, touched)
+                    written[k].append(entry.tag_name)
+                    summary.objects += 1
+                    summary.bytes += size
+                if progress is not None: progress(AaProgressStage.Deserialize, f'{summary.name}/{entry.tag_name}', done, 0, nbytes)
+                remaining[k] -= 1
+                if remaining[k] == 0: _finish(k)
+
+        def _fail(k: int, entry, message: str):
+            summaries[k].failed.append(entry.tag_name)
+            warn(message)
+            remaining[k] -= 1
+            if remaining[k] == 0: _finish(k)
+
+        try:
+            for (k, summary) in enumerate(summaries):
+                with ExitStack() as stack:
+                    try:
+                        archive = stack.enter_context(pkg.decompress._open_package(summary.input_path))
+                        (manifest, checksums, locations) = pkg.decompress._aapkg_directory(archive=archive, input_path=summary.input_path)
+                        if selection is None:
+                            entries = list(pkg.decompress.iter_manifest_objects(manifest))
+                        else:
+                            entries = list(pkg.decompress.filter_manifest_objects(manifest, selection=selection))
+                    except Exception as e:
+                        summary.error = e
+                        warn(f'Failed to read package {summary.input_path}: {e!r}')
+                        started[k] = time.perf_counter()
+                        _finish(k)
+                        continue
+
+                    # Sizes come from the cab directories, so nothing is
+                    # decompressed before it is queued.  The objects of a
+                    # cab are kept together so that each cab is only
+                    # decompressed once.
+                    work = []
+                    for entry in entries:
+                        name = pkg.types.AaArchiveIndex.manifest_object_name(entry)
+                        if name in locations:
+                            work.append((entry, locations[name], checksums[name][1]))
+                        else:
+                            summary.failed.append(entry.tag_name)
+                            warn(f'Object file for {entry.tag_name} not found in {summary.input_path}.')
+                    largest = {}
+                    for (entry, (cab, member), size) in work: largest[cab] = max(largest.get(cab, 0), size)
+                    work.sort(key=lambda x: (-largest[x[1][0]], x[1][0], -x[2]))
+
+                    os.makedirs(summary.output_path, exist_ok=True)
+                    started[k] = time.perf_counter()
+                    remaining[k] = len(work)
+                    if not(work): _finish(k)
+                    reader = stack.enter_context(pkg.decompress._AaCabReader(archive))
+                    for (entry, location, size) in work:
+                        while len(pending) >= (workers * 4):
+                            _collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                        try:
+                            data = reader.read(location)
+                        except Exception as e:
+                            _fail(k, entry, f'Failed to read {entry.tag_name} ({summary.input_path}): {e!r}')
+                            continue
+                        pending[_submit(data, summary.output_path, worker_writer, indent)] = (k, entry, len(data))
+                        if executor is None: _collect(list(pending))
+            while pending: _collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        finally:
+            if executor is not None: executor.shutdown(cancel_futures=True)
+
+        for (k, summary) in enumerate(summaries):
+            # Nothing was written for packages that couldn't be read
+            if summary.error is not None: continue
+            if selection is None:
+                writer.remove_stale(summary.output_path, keep=[os.path.join(summary.output_path, x) for x in summary.failed])
+            else:
+                for tag_name in written[k]: writer.remove_stale(os.path.join(summary.output_path, tag_name))
+        writer.flush()
+        if progress is not None: progress.close()
+        return summaries
+
     def deserialize_object(
         self,
         input_path: str,
         output_path: str,
-        progress: Optional[Callable[[str, str, int, int], None]] = None, 
-    ) -> obj.types.AaObject:
+        progress: Optional[AaProgressCallback] = None,
+        writer: Optional[writers.AaWriter] = None,
+        indent: Optional[int] = 4,
+    ) -> writers.AaWriteResult[obj.types.AaObject]:
         if not(os.path.isfile(input_path)): raise FileNotFoundError(f'Input file specified ({input_path}) does not exist.')
         if not(os.path.exists(output_path)): os.makedirs(output_path, exist_ok=True)
-        result = obj.deserialize.aaobject_to_folder(input=input_path, output_path=output_path)
-        return result
\ No newline at end of file
+        if writer is None: writer = writers.AaFolderWriter()
+        before = writer.snapshot()
+        name = os.path.basename(input_path)
+
+        # Reported the same way as a package with one object
+        data = obj.deserialize._read_aaobject(input_path)
+        result = obj.deserialize.deserialize_aaobject(data)
+        if progress is not None: progress(AaProgressStage.Deserialize, name, 1, 1, len(data))
+        obj.deserialize._aaobject_write_folder(obj=result, output_path=output_path, writer=writer, indent=indent)
+        writer.remove_stale(os.path.join(output_path, result.header.tagname))
+        writer.flush()
+        if progress is not None: progress(AaProgressStage.Write, name, 1, 1, writer.stats.bytes_written)
+        return writers.AaWriteResult(value=result, stats=writer.stats.since(before))
\ No newline at end of file
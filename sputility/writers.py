@@ -0,0 +1,351 @@
+import base64
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+import io
+import json
+import locale
+import os
+import tarfile
+import threading
+import time
+from typing import Generic, TypeVar
+import zipfile
+
+@dataclass(slots=True)
+class AaWriteStats:
+    written: int = 0
+    skipped: int = 0
+    removed: int = 0
+    bytes_written: int = 0
+
+    def add(self, other: 'AaWriteStats'):
+        self.written += other.written
+        self.skipped += other.skipped
+        self.removed += other.removed
+        self.bytes_written += other.bytes_written
+
+    def since(self, before: 'AaWriteStats') -> 'AaWriteStats':
+        # Counts added after before was taken, for one run
+        # of a writer that is reused.
+        return AaWriteStats(
+            written=self.written - before.written,
+            skipped=self.skipped - before.skipped,
+            removed=self.removed - before.removed,
+            bytes_written=self.bytes_written - before.bytes_written
+        )
+
+T = TypeVar('T')
+
+@dataclass(slots=True)
+class AaWriteResult(Generic[T]):
+    # What a call that writes output returns: its usual
+    # result and the files written, skipped and removed.
+    value: T
+    stats: AaWriteStats
+
+def _encode_text(text: str, encoding: str = None, newline: str = None) -> bytes:
+    # Same bytes open(path, 'w', encoding=encoding, newline=newline) would write.
+    if encoding is None: encoding = locale.getpreferredencoding(False)
+    if newline is None: newline = os.linesep
+    if newline not in ('', '\n'): text = text.replace('\n', newline)
+    return text.encode(encoding)
+
+def _is_unchanged(path: str, data: bytes) -> bool:
+    # Sizes are compared first so most changed files
+    # are caught without reading them.
+    try:
+        if os.path.getsize(path) != len(data): return False
+        with open(path, 'rb') as f:
+            return (f.read() == data)
+    except OSError:
+        return False
+
+class AaWriter:
+    # Common interface for everything output is written through.
+    #
+    # Only writers that set process_safe=True are shared with worker
+    # processes, their stats and touched paths are sent back and
+    # merged.  Otherwise the objects are sent back and written by
+    # the calling process.
+    process_safe = False
+
+    def __init__(self):
+        self.stats = AaWriteStats()
+        self.touched: set[str] = set()
+
+    def write_bytes(self, path: str, data: bytes):
+        raise NotImplementedError()
+
+    def write_text(self, path: str, text: str, encoding: str = None, newline: str = None):
+        self.write_bytes(path, _encode_text(text, encoding=encoding, newline=newline))
+
+    def flush(self):
+        pass
+
+    def merge(self, stats: AaWriteStats, touched: set[str]):
+        # Folds in the results of a writer used in another process.
+        self.stats.add(stats)
+        self.touched.update(touched)
+
+    def remove_stale(self, folder: str, keep: Iterable[str] = ()):
+        pass
+
+    def close(self) -> AaWriteStats:
+        self.flush()
+        return self.stats
+
+    def snapshot(self) -> AaWriteStats:
+        # Counts so far, to measure one call with since()
+        self.flush()
+        return replace(self.stats)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class AaFolderWriter(AaWriter):
+    # Writes output files to disk.
+    #
+    # With skip_unchanged=True files whose content already matches
+    # are left alone, so repeated exports only touch what changed.
+    # With remove_stale=True, remove_stale() deletes files under a
+    # folder that weren't written or skipped by this writer, other
+    # than those under the keep folders.
+    process_safe = True
+
+    def __init__(self, skip_unchanged: bool = False, remove_stale: bool = False):
+        super().__init__()
+        self.skip_unchanged = skip_unchanged
+        self.remove_stale_files = remove_stale
+        self._folders: set[str] = set()
+
+    def __reduce__(self):
+        # Worker processes get a fresh writer with the same settings.
+        return (AaFolderWriter, (self.skip_unchanged, self.remove_stale_files))
+
+    def _makedirs(self, folder: str):
+        # Remember folders already created to save a system call per file.
+        if folder in self._folders: return
+        os.makedirs(folder, exist_ok=True)
+        self._folders.add(folder)
+
+    def _write(self, path: str, data: bytes) -> bool:
+        # Returns False if the file was skipped.
+        if self.skip_unchanged and _is_unchanged(path, data): return False
+        self._makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+        return True
+
+    def write_bytes(self, path: str, data: bytes):
+        path = os.path.abspath(path)
+        self.touched.add(path)
+        if self._write(path, data):
+            self.stats.written += 1
+            self.stats.bytes_written += len(data)
+        else:
+            self.stats.skipped += 1
+
+    def remove_stale(self, folder: str, keep: Iterable[str] = ()):
+        if not(self.remove_stale_files): return
+        self.flush()
+        folder = os.path.abspath(folder)
+        if not(os.path.isdir(folder)): return
+        keep = {os.path.abspath(x) for x in keep}
+        for (root, dirs, files) in os.walk(folder, topdown=False):
+            if any((root == x) or root.startswith(x + os.sep) for x in keep): continue
+            for file in files:
+                path = os.path.join(root, file)
+                if path in self.touched: continue
+                os.remove(path)
+                self.stats.removed += 1
+            if (root != folder) and not(os.listdir(root)):
+                os.rmdir(root)
+                self._folders.discard(root)
+
+class AaThreadedFolderWriter(AaFolderWriter):
+    # Hands writes off to a pool of threads so that parsing
+    # and disk I/O overlap, which helps most on network shares.
+    #
+    # At most max_pending writes are queued, after that the
+    # caller waits.  The first write error is raised from the
+    # next write, flush() or close().
+    def __init__(
+        self,
+        skip_unchanged: bool = False,
+        remove_stale: bool = False,
+        max_workers: int = 8,
+        max_pending: int = 256
+    ):
+        super().__init__(skip_unchanged=skip_unchanged, remove_stale=remove_stale)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sputility-writer')
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._error = None
+
+    def _raise_error(self):
+        if self._error is not None:
+            (error, self._error) = (self._error, None)
+            raise error
+
+    def _done(self, future: Future, nbytes: int):
+        with self._condition:
+            self._pending -= 1
+            try:
+                if future.result():
+                    self.stats.written += 1
+                    self.stats.bytes_written += nbytes
+                else:
+                    self.stats.skipped += 1
+            except Exception as e:
+                if self._error is None: self._error = e
+            self._condition.notify_all()
+
+    def write_bytes(self, path: str, data: bytes):
+        path = os.path.abspath(path)
+        self.touched.add(path)
+        # Views may point into buffers the caller reuses
+        if isinstance(data, memoryview): data = bytes(data)
+        with self._condition:
+            self._raise_error()
+            while self._pending >= self.max_pending: self._condition.wait()
+            self._pending += 1
+        nbytes = len(data)
+        self._executor.submit(self._write, path, data).add_done_callback(lambda future: self._done(future, nbytes))
+
+    def flush(self):
+        with self._condition:
+            while self._pending > 0: self._condition.wait()
+            self._raise_error()
+
+    def close(self) -> AaWriteStats:
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+        return self.stats
+
+class AaArchiveWriter(AaWriter):
+    # Writes the same tree into a single file instead of a
+    # folder.  Paths are stored relative to root, which defaults
+    # to the folder the archive is in.
+    def __init__(self, path: str, root: str = None):
+        super().__init__()
+        self.path = path
+        self.root = os.path.abspath(root if root is not None else os.path.dirname(os.path.abspath(path)))
+
+    def __reduce__(self):
+        raise TypeError(f'{type(self).__name__} cannot be shared between processes.')
+
+    def _name(self, path: str) -> str:
+        name = os.path.relpath(os.path.abspath(path), self.root)
+        if name.startswith(os.pardir): raise ValueError(f'Output path ({path}) is outside of the archive root ({self.root}).')
+        return name.replace(os.sep, '/')
+
+class AaZipWriter(AaArchiveWriter):
+    def __init__(
+        self,
+        path: str,
+        root: str = None,
+        compression: int = zipfile.ZIP_DEFLATED,
+        compresslevel: int = None
+    ):
+        super().__init__(path=path, root=root)
+        self._file = zipfile.ZipFile(path, 'w', compression=compression, compresslevel=compresslevel)
+
+    def write_bytes(self, path: str, data: bytes):
+        self._file.writestr(self._name(path), data)
+        self.stats.written += 1
+        self.stats.bytes_written += len(data)
+
+    def close(self) -> AaWriteStats:
+        self._file.close()
+        return self.stats
+
+class AaTarWriter(AaArchiveWriter):
+    # compression is '' for none, or 'gz', 'bz2' or 'xz'.
+    def __init__(
+        self,
+        path: str,
+        root: str = None,
+        compression: str = ''
+    ):
+        super().__init__(path=path, root=root)
+        self._file = tarfile.open(path, f'w:{compression}')
+
+    def write_bytes(self, path: str, data: bytes):
+        info = tarfile.TarInfo(self._name(path))
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._file.addfile(info, io.BytesIO(data))
+        self.stats.written += 1
+        self.stats.bytes_written += len(data)
+
+    def close(self) -> AaWriteStats:
+        self._file.close()
+        return self.stats
+
+def _ndjson_index_path(path: str) -> str:
+    return f'{path}.index.json'
+
+class AaNdjsonWriter(AaArchiveWriter):
+    # One JSON line per file: {"path": ..., "text": ...} or, for
+    # content that isn't UTF-8, {"path": ..., "base64": ...}.
+    #
+    # An index of the byte offset and length of each line is
+    # written next to it (<path>.index.json) on close.
+    def __init__(self, path: str, root: str = None):
+        super().__init__(path=path, root=root)
+        self._file = open(path, 'wb')
+        self.index: dict[str, tuple[int, int]] = {}
+
+    def _write_entry(self, name: str, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n'
+        self.index[name] = (self._file.tell(), len(line))
+        self._file.write(line)
+        self.stats.written += 1
+        self.stats.bytes_written += len(line)
+
+    def write_bytes(self, path: str, data: bytes):
+        name = self._name(path)
+        try:
+            entry = {'path': name, 'text': bytes(data).decode('utf-8')}
+        except UnicodeDecodeError:
+            entry = {'path': name, 'base64': base64.b64encode(data).decode('ascii')}
+        self._write_entry(name, entry)
+
+    def write_text(self, path: str, text: str, encoding: str = None, newline: str = None):
+        # Text is stored as-is, line endings aren't translated.
+        name = self._name(path)
+        self._write_entry(name, {'path': name, 'text': text})
+
+    def close(self) -> AaWriteStats:
+        self._file.close()
+        with open(_ndjson_index_path(self.path), 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.index))
+        return self.stats
+
+def _ndjson_entry_data(entry: dict) -> bytes:
+    if 'base64' in entry: return base64.b64decode(entry['base64'])
+    return entry['text'].encode('utf-8')
+
+def iter_ndjson(path: str) -> Iterator[tuple[str, bytes]]:
+    # Yields (path, content) for each file in an NDJSON output.
+    with open(path, 'rb') as f:
+        for line in f:
+            entry = json.loads(line)
+            yield (entry['path'], _ndjson_entry_data(entry))
+
+def read_ndjson(path: str, name: str) -> bytes:
+    # Reads a single file from an NDJSON output using its index.
+    with open(_ndjson_index_path(path), 'r', encoding='utf-8') as f:
+        index = json.loads(f.read())
+    if name not in index: raise FileNotFoundError(f'{name} not found in {path}.')
+    (offset, length) = index[name]
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return _ndjson_entry_data(json.loads(f.read(length)))
@@ -1,9 +1,28 @@
+import array
+from dataclasses import asdict, replace
+import datetime
 import glob
+import io
+import json
 import os
 import pprint
+import shutil
+import sys
+import tarfile
+import tempfile
 import unittest
+from unittest import mock
+import warnings
+import zipfile
 
 from sputility import *
+from sputility import batch
+from sputility import diff
+from sputility import obj
+from sputility import pkg
+from sputility import progress
+from sputility import sputility as sputility_module
+from sputility import writers
 
 # Shared paths
 LOCAL_BASE_PATH = os.path.abspath(os.path.dirname(__file__))
@@ -16,6 +35,83 @@ LOCAL_OUTPUT_AAOBJECT_PATH = os.path.join(LOCAL_OUTPUT_PATH, 'aaobject')
 LOCAL_OUTPUT_AAPKG_DECOOMPRESSED_PATH = os.path.join(LOCAL_OUTPUT_PATH, 'aapkg_decompressed')
 LOCAL_OUTPUT_AAPKG_DESERIALIZED_PATH = os.path.join(LOCAL_OUTPUT_PATH, 'aapkg_deserialized')
 
+# Synthetic inputs from the benchmark generator
+sys.path.insert(0, os.path.join(LOCAL_BASE_PATH, '..', 'benchmarks'))
+import synthetic
+SYNTHETIC_CONFIG = synthetic.SyntheticConfig(objects=6, extensions=1, attributes=4, attributes_type2=4, array_size=3, objects_per_cab=2)
+
+TEST_MANIFEST_XML = (
+    b'<root><product_version cdiversion="1" iasversion="2"/>'
+    b'<template tag_name="$T" gobjectid="1" file_name="T.txt" config_version="3" is_protected="1"><derived_templates>'
+    b'<template tag_name="$U" gobjectid="2" file_name="U.txt" config_version="4"><derived_instances>'
+    b'<instance tag_name="I" gobjectid="3" file_name="I.txt" config_version="5" area_name="A"/>'
+    b'</derived_instances></template></derived_templates></template>'
+    b'<IODeviceMap filename="map.csv"/><TotalObjectCount objectcount="3"/></root>'
+)
+
+def _write_aapkg(file: str, members: list[tuple[str, str, bytes]]):
+    # Package with one cab per (cab, name, data) member
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as outer:
+        for (cab, name, data) in members:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as inner: inner.writestr(name, data)
+            outer.writestr(cab, buffer.getvalue())
+
+def _test_values() -> list[obj.types.AaObjectValue]:
+    DataType = obj.enums.AaDataType
+    Value = obj.types.AaObjectValue
+    return [
+        Value(DataType.NoneType, None),
+        Value(DataType.BooleanType, True),
+        Value(DataType.IntegerType, 0xFFFFFFFF),
+        Value(DataType.FloatType, 0.5),
+        Value(DataType.DoubleType, 1.25),
+        Value(DataType.StringType, 'Texté'),
+        Value(DataType.TimeType, datetime.datetime(2024, 1, 2, 3, 4, 5, 600, tzinfo=datetime.timezone.utc)),
+        Value(DataType.ElapsedTimeType, datetime.timedelta(seconds=1.5)),
+        Value(DataType.ReferenceType, obj.types.AaReference(refA='me.A', refB='B')),
+        Value(DataType.StatusType, b'\x01\x02\x03'),
+        Value(DataType.DataTypeType, b'\x07\x00\x00\x00'),
+        Value(DataType.QualifiedEnumType, obj.types.AaQualifiedEnum(value='Enum', ordinal=1, primitive_id=2, attribute_id=3)),
+        Value(DataType.QualifiedStructType, obj.types.AaQualifiedStruct(unk01=1, unk02=2, unk03=3, unk04=4, unk05=5)),
+        Value(DataType.InternationalizedStringType, 'International'),
+        Value(DataType.ArrayBooleanType, [True, False]),
+        Value(DataType.ArrayIntegerType, [1, 2, 3]),
+        Value(DataType.ArrayFloatType, [0.5, -2.0]),
+        Value(DataType.ArrayDoubleType, []),
+        Value(DataType.ArrayStringType, ['a', '']),
+        Value(DataType.ArrayTimeType, [datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)]),
+        Value(DataType.ArrayElapsedTimeType, [datetime.timedelta(milliseconds=250)]),
+        Value(DataType.ArrayReferenceType, [obj.types.AaReference(refA='Obj.A', refB='Obj.B')]),
+        Value(DataType.ArrayDataTypeType, [b'\x03\x00\x00\x00']),
+    ]
+
+def _test_attribute(id: int, value: obj.types.AaObjectValue, type1: bool) -> obj.types.AaObjectAttribute:
+    DataType = obj.enums.AaDataType
+    return obj.types.AaObjectAttribute(
+        offset=0, id=id, name=f'Ext.Attr{id}' if type1 else None, attr_type=value.datatype if (type1 or id % 2) else DataType.Undefined,
+        array=(value.datatype >= DataType.ArrayBooleanType) if type1 else None,
+        permission=obj.enums.AaPermission(0) if type1 else None, write=obj.enums.AaWriteability(2) if type1 else None,
+        locked=obj.enums.AaLocked.Unlocked if type1 else None, parent_gobjectid=42 if type1 else None,
+        parent_name='$Parent' if type1 else None, source=None, value=value, primitive_name='Ext_UserDefined'
+    )
+
+def _test_aaobject(tag_name: str = 'Obj', is_template: bool = False, galaxy_name: str = 'Galaxy') -> obj.types.AaObject:
+    # Object with a type 1 and a type 2 attribute of each datatype
+    values = _test_values()
+    header = obj.types.AaObjectHeader(
+        base_gobjectid=1, is_template=is_template, this_gobjectid=2, security_group='Default', parent_gobjectid=3,
+        tagname=tag_name, contained_name=tag_name, config_version=4, hierarchal_name=f'Area.{tag_name}', host_name='Host',
+        container_name='', area_name='Area', derived_from='$Base', based_on='$Base', galaxy_name=galaxy_name,
+        code_base='$Codebase' if is_template else None
+    )
+    attributes = [_test_attribute(k, x, True) for (k, x) in enumerate(values)] + [_test_attribute(k, x, False) for (k, x) in enumerate(_test_values())]
+    extension = obj.types.AaObjectExtension(
+        instance_id=1, instance_name='Ext', extension_name='UserDefined', primitive_name='Ext_UserDefined',
+        parent_name='$Parent', attributes=attributes, messages=values[:4]
+    )
+    return obj.types.AaObject(size=0, offset=0, header=header, extensions=[extension])
+
 class sputility_tests(unittest.TestCase):
     def setUp(self):
         pass
@@ -31,6 +127,94 @@ class sputility_tests(unittest.TestCase):
             )
             pprint.pprint(resp)
 
+    def test_stream_package(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as temp_path:
+                file = os.path.join(temp_path, 'Pkg.aaPKG')
+                files = synthetic.synthetic_package(file, SYNTHETIC_CONFIG)
+                (manifest, streams) = pkg.decompress.aapkg_to_memory(input_path=file)
+                self.assertEqual(sorted(x.name for x in streams), sorted(list(files) + ['Manifest.xml']))
+                for (expected, actual) in zip(streams, pkg.decompress.aapkg_to_stream(input_path=file), strict=True):
+                    self.assertEqual(expected.path, actual.path)
+                    self.assertEqual(expected.data, actual.data)
+                with pkg.decompress._open_package(file) as archive:
+                    self.assertEqual([(x.path, x.data) for x in pkg.decompress.iter_aapkg(archive)], [(x.path, x.data) for x in streams])
+
+                # Files are yielded as they are decompressed
+                events = []
+                stream = pkg.decompress.aapkg_to_stream(input_path=file, progress=lambda *args: events.append(args))
+                self.assertEqual(next(stream).data, streams[0].data)
+                self.assertEqual([x[2] for x in events], [0, 1])
+                stream.close()
+
+                # deserialize_package writes objects before the rest of the package is read
+                log = []
+                aapkg_to_stream = pkg.decompress.aapkg_to_stream
+                def _stream(*args, **kwargs):
+                    for x in aapkg_to_stream(*args, **kwargs):
+                        log.append(('read', x.name))
+                        yield x
+                class _Writer(writers.AaFolderWriter):
+                    def write_bytes(self, path: str, data: bytes):
+                        log.append(('write', path))
+                        super().write_bytes(path, data)
+                with mock.patch.object(pkg.decompress, 'aapkg_to_stream', _stream):
+                    result = SPUtility().deserialize_package(input_path=file, output_path=os.path.join(temp_path, 'out'), writer=_Writer())
+                self.assertEqual([x.header.tagname for x in result], [os.path.splitext(x)[0] for x in files])
+                reads = [k for (k, x) in enumerate(log) if x[0] == 'read']
+                writes = [k for (k, x) in enumerate(log) if x[0] == 'write']
+                self.assertEqual(len(reads), len(files))
+                self.assertLess(writes[0], reads[-1])
+
+    def test_read_package_manifest(self):
+        for file in glob.glob(os.path.join(LOCAL_INPUT_AAPKG_PATH, '*.aaPKG')):
+            (manifest, streams) = pkg.decompress.aapkg_to_memory(input_path=file)
+            self.assertEqual(SPUtility().read_package_manifest(input_path=file), manifest)
+
+        with tempfile.TemporaryDirectory() as input_path:
+            file = os.path.join(input_path, 'Pkg.aaPKG')
+            _write_aapkg(file, [('a.cab', 'T.txt', b'\x00'), ('b.cab', 'Manifest.xml', TEST_MANIFEST_XML)])
+            manifest = pkg.decompress.aapkg_to_manifest(input_path=file)
+            self.assertEqual(manifest, pkg.decompress.aapkg_to_memory(input_path=file)[0])
+            self.assertEqual(manifest.bindings.filename, 'map.csv')
+            self.assertEqual(manifest.object_count, 3)
+            self.assertEqual([x.tag_name for x in pkg.decompress.iter_manifest_objects(manifest)], ['$T', '$U', 'I'])
+            self.assertTrue(manifest.templates[0].is_protected)
+
+    def test_manifest_filter(self):
+        manifest = pkg.decompress._parse_manifest(TEST_MANIFEST_XML)
+        def _select(**kwargs) -> list[str]:
+            selection = pkg.types.AaManifestFilter(**kwargs)
+            return [x.tag_name for x in pkg.decompress.filter_manifest_objects(manifest, selection=selection)]
+        self.assertEqual(_select(), ['$T', '$U', 'I'])
+        self.assertEqual(_select(tag_names=['$t', 'i*']), ['$T', 'I'])
+        self.assertEqual(_select(template='$U'), ['$U', 'I'])
+        self.assertEqual(_select(template='$*'), ['$T', '$U', 'I'])
+        self.assertEqual(_select(area_name='a'), ['I'])
+        self.assertEqual(_select(template='$U', host_name='other'), [])
+
+        with tempfile.TemporaryDirectory() as input_path:
+            file = os.path.join(input_path, 'Pkg.aaPKG')
+            _write_aapkg(file, [('a.cab', 'T.txt', b'\x00'), ('b.cab', 'I.txt', b'\x01'), ('c.cab', 'Manifest.xml', TEST_MANIFEST_XML)])
+            (manifest, entries, streams) = pkg.decompress.aapkg_to_memory_filtered(file, pkg.types.AaManifestFilter(tag_names=['I']))
+            self.assertEqual([x.tag_name for x in entries], ['I'])
+            self.assertEqual([x.name for x in streams], ['I.txt'])
+
+    def test_archive_index(self):
+        streams = [
+            pkg.types.AaArchive(name='Manifest.xml', data=b'', path=['Pkg', 'a.cab', 'Manifest.xml'], size=0),
+            pkg.types.AaArchive(name='$Protected.txt', data=b'', path=['Pkg', 'a.cab', '$Protected.txt'], size=0),
+            pkg.types.AaArchive(name='Object1.txt', data=b'', path=['Pkg', 'b.cab', 'Object1.txt'], size=0),
+        ]
+        index = pkg.types.AaArchiveIndex(streams)
+        self.assertIs(index.get('Object1.txt'), streams[2])
+        self.assertIsNone(index.get('object1.TXT'))
+        self.assertIs(index.get('object1.TXT', case_insensitive=True), streams[2])
+        self.assertIs(index.get_by_path('Pkg/b.cab/Object1.txt'), streams[2])
+        self.assertIs(index.get_by_path(['pkg', 'A.cab', 'manifest.xml'], case_insensitive=True), streams[0])
+        self.assertIs(index.get_by_tag_name('$Protected'), streams[1])
+
     def test_deserialize_package(self):
         print('')
         for file in glob.glob(os.path.join(LOCAL_INPUT_AAPKG_PATH, '*.aaPKG')):
@@ -56,7 +240,7 @@ class sputility_tests(unittest.TestCase):
                 input_path=file,
                 output_path=LOCAL_OUTPUT_AAOBJECT_PATH,
                 progress=None
-            )
+            ).value
             print(f'Parsed {resp.offset:0X} of {resp.size:0X} bytes, {(100.0 * resp.offset / resp.size):.1f}%')
             #pprint.pprint(resp.header)
             #print(f'{len(resp.extensions)} extensions')
@@ -71,5 +255,625 @@ class sputility_tests(unittest.TestCase):
             #    #pprint.pprint(section)
             #    pass
 
+    def test_compiled_header(self):
+        inputs = [obj.serialize.serialize_aaobject(_test_aaobject(is_template=x, galaxy_name=y)) for (x, y) in [(True, 'Galaxy'), (False, ''), (False, 'Galaxy')]]
+        inputs += [synthetic.synthetic_object('$T', is_template=True, config=SYNTHETIC_CONFIG), synthetic.synthetic_object('I', derived_from='$T', config=SYNTHETIC_CONFIG)]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for data in inputs:
+                stepwise_stream = obj.types.AaBinStream(data=data, offset=0)
+                compiled_stream = obj.types.AaBinStream(data=data, offset=0)
+                stepwise = obj.deserialize._get_header_stepwise(input=stepwise_stream)
+                compiled = obj.deserialize._get_header(input=compiled_stream)
+                self.assertEqual(stepwise, compiled)
+                self.assertEqual(stepwise_stream.offset, compiled_stream.offset)
+                self.assertIn(compiled.tagname, ['Obj', '$T', 'I'])
+
+    def test_lazy_values(self):
+        inputs = [obj.serialize.serialize_aaobject(_test_aaobject()), synthetic.synthetic_object('I', config=SYNTHETIC_CONFIG)]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for data in inputs:
+                eager = obj.deserialize.deserialize_aaobject(data)
+                lazy = obj.deserialize.deserialize_aaobject(data, lazy=True)
+                self.assertEqual(lazy.offset, eager.offset)
+
+                # Values are only decoded when they are read
+                values = [x.value for ext in lazy.extensions for x in ext.attributes]
+                self.assertTrue(all(isinstance(x, obj.types.AaLazyObjectValue) for x in values))
+                self.assertFalse(any(x.is_decoded for x in values))
+                self.assertEqual(values[0].value, eager.extensions[0].attributes[0].value.value)
+                self.assertTrue(values[0].is_decoded)
+                self.assertFalse(any(x.is_decoded for x in values[1:]))
+
+                self.assertEqual(lazy, eager)
+                self.assertTrue(all(x.is_decoded for x in values))
+
+    def test_json_encoder(self):
+        values = [
+            obj.types.AaObjectValue(datatype=obj.enums.AaDataType.TimeType, value=datetime.datetime(2024, 1, 2, 3, 4, 5, 600)),
+            obj.types.AaObjectValue(datatype=obj.enums.AaDataType.ElapsedTimeType, value=datetime.timedelta(seconds=1.5)),
+            obj.types.AaObjectValue(datatype=obj.enums.AaDataType.DoubleType, value=float('nan')),
+            obj.types.AaObjectValue(datatype=obj.enums.AaDataType.ArrayStringType, value=['a', 'b\u00e9\n']),
+            obj.types.AaObjectValue(datatype=obj.enums.AaDataType.ReferenceType, value=obj.types.AaReference(refA='Me.A', refB='')),
+            obj.types.AaObjectValue(datatype=obj.enums.AaDataType.ArrayIntegerType, value=[]),
+        ]
+        attribute = obj.types.AaObjectAttribute(
+            offset=0, id=1, name='Attr', attr_type=obj.enums.AaDataType.IntegerType, array=False,
+            permission=None, write=None, locked=None, parent_gobjectid=0, parent_name='',
+            source=None, value=values[0], primitive_name='Prim'
+        )
+        ext = obj.types.AaObjectExtension(
+            instance_id=1, instance_name='Inst', extension_name='Ext', primitive_name='Prim',
+            parent_name='', attributes=[attribute], messages=values
+        )
+        self.assertEqual(obj.encoder.to_json(ext), json.dumps(asdict(ext), indent=4, default=str))
+        self.assertEqual(obj.encoder.to_json(ext, indent=None), json.dumps(asdict(ext), default=str))
+        self.assertEqual(obj.encoder.to_json(array.array('i', [1, 2]), indent=None), '[1, 2]')
+
+    def test_attribute_index(self):
+        def _attr(id: int, name: str) -> obj.types.AaObjectAttribute:
+            return obj.types.AaObjectAttribute(
+                offset=0, id=id, name=name, attr_type=obj.enums.AaDataType.IntegerType, array=False,
+                permission=None, write=None, locked=None, parent_gobjectid=0, parent_name='',
+                source=None, value=obj.types.AaObjectValue(datatype=obj.enums.AaDataType.IntegerType, value=id),
+                primitive_name='Script1_ScriptExtension'
+            )
+        ext = obj.types.AaObjectExtension(
+            instance_id=1, instance_name='Script1', extension_name='ScriptExtension', primitive_name='Script1_ScriptExtension',
+            parent_name='', attributes=[_attr(1, 'Script1.Name'), _attr(100, 'Script1.ExecuteText')], messages=[]
+        )
+        aaobject = obj.types.AaObject(size=0, offset=0, header=None, extensions=[ext])
+        self.assertEqual(ext.get_attribute(100).name, 'Script1.ExecuteText')
+        self.assertEqual(ext.get_attribute_by_name('Script1.Name').id, 1)
+        self.assertIsNone(ext.get_attribute(2))
+        ext.attributes.append(_attr(2, 'Script1.Added'))
+        self.assertEqual(ext.get_attribute(2).name, 'Script1.Added')
+        del ext.attributes[0]
+        self.assertIsNone(ext.get_attribute(1))
+        ext.attributes = [_attr(3, 'Script1.Replaced')]
+        self.assertEqual(ext.get_attribute(3).name, 'Script1.Replaced')
+        self.assertIs(aaobject.get_attribute('Script1_ScriptExtension', 3), ext.get_attribute(3))
+        self.assertIs(aaobject.get_attribute_by_name('Script1.Replaced'), ext.get_attribute(3))
+        self.assertIsNone(aaobject.get_attribute('Missing', 3))
+
+    def test_object_cache(self):
+        with tempfile.TemporaryDirectory() as cache_path:
+            cache = obj.cache.AaObjectCache(path=cache_path)
+            expected = obj.types.AaObject(size=4, offset=4, header=None, extensions=[])
+            self.assertIsNone(cache.get(b'\x01\x02\x03\x04'))
+            cache.put(b'\x01\x02\x03\x04', expected)
+            self.assertEqual(cache.get(b'\x01\x02\x03\x04'), expected)
+            self.assertIsNone(cache.get(b'\x01\x02\x03\x05'))
+            cache.put(b'\x01\x02\x03\x05', expected)
+            self.assertEqual(len(cache._entries()), 2)
+            cache.evict(max_size=cache.size() - 1)
+            self.assertEqual(len(cache._entries()), 1)
+            cache.clear()
+            self.assertEqual(cache.size(), 0)
+
+            # A full cache is trimmed below max_size, so it isn't
+            # rescanned on every put
+            cache.put(b'\x00', expected)
+            entry_size = cache.size()
+            cache = obj.cache.AaObjectCache(path=cache_path, max_size=entry_size * 100)
+            with mock.patch.object(cache, '_entries', wraps=cache._entries) as entries:
+                for i in range(300): cache.put(i.to_bytes(4, 'little'), expected)
+            self.assertLess(entries.call_count, 30)
+            self.assertLessEqual(cache.size(), cache.max_size)
+
+        # Workers keep using the cache they are given when they start
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as temp_path:
+                package = os.path.join(temp_path, 'Pkg.aaPKG')
+                synthetic.synthetic_package(package, SYNTHETIC_CONFIG)
+                cache = obj.cache.AaObjectCache(path=os.path.join(temp_path, 'cache'))
+                spu = SPUtility()
+                expected = spu.deserialize_package(input_path=package, output_path=temp_path, workers=2, cache=cache)
+                self.assertEqual(len(cache._entries()), SYNTHETIC_CONFIG.objects)
+                self.assertEqual(spu.deserialize_package(input_path=package, output_path=temp_path, workers=2, cache=cache), expected)
+                summaries = spu.deserialize_packages(package, os.path.join(temp_path, 'batch'), workers=1, cache=cache)
+                self.assertEqual(summaries[0].objects, SYNTHETIC_CONFIG.objects)
+
+    def test_folder_writer(self):
+        with tempfile.TemporaryDirectory() as output_path:
+            writer = writers.AaFolderWriter(skip_unchanged=True, remove_stale=True)
+            writer.write_text(os.path.join(output_path, 'a', 'header.json'), '{}')
+            writer.write_bytes(os.path.join(output_path, 'b', 'data.bin'), b'\x01\x02')
+            self.assertEqual(writer.close(), writers.AaWriteStats(written=2, bytes_written=4))
+
+            with open(os.path.join(output_path, 'c.txt'), 'w') as f: f.write('stale')
+            writer = writers.AaFolderWriter(skip_unchanged=True, remove_stale=True)
+            writer.write_text(os.path.join(output_path, 'a', 'header.json'), '{}')
+            writer.write_bytes(os.path.join(output_path, 'b', 'data.bin'), b'\x01\x03')
+            writer.remove_stale(output_path)
+            self.assertEqual(writer.close(), writers.AaWriteStats(written=1, skipped=1, removed=1, bytes_written=2))
+            self.assertFalse(os.path.exists(os.path.join(output_path, 'c.txt')))
+
+    def test_decompress_packages_to_one_folder(self):
+        # Stale files are only removed from the package's own folder
+        with tempfile.TemporaryDirectory() as input_path, tempfile.TemporaryDirectory() as output_path:
+            for name in ['A', 'B']:
+                _write_aapkg(os.path.join(input_path, f'{name}.aaPKG'), [('a.cab', 'I.txt', name.encode()), ('b.cab', 'Manifest.xml', TEST_MANIFEST_XML)])
+            for name in ['A', 'B']:
+                writer = writers.AaFolderWriter(skip_unchanged=True, remove_stale=True)
+                SPUtility().decompress_package(input_path=os.path.join(input_path, f'{name}.aaPKG'), output_path=output_path, writer=writer)
+                self.assertEqual(writer.close().removed, 0)
+            with open(os.path.join(output_path, 'A', 'old.txt'), 'w') as f: f.write('stale')
+            writer = writers.AaFolderWriter(skip_unchanged=True, remove_stale=True)
+            result = SPUtility().decompress_package(input_path=os.path.join(input_path, 'A.aaPKG'), output_path=output_path, writer=writer)
+            self.assertEqual(result.stats, writers.AaWriteStats(skipped=2, removed=1))
+            self.assertEqual(writer.close().removed, 1)
+
+            # Counts are for the one call when a writer is reused
+            result = SPUtility().decompress_package(input_path=os.path.join(input_path, 'B.aaPKG'), output_path=output_path, writer=writer)
+            self.assertEqual(result.stats, writers.AaWriteStats(skipped=2))
+            result = SPUtility().decompress_package(input_path=os.path.join(input_path, 'B.aaPKG'), output_path=os.path.join(output_path, 'new'))
+            self.assertEqual((result.stats.written, result.stats.skipped), (2, 0))
+            for name in ['A', 'B']:
+                with open(os.path.join(output_path, name, 'a.cab', 'I.txt'), 'rb') as f: self.assertEqual(f.read(), name.encode())
+
+    def test_threaded_folder_writer(self):
+        with tempfile.TemporaryDirectory() as output_path:
+            with writers.AaThreadedFolderWriter(max_workers=2, max_pending=2) as writer:
+                for i in range(10):
+                    writer.write_text(os.path.join(output_path, str(i % 3), f'{i}.txt'), str(i))
+            self.assertEqual(writer.stats, writers.AaWriteStats(written=10, bytes_written=10))
+            with open(os.path.join(output_path, '1', '7.txt'), 'r') as f: self.assertEqual(f.read(), '7')
+
+            writer = writers.AaThreadedFolderWriter()
+            writer.write_text(os.path.join(output_path, '0', '0.txt', 'x.txt'), 'x')
+            self.assertRaises(OSError, writer.close)
+
+        # Stale files are pruned once per package rather than after
+        # each object, so the queue isn't drained after every object
+        class _Writer(writers.AaThreadedFolderWriter):
+            flushes = 0
+            def flush(self):
+                _Writer.flushes += 1
+                super().flush()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as temp_path:
+                package = os.path.join(temp_path, 'Pkg.aaPKG')
+                files = synthetic.synthetic_package(package, SYNTHETIC_CONFIG)
+                SPUtility().deserialize_package(input_path=package, output_path=temp_path)
+                stale_path = os.path.join(temp_path, 'Pkg', 'Object000000', 'raw', 'old.json')
+                with open(stale_path, 'w') as f: f.write('{}')
+                with _Writer(skip_unchanged=True, remove_stale=True) as writer:
+                    result = SPUtility().deserialize_package(input_path=package, output_path=temp_path, writer=writer)
+                self.assertEqual(len(result), len(files))
+                self.assertLessEqual(_Writer.flushes, 4)
+                self.assertEqual(result.stats.removed, 1)
+                self.assertFalse(os.path.exists(stale_path))
+
+                # A single object reports its counts the same way
+                object_path = os.path.join(temp_path, 'Object000000.txt')
+                with open(object_path, 'wb') as f: f.write(synthetic.synthetic_object('Object000000', config=SYNTHETIC_CONFIG))
+                result = SPUtility().deserialize_object(input_path=object_path, output_path=os.path.join(temp_path, 'obj'))
+                self.assertGreater(result.stats.written, 0)
+                with writers.AaFolderWriter(skip_unchanged=True) as writer:
+                    result = SPUtility().deserialize_object(input_path=object_path, output_path=os.path.join(temp_path, 'obj'), writer=writer)
+                self.assertEqual(result.value.header.tagname, 'Object000000')
+                self.assertEqual(result.stats.written, 0)
+                self.assertGreater(result.stats.skipped, 0)
+
+    def test_archive_writers(self):
+        with tempfile.TemporaryDirectory() as output_path:
+            files = {'a/header.json': '{}', 'a/raw/b.json': '[1, 2]'}
+            for writer in [
+                writers.AaZipWriter(os.path.join(output_path, 'out.zip')),
+                writers.AaTarWriter(os.path.join(output_path, 'out.tar.gz'), compression='gz'),
+                writers.AaNdjsonWriter(os.path.join(output_path, 'out.ndjson'))
+            ]:
+                with writer:
+                    for (name, text) in files.items(): writer.write_text(os.path.join(output_path, name), text)
+                    self.assertRaises(ValueError, writer.write_text, os.path.join(output_path, '..', 'c.json'), '{}')
+                self.assertEqual(writer.stats.written, 2)
+
+            with zipfile.ZipFile(os.path.join(output_path, 'out.zip')) as f:
+                self.assertEqual(sorted(f.namelist()), sorted(files))
+            with tarfile.open(os.path.join(output_path, 'out.tar.gz')) as f:
+                self.assertEqual(f.extractfile('a/raw/b.json').read(), b'[1, 2]')
+            ndjson_path = os.path.join(output_path, 'out.ndjson')
+            self.assertEqual(dict(writers.iter_ndjson(ndjson_path)), {k: v.encode('utf-8') for (k, v) in files.items()})
+            self.assertEqual(writers.read_ndjson(ndjson_path, 'a/raw/b.json'), b'[1, 2]')
+
+    def test_custom_writer(self):
+        # A writer that only implements write_bytes works with workers and pruning
+        class _Writer(writers.AaWriter):
+            files = {}
+            def write_bytes(self, path: str, data: bytes):
+                _Writer.files[os.path.relpath(path, output_path).replace(os.sep, '/')] = bytes(data)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as output_path:
+                package = os.path.join(output_path, 'Pkg.aaPKG')
+                synthetic.synthetic_package(package, SYNTHETIC_CONFIG)
+                for workers in [None, 2]:
+                    _Writer.files.clear()
+                    result = SPUtility().deserialize_package(input_path=package, output_path=output_path, workers=workers, writer=_Writer())
+                    self.assertEqual(len(result), SYNTHETIC_CONFIG.objects)
+                    self.assertEqual(result.stats, writers.AaWriteStats())
+                    self.assertIn('Pkg/Object000000/header.json', _Writer.files)
+                summaries = SPUtility().deserialize_packages(package, output_path, workers=2, writer=_Writer())
+                self.assertEqual(summaries[0].objects, SYNTHETIC_CONFIG.objects)
+
+    def test_progress(self):
+        events = []
+        throttle = progress.AaProgressThrottle(lambda *args: events.append(args), interval=60)
+        throttle('deserialize', '', 0, 3, 0)
+        throttle('deserialize', 'A', 1, 3, 10)
+        throttle('deserialize', 'B', 2, 3, 20)
+        throttle('write', 'A', 1, 3, 5)
+        throttle('deserialize', 'C', 3, 3, 30)
+        throttle('write', 'B', 2, 3, 9)
+        throttle.close()
+        self.assertEqual([x[1] for x in events], ['', 'B', 'A', 'C', 'B'])
+
+        output = io.StringIO()
+        reporter = progress.AaProgressReporter(file=output, interval=60)
+        for (done, item) in enumerate(['', 'A', 'B', 'C']): reporter('deserialize', item, done, 3, done * 1000000)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[-1].startswith('deserialize: 3/3 ('))
+        self.assertIn('MB/s', lines[-1])
+
+    def test_array_decoders(self):
+        values = [0, 1, 0x7FFFFFFF, 0xFFFFFFFF]
+        data = bytes(4) + len(values).to_bytes(2, 'little') + (4).to_bytes(4, 'little')
+        data += b''.join(x.to_bytes(4, 'little') for x in values)
+        stream = obj.types.AaBinStream(data=data, offset=0)
+        self.assertEqual(obj.primitives._seek_array_int(input=stream), values)
+        stream = obj.types.AaBinStream(data=data, offset=0)
+        compact = obj.primitives._seek_array_int(input=stream, compact=True)
+        self.assertEqual(compact.tolist(), values)
+        self.assertEqual(stream.offset, len(data))
+        stream = obj.types.AaBinStream(data=data, offset=0)
+        self.assertEqual(obj.primitives._seek_array_bool(input=stream), [bool(x) for x in values])
+        stream = obj.types.AaBinStream(data=data, offset=0)
+        self.assertEqual(obj.primitives._seek_array_bool(input=stream, compact=True), array.array('B', [bool(x) for x in values]))
+        self.assertEqual(stream.offset, len(data))
+
+        # Through deserialize_aaobject, numeric arrays come back as array.array
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            data = obj.serialize.serialize_aaobject(_test_aaobject())
+            expected = obj.deserialize.deserialize_aaobject(data)
+            for lazy in [False, True]:
+                compact = obj.deserialize.deserialize_aaobject(data, lazy=lazy, compact=True)
+                for (a, b) in zip(expected.extensions[0].attributes, compact.extensions[0].attributes, strict=True):
+                    if a.value.datatype in (obj.enums.AaDataType.ArrayBooleanType, obj.enums.AaDataType.ArrayIntegerType, obj.enums.AaDataType.ArrayFloatType, obj.enums.AaDataType.ArrayDoubleType):
+                        self.assertIsInstance(b.value.value, array.array)
+                        self.assertEqual(b.value.value.tolist(), a.value.value)
+                    else:
+                        self.assertEqual(b.value, a.value)
+
+    def test_callback_tracer(self):
+        self.assertIsNone(obj.trace.get_tracer())
+        sections = []
+        tracer = obj.trace.AaCallbackTracer(section_end=lambda section, offset, size, elapsed: sections.append((section, offset, size)))
+        tracer.section_start('extension', 0x10)
+        tracer.section_start('attr1', 0x20)
+        tracer.section_end('attr1', 0x28)
+        tracer.section_start('attr2', 0x28)
+        tracer.section_end('extension', 0x40)
+        self.assertEqual(sections, [('attr1', 0x20, 0x08), ('extension', 0x10, 0x30)])
+
+        # Ends without a start are reported rather than raised
+        events = []
+        tracer = obj.trace.AaCallbackTracer(section_end=lambda *args: sections.append(args), event=lambda message, offset: events.append((message, offset)))
+        tracer.section_end('object', 0x50)
+        tracer.section_start('object', 0x00)
+        tracer.section_end('header', 0x10)
+        tracer.section_end('object', 0x60)
+        self.assertEqual(events, [('UNMATCHED END OBJECT', 0x50), ('UNMATCHED END HEADER', 0x10)])
+        self.assertEqual(sections[-1][:3], ('object', 0x00, 0x60))
+
+    def test_value_decoder_registry(self):
+        text = 'Value'.encode('utf-16le') + b'\x00\x00'
+        section = len(text).to_bytes(4, 'little') + text
+        data = obj.primitives.PATTERN_OBJECT_VALUE + bytes([obj.enums.AaDataType.StringType]) + len(section).to_bytes(4, 'little') + section
+        stream = obj.types.AaBinStream(data=data, offset=0)
+        self.assertEqual(obj.primitives._seek_object_value(input=stream).value, 'Value')
+        try:
+            obj.primitives.register_value_skip(obj.enums.AaDataType.StringType)
+            stream = obj.types.AaBinStream(data=data, offset=0)
+            value = obj.primitives._seek_object_value(input=stream)
+            self.assertEqual(value.datatype, obj.enums.AaDataType.StringType)
+            self.assertIsNone(value.value)
+            self.assertEqual(stream.offset, len(data))
+            obj.primitives.register_value_decoder(obj.enums.AaDataType.StringType, lambda input: obj.primitives._seek_string_value_section(input).upper())
+            stream = obj.types.AaBinStream(data=data, offset=0)
+            self.assertEqual(obj.primitives._seek_object_value(input=stream).value, 'VALUE')
+        finally:
+            obj.primitives.reset_value_decoders()
+
+    def test_serialize_object(self):
+        def _strip_offsets(item: obj.types.AaObject) -> obj.types.AaObject:
+            (item.size, item.offset) = (0, 0)
+            for attribute in item.extensions[0].attributes: attribute.offset = 0
+            return item
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for (is_template, galaxy_name) in [(True, 'Galaxy'), (False, ''), (False, 'Galaxy')]:
+                item = _test_aaobject(is_template=is_template, galaxy_name=galaxy_name)
+                data = obj.serialize.serialize_aaobject(item)
+                parsed = obj.deserialize.deserialize_aaobject(data)
+                self.assertEqual(parsed.size, len(data))
+                self.assertEqual(parsed.offset, len(data))
+                self.assertEqual(_strip_offsets(parsed), item)
+                lazy = obj.deserialize.deserialize_aaobject(data, lazy=True)
+                self.assertEqual(obj.serialize.serialize_aaobject(lazy), data)
+
+            with tempfile.TemporaryDirectory() as output_path:
+                file = os.path.join(output_path, 'Pkg.aaPKG')
+                manifest = pkg.decompress._parse_manifest(TEST_MANIFEST_XML)
+                spu = SPUtility()
+                spu.serialize_package([_test_aaobject()], manifest, file)
+                (read_manifest, streams) = pkg.decompress.aapkg_to_memory(input_path=file)
+                self.assertEqual(read_manifest, manifest)
+                self.assertEqual([x.name for x in streams], ['Obj.txt', 'Manifest.xml'])
+                self.assertEqual(_strip_offsets(obj.deserialize.deserialize_aaobject(streams[0].data)), _test_aaobject())
+
+        # Fixed-size strings that don't fit are rejected rather than truncated
+        item = _test_aaobject()
+        item.header.tagname = 'x' * 40
+        with self.assertRaises(ValueError): obj.serialize.serialize_aaobject(item)
+
+    def test_diff_packages(self):
+        def _package(file: str, tag_names: list[str], changed: bool, bump: bool = True):
+            manifest = pkg.decompress._parse_manifest(TEST_MANIFEST_XML)
+            template = manifest.templates[0].derived_templates[0]
+            instance = template.derived_instances[0]
+            for tag_name in tag_names[3:]:
+                template.derived_instances.append(replace(instance, tag_name=tag_name, file_name=f'{tag_name}.txt'))
+            objects = [_test_aaobject(tag_name=x) for x in tag_names]
+            if changed:
+                if bump: instance.config_version += 1
+                objects[2].extensions[0].get_attribute_by_name('Ext.Attr2').value.value = 7
+            SPUtility().serialize_package(objects, manifest, file)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as input_path:
+                old_path = os.path.join(input_path, 'Old.aaPKG')
+                new_path = os.path.join(input_path, 'New.aaPKG')
+                _package(old_path, ['$T', '$U', 'I', 'K'], changed=False)
+                _package(new_path, ['$T', '$U', 'I', 'J'], changed=True)
+                # Object files are read one pair at a time rather than
+                # decompressing every candidate up front
+                with mock.patch.object(pkg.decompress, 'aapkg_to_stream', side_effect=AssertionError):
+                    result = SPUtility().diff_packages(old_path, new_path)
+
+                # A change that keeps the checksum is only found with verify
+                _package(new_path, ['$T', '$U', 'I', 'K'], changed=True, bump=False)
+                directory = pkg.decompress._aapkg_directory
+                def _same_checksums(**kwargs):
+                    (manifest, checksums, locations) = directory(**kwargs)
+                    return (manifest, {x: (0, 0) for x in checksums}, locations)
+                with mock.patch.object(pkg.decompress, '_aapkg_directory', side_effect=_same_checksums):
+                    self.assertEqual(SPUtility().diff_packages(old_path, new_path).changed, [])
+                    verified = SPUtility().diff_packages(old_path, new_path, verify=True)
+                self.assertEqual([x.tag_name for x in verified.changed], ['I'])
+                self.assertEqual(sorted(verified.unchanged), ['$T', '$U', 'K'])
+
+        self.assertEqual(result.added, ['J'])
+        self.assertEqual(result.removed, ['K'])
+        self.assertEqual(sorted(result.unchanged), ['$T', '$U'])
+        self.assertEqual([x.tag_name for x in result.changed], ['I'])
+        extension = result.changed[0].changed_extensions[0]
+        self.assertEqual([(x.old.value.value, x.new.value.value) for x in extension.changed_attributes], [(0xFFFFFFFF, 7)])
+        self.assertEqual(diff.format_package_diff(result).splitlines(), [
+            '+ J', '- K', '~ I', '    ~ Ext_UserDefined', '        ~ Ext.Attr2: 4294967295 -> 7'
+        ])
+
+        # Objects that can't be deserialized are reported as failed
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as input_path:
+                old_path = os.path.join(input_path, 'Old.aaPKG')
+                new_path = os.path.join(input_path, 'New.aaPKG')
+                _package(old_path, ['$T', '$U', 'I'], changed=False)
+                _write_aapkg(new_path, [
+                    ('a.cab', '$T.txt', obj.serialize.serialize_aaobject(_test_aaobject(tag_name='$T'))),
+                    ('b.cab', 'U.txt', obj.serialize.serialize_aaobject(_test_aaobject(tag_name='$U'))),
+                    ('c.cab', 'I.txt', b'\x00' * 16),
+                    ('d.cab', 'Manifest.xml', TEST_MANIFEST_XML)
+                ])
+                result = SPUtility().diff_packages(old_path, new_path)
+        self.assertEqual(list(result.failed), ['I'])
+        self.assertEqual([x.tag_name for x in result.changed], [])
+        self.assertTrue(diff.format_package_diff(result).startswith('! I: Failed to deserialize'))
+
+        # Script bodies are compared line by line
+        def _script(text: str) -> obj.types.AaObjectExtension:
+            (Attr, DataType, Value) = (obj.enums.AaScriptAttributes, obj.enums.AaDataType, obj.types.AaObjectValue)
+            values = {
+                Attr.Name: Value(DataType.StringType, 'Script'),
+                Attr.ExecuteBodyText: Value(DataType.StringType, text),
+                Attr.AliasReferences: Value(DataType.ArrayReferenceType, []),
+                Attr.AliasNames: Value(DataType.ArrayStringType, []),
+                Attr.TriggerType: Value(DataType.QualifiedEnumType, obj.types.AaQualifiedEnum(value='Periodic', ordinal=0, primitive_id=0, attribute_id=0)),
+                Attr.Deadband: Value(DataType.DoubleType, 0.0),
+                Attr.TriggerPeriod: Value(DataType.ElapsedTimeType, datetime.timedelta(seconds=1)),
+                Attr.AsynchronousTimeout: Value(DataType.IntegerType, 0),
+            }
+            for id in Attr:
+                if id not in values: values[id] = Value(DataType.BooleanType, False) if id >= Attr.AlarmEnable else Value(DataType.StringType, '')
+            return obj.types.AaObjectExtension(
+                instance_id=2, instance_name='Script', extension_name='ScriptExtension', primitive_name='Script_ScriptExtension',
+                parent_name='', attributes=[_test_attribute(id, x, False) for (id, x) in values.items()], messages=[]
+            )
+        result = diff.diff_extensions(_script('a = 1;\nb = 2;'), _script('a = 1;\nb = 3;'))
+        self.assertEqual(list(result.script.changes), ['body_text_execute'])
+        self.assertEqual(result.script.changes['body_text_execute'][-3:], [' a = 1;', '-b = 2;', '+b = 3;'])
+
+    def test_deserialize_packages(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as input_path, tempfile.TemporaryDirectory() as output_path:
+                manifest = pkg.decompress._parse_manifest(TEST_MANIFEST_XML)
+                SPUtility().serialize_package([_test_aaobject(tag_name=x) for x in ['$T', '$U', 'I']], manifest, os.path.join(input_path, 'A.aaPKG'))
+                SPUtility().serialize_package([_test_aaobject(tag_name=x) for x in ['$T', 'I']], manifest, os.path.join(input_path, 'B.AAPKG'))
+                self.assertEqual(batch.expand_package_paths(input_path), batch.expand_package_paths([os.path.join(input_path, '*.*'), os.path.join(input_path, 'A.aaPKG')]))
+                with self.assertRaises(FileNotFoundError): batch.expand_package_paths(os.path.join(input_path, 'C.aaPKG'))
+
+                # Globs only match packages, and packages that would share
+                # an output folder are refused
+                with tempfile.TemporaryDirectory() as other_path:
+                    with open(os.path.join(other_path, 'notes.txt'), 'w') as f: f.write('')
+                    self.assertEqual(batch.expand_package_paths(os.path.join(other_path, '*')), [])
+                    shutil.copy(os.path.join(input_path, 'A.aaPKG'), os.path.join(other_path, 'a.aapkg'))
+                    with self.assertRaises(ValueError): batch.expand_package_paths([input_path, other_path])
+
+                for workers in [1, 2]:
+                    events = []
+                    summaries = SPUtility().deserialize_packages(input_path, output_path, workers=workers, progress=lambda *args: events.append(args))
+                    self.assertEqual([(x.name, x.objects, x.failed) for x in summaries], [('A', 3, []), ('B', 2, ['$U'])])
+                    self.assertTrue(os.path.isfile(os.path.join(output_path, 'B', 'I', 'header.json')))
+                    self.assertEqual([x[1:4] for x in events if x[0] == progress.AaProgressStage.Package], [('', 0, 2), ('A', 1, 2), ('B', 2, 2)])
+
+                # Objects are decompressed as they are queued, largest first
+                # by the sizes in the cab directories
+                with tempfile.TemporaryDirectory() as synthetic_path:
+                    files = synthetic.synthetic_package(os.path.join(synthetic_path, 'S.aaPKG'), SYNTHETIC_CONFIG)
+                    sizes = []
+                    deserialize = sputility_module._deserialize_package_object
+                    def _record(data, *args, **kwargs):
+                        sizes.append(len(data))
+                        return deserialize(data, *args, **kwargs)
+                    with (
+                        mock.patch.object(pkg.decompress, 'aapkg_to_memory', side_effect=AssertionError),
+                        mock.patch.object(sputility_module, '_deserialize_package_object', side_effect=_record)
+                    ):
+                        summaries = SPUtility().deserialize_packages(synthetic_path, output_path, workers=1)
+                    self.assertEqual(summaries[0].objects, len(files))
+                    self.assertEqual(sizes[0], max(len(x) for x in files.values()))
+
+                # Packages that can't be read don't stop the rest
+                with open(os.path.join(input_path, 'C.aaPKG'), 'wb') as f: f.write(b'\x00' * 16)
+                _write_aapkg(os.path.join(input_path, 'D.aaPKG'), [('a.cab', 'I.txt', b'\x00')])
+                for workers in [1, 2]:
+                    summaries = SPUtility().deserialize_packages(input_path, output_path, workers=workers)
+                    self.assertEqual([(x.name, x.objects, type(x.error)) for x in summaries], [('A', 3, type(None)), ('B', 2, type(None)), ('C', 0, zipfile.BadZipFile), ('D', 0, FileNotFoundError)])
+                    self.assertTrue(batch.format_summaries(summaries).splitlines()[2].startswith('C: failed'))
+
+    def test_deserialize_failures(self):
+        # Missing and corrupt objects are returned as failures in the
+        # same way with and without workers, the rest still go through
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as temp_path:
+                package = os.path.join(temp_path, 'Pkg.aaPKG')
+                _write_aapkg(package, [
+                    ('a.cab', '$T.txt', obj.serialize.serialize_aaobject(_test_aaobject(tag_name='$T'))),
+                    ('b.cab', 'I.txt', b'\x00' * 16),
+                    ('c.cab', 'Manifest.xml', TEST_MANIFEST_XML)
+                ])
+                spu = SPUtility()
+                spu.decompress_package(input_path=package, output_path=os.path.join(temp_path, 'extracted'))
+                for workers in [None, 2]:
+                    for result in [
+                        spu.deserialize_package(input_path=package, output_path=temp_path, workers=workers),
+                        spu.deserialize_folder(input_path=os.path.join(temp_path, 'extracted', 'Pkg'), output_path=temp_path, workers=workers)
+                    ]:
+                        self.assertEqual([x.header.tagname for x in result], ['$T'])
+                        self.assertEqual([(x.tag_name, type(x.error)) for x in result.failed][0], ('$U', FileNotFoundError))
+                        self.assertEqual([x.tag_name for x in result.failed], ['$U', 'I'])
+
+                    # Errors writing the output aren't object failures
+                    blocked_path = os.path.join(temp_path, 'blocked')
+                    os.makedirs(os.path.join(blocked_path, 'Pkg'), exist_ok=True)
+                    with open(os.path.join(blocked_path, 'Pkg', '$T'), 'w') as f: f.write('')
+                    with self.assertRaises(OSError):
+                        spu.deserialize_package(input_path=package, output_path=blocked_path, workers=workers)
+
+    def test_remove_stale_keeps_failed(self):
+        # Objects that fail on a later run keep their last good output
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as temp_path:
+                package = os.path.join(temp_path, 'Pkg.aaPKG')
+                def _package(data: bytes):
+                    _write_aapkg(package, [
+                        ('a.cab', '$T.txt', obj.serialize.serialize_aaobject(_test_aaobject(tag_name='$T'))),
+                        ('b.cab', 'U.txt', obj.serialize.serialize_aaobject(_test_aaobject(tag_name='$U'))),
+                        ('c.cab', 'I.txt', data),
+                        ('d.cab', 'Manifest.xml', TEST_MANIFEST_XML)
+                    ])
+                spu = SPUtility()
+                for workers in [None, 2]:
+                    for (name, call) in [
+                        ('a', lambda writer: spu.deserialize_package(input_path=package, output_path=os.path.join(temp_path, 'a'), workers=workers, writer=writer)),
+                        ('b', lambda writer: spu.deserialize_packages(package, os.path.join(temp_path, 'b'), workers=workers, writer=writer))
+                    ]:
+                        _package(obj.serialize.serialize_aaobject(_test_aaobject(tag_name='I')))
+                        call(writers.AaFolderWriter(remove_stale=True))
+                        header_path = os.path.join(temp_path, name, 'Pkg', 'I', 'header.json')
+                        self.assertTrue(os.path.isfile(header_path))
+
+                        _package(b'\x00' * 16)
+                        writer = writers.AaFolderWriter(skip_unchanged=True, remove_stale=True)
+                        result = call(writer)
+                        if name == 'a': self.assertEqual((result.stats.written, result.stats.removed, result.stats.skipped > 0), (0, 0, True))
+                        self.assertEqual(writer.close().removed, 0)
+                        self.assertTrue(os.path.isfile(header_path))
+
+    def test_memory_mapped_input(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with tempfile.TemporaryDirectory() as temp_path:
+                file = os.path.join(temp_path, 'Obj.txt')
+                obj.serialize.aaobject_to_file(_test_aaobject(), file)
+                self.assertIsInstance(obj.deserialize._read_aaobject(file, use_mmap=True), memoryview)
+                self.assertIsInstance(obj.deserialize._read_aaobject(file, use_mmap=False), bytes)
+                expected = obj.deserialize.deserialize_aaobject(file, use_mmap=False)
+                self.assertEqual(obj.deserialize.deserialize_aaobject(file, use_mmap=True), expected)
+                self.assertEqual(obj.deserialize.deserialize_aaobject(file, use_mmap=True, lazy=True), expected)
+
+                # Files that can't be opened raise, ones that can't be mapped are read
+                with self.assertRaises(FileNotFoundError): obj.deserialize._read_aaobject(os.path.join(temp_path, 'Missing.txt'))
+                with mock.patch.object(obj.deserialize, '_map_aaobject', side_effect=OSError('mmap')):
+                    self.assertIsInstance(obj.deserialize._read_aaobject(file, use_mmap=True), bytes)
+                corrupt = os.path.join(temp_path, 'Corrupt.aaPKG')
+                with open(corrupt, 'wb') as f: f.write(b'\x00' * 16)
+                with self.assertRaises(zipfile.BadZipFile): pkg.decompress.aapkg_to_manifest(input_path=corrupt)
+
+                # Cabs stored without compression are opened in place
+                package = os.path.join(temp_path, 'Pkg.aaPKG')
+                members = [(f'{tag_name}.cab', f'{file_name}.txt', obj.serialize.serialize_aaobject(_test_aaobject(tag_name=tag_name))) for (tag_name, file_name) in [('$T', '$T'), ('$U', 'U'), ('I', 'I')]]
+                members.append(('m.cab', 'Manifest.xml', TEST_MANIFEST_XML))
+                with zipfile.ZipFile(package, 'w', zipfile.ZIP_STORED) as outer:
+                    for (cab, name, member) in members:
+                        buffer = io.BytesIO()
+                        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as inner: inner.writestr(name, member)
+                        outer.writestr(cab, buffer.getvalue())
+                with pkg.decompress._open_package(package) as archive:
+                    view = pkg.decompress._stored_member_view(archive, archive.getinfo('m.cab'))
+                    self.assertEqual(bytes(view), archive.read('m.cab'))
+                    view.release()
+                (manifest, streams) = pkg.decompress.aapkg_to_memory(input_path=package)
+                self.assertEqual([(x.path, x.data) for x in streams], [(['Pkg', cab, name], member) for (cab, name, member) in members])
+
+                # Extracted packages give the same objects as the package
+                spu = SPUtility()
+                spu.decompress_package(input_path=package, output_path=os.path.join(temp_path, 'extracted'))
+                expected = spu.deserialize_package(input_path=package, output_path=os.path.join(temp_path, 'a'))
+                result = spu.deserialize_folder(input_path=os.path.join(temp_path, 'extracted', 'Pkg'), output_path=os.path.join(temp_path, 'b'))
+                self.assertEqual(result, expected)
+                self.assertTrue(os.path.isfile(os.path.join(temp_path, 'b', 'Pkg', 'I', 'header.json')))
+
+    def test_seek_to_pattern(self):
+        pattern = obj.primitives.PATTERN_OBJECT_VALUE
+        stream = obj.types.AaBinStream(data=bytes(13) + pattern, offset=0)
+        self.assertEqual(obj.primitives._seek_to_pattern(input=stream, pattern=pattern, max_length=13), 13)
+        self.assertEqual(stream.offset, 13)
+        stream = obj.types.AaBinStream(data=bytes(14) + pattern, offset=0)
+        self.assertEqual(obj.primitives._seek_to_pattern(input=stream, pattern=pattern, max_length=13), -1)
+        self.assertEqual(stream.offset, 0)
+
     def tearDown(self):
         pass
\ No newline at end of file